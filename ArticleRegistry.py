@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from SectionCache import all_topics, get_section_cache
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_REGISTRY_SIZE = int(os.environ.get('LINGUO_ARTICLE_REGISTRY_SIZE', 10000))
+
+# 10 hex characters are enough to tell apart the few hundred daily articles
+ARTICLE_ID_LENGTH = 10
+ARTICLE_ID_RE = re.compile(r'^[0-9a-f]{%d}$' % ARTICLE_ID_LENGTH)
+
+
+def get_article_id(url):
+    '''
+    Returns the short id of an article, which is stable as it only depends on its url.
+
+    Parameters:
+        - url (String): Url of the article
+
+    Returns:
+        Id of the article
+    '''
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:ARTICLE_ID_LENGTH]
+
+
+def is_article_id(text):
+    '''
+    Returns whether if a text is an article id, as sent by the buttons of the articles.
+
+    Parameters:
+        - text (String): Text to check
+
+    Returns:
+        True if the text is an article id, otherwise False
+    '''
+    return isinstance(text, str) and ARTICLE_ID_RE.match(text) is not None
+
+
+class ArticleRegistry:
+
+    def __init__(self, size = ARTICLE_REGISTRY_SIZE, fallback = None):
+        '''
+        Constructor of ArticleRegistry object. Maps the short ids of the articles to their header
+        and url, so that slots and button payloads only carry the ids.
+
+        Parameters:
+            - size (int): Maximum number of registered articles
+            - fallback (Callable): Function which returns all the current articles, used to find
+              the ids which are not registered, for example after a restart of the action server
+        '''
+        self.size = size
+        self.fallback = fallback
+
+        # Key: id of the article, value: (header, url)
+        self.__articles = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def register(self, articles):
+        '''
+        Registers the given articles.
+
+        Parameters:
+            - articles (Dict): Dictionary where the key is the header of the article and the value its url
+
+        Returns:
+            List with the ids of the articles, in the same order
+        '''
+        ids = []
+
+        with self.__lock:
+            for title, url in articles.items():
+                article_id = get_article_id(url)
+                self.__articles[article_id] = (title, url)
+                self.__articles.move_to_end(article_id)
+                ids.append(article_id)
+
+            while len(self.__articles) > self.size:
+                self.__articles.popitem(last = False)
+
+        return ids
+
+    def __lookup(self, article_id):
+        '''
+        Returns the header and url of a registered article, or None if it is not registered.
+        '''
+        with self.__lock:
+            article = self.__articles.get(article_id)
+
+            if article is not None:
+                self.__articles.move_to_end(article_id)
+
+            return article
+
+    def __load_fallback(self, article_ids):
+        '''
+        Registers the articles returned by the fallback, to find the given unknown ids.
+
+        Returns:
+            True if the articles could be loaded, otherwise False
+        '''
+        if self.fallback is None:
+            return False
+
+        try:
+            self.register(self.fallback())
+
+        except Exception:
+            logger.warning("Could not load the articles to resolve %s", ", ".join(article_ids), exc_info = True)
+            return False
+
+        return True
+
+    def resolve(self, article_id):
+        '''
+        Returns the header and url of an article.
+
+        Parameters:
+            - article_id (String): Id of the article
+
+        Returns:
+            Header and url of the article. In case the id is unknown, None is returned
+        '''
+        if not isinstance(article_id, str):
+            return None
+
+        article = self.__lookup(article_id)
+
+        if article is None and self.__load_fallback([article_id]):
+            article = self.__lookup(article_id)
+
+        return article
+
+    def resolve_all(self, article_ids):
+        '''
+        Returns the headers and urls of the given articles, skipping the unknown ones. The
+        fallback is used at most once, to find all the unknown ids at the same time.
+
+        Parameters:
+            - article_ids (List): Ids of the articles
+
+        Returns:
+            Dictionary where the key is the header of the article and the value its url
+        '''
+        article_ids = [article_id for article_id in article_ids or [] if isinstance(article_id, str)]
+        found = {article_id: self.__lookup(article_id) for article_id in article_ids}
+        unknown = [article_id for article_id, article in found.items() if article is None]
+
+        if unknown and self.__load_fallback(unknown):
+            for article_id in unknown:
+                found[article_id] = self.__lookup(article_id)
+
+        articles = {}
+
+        # The articles keep the order of the given ids
+        for article_id in article_ids:
+            article = found[article_id]
+
+            if article is not None:
+                articles[article[0]] = article[1]
+
+        return articles
+
+    def on_section_refresh(self, url, articles, added, removed):
+        '''
+        Listener of the SectionCache, which registers the articles of the refreshed topic.
+
+        Parameters:
+            - url (String): Url of the topic
+            - articles (Dict): All the articles of the topic
+            - added (Dict): New articles of the topic
+            - removed (Dict): Articles no longer in the topic
+        '''
+        self.register(articles)
+
+    def __len__(self):
+        return len(self.__articles)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_article_registry():
+    '''
+    Returns the ArticleRegistry shared by the whole process, creating it the first time. The
+    articles of every topic refreshed by the SectionCache are registered, including the ones
+    refreshed before the registry was created. Unknown ids are looked for in every topic, the
+    main page and the most read articles included.
+
+    Returns:
+        ArticleRegistry object
+    '''
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            section_cache = get_section_cache()
+            _registry = ArticleRegistry(fallback = lambda: section_cache.get_all_articles(topics = all_topics))
+            section_cache.add_listener(_registry.on_section_refresh, replay = True)
+
+    return _registry
@@ -0,0 +1,204 @@
+import functools
+import logging
+import os
+import re
+import threading
+from collections import Counter
+
+from ArticleRegistry import get_article_registry, is_article_id
+from LemmaCache import normalize_text
+from QuerySearcher import QuerySearcher
+from metrics import register_stats
+
+logger = logging.getLogger(__name__)
+
+FUZZY_THRESHOLD = float(os.environ.get('LINGUO_FUZZY_THRESHOLD', 0.8))
+
+# Tiers of the resolver, from the cheapest to the most expensive one
+TIERS = ["id", "exact", "fuzzy", "search"]
+
+NON_WORD_RE = re.compile(r'[^\w]+')
+ARTICLE_SUFFIX = " artikulua"
+
+
+def normalize_title(text):
+    '''
+    Normalizes a header or a query, so that case, punctuation and the "artikulua" suffix of
+    the buttons do not matter.
+
+    Parameters:
+        - text (String): Header or query
+
+    Returns:
+        Normalized text
+    '''
+    text = normalize_text(NON_WORD_RE.sub(" ", text.casefold()))
+
+    if text.endswith(ARTICLE_SUFFIX):
+        text = text[:-len(ARTICLE_SUFFIX)]
+
+    return text
+
+
+@functools.lru_cache(maxsize = 4096)
+def get_trigrams(text):
+    '''
+    Returns the set of character trigrams of a normalized text, padded with spaces.
+
+    Parameters:
+        - text (String): Normalized text
+
+    Returns:
+        Frozenset with the trigrams
+    '''
+    text = " " + text + " "
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def get_similarity(trigrams, other_trigrams):
+    '''
+    Returns the Dice coefficient of two sets of trigrams, between 0 and 1.
+    '''
+    if not trigrams or not other_trigrams:
+        return 0.0
+
+    return 2 * len(trigrams & other_trigrams) / (len(trigrams) + len(other_trigrams))
+
+
+class ArticleResolver:
+
+    def __init__(self, fuzzy_threshold = FUZZY_THRESHOLD, registry = None):
+        '''
+        Constructor of ArticleResolver object. Finds the article chosen by the user trying the
+        cheapest tiers first: the id of the buttons, the exact header, a trigram match, and only
+        then the lemmatized search of QuerySearcher.
+
+        Parameters:
+            - fuzzy_threshold (float): Minimum trigram similarity of the fuzzy tier
+            - registry (ArticleRegistry): Registry of the article ids
+        '''
+        self.fuzzy_threshold = fuzzy_threshold
+        self.registry = registry
+
+        self.__counts = Counter()
+        self.__lock = threading.Lock()
+
+    def __record(self, tier):
+        '''
+        Counts an article resolved by the given tier.
+        '''
+        with self.__lock:
+            self.__counts[tier] += 1
+
+        logger.debug("Article resolved by the %s tier", tier)
+
+    def resolve_id(self, article_id):
+        '''
+        Resolves the id sent by the button of an article.
+
+        Parameters:
+            - article_id (String): Id of the article
+
+        Returns:
+            Header and url of the article. In case the text is not a known id, None is returned
+        '''
+        if not is_article_id(article_id):
+            return None
+
+        registry = self.registry if self.registry is not None else get_article_registry()
+        article = registry.resolve(article_id)
+
+        if article is not None:
+            self.__record("id")
+
+        return article
+
+    def __resolve_fuzzy(self, query, titles):
+        '''
+        Returns the header with the most similar trigrams to the query, if it is above the
+        threshold and no other header is as similar.
+        '''
+        query_trigrams = get_trigrams(query)
+        best_title, best_score, tie = None, 0.0, False
+
+        for normalized, title in titles.items():
+            score = get_similarity(query_trigrams, get_trigrams(normalized))
+
+            if score > best_score:
+                best_title, best_score, tie = title, score, False
+
+            elif score == best_score:
+                tie = True
+
+        if best_score >= self.fuzzy_threshold and not tie:
+            return best_title
+
+        return None
+
+    def resolve(self, query, articles, index_name = None):
+        '''
+        Resolves the header of the article chosen by the user among the given articles. Ids
+        are resolved by resolve_id, as they do not need the articles of the user.
+
+        Parameters:
+            - query (String): Header or keywords sent by the user
+            - articles (Dict): Dictionary where the key is the header of the article and the value its url
+            - index_name (String): Name of the index of the articles, used by the search tier
+
+        Returns:
+            Header of the chosen article and tier which found it
+        '''
+        # Key: normalized header, value: header
+        titles = {normalize_title(title): title for title in articles.keys()}
+        normalized = normalize_title(query)
+
+        title = titles.get(normalized)
+        if title is not None:
+            self.__record("exact")
+            return title, "exact"
+
+        title = self.__resolve_fuzzy(normalized, titles)
+        if title is not None:
+            self.__record("fuzzy")
+            return title, "fuzzy"
+
+        query_searcher = QuerySearcher(articles.keys(), index_name = index_name)
+        title = query_searcher.search_query(query)
+        self.__record("search")
+
+        return title, "search"
+
+    def stats(self):
+        '''
+        Returns the number of articles resolved by every tier, and how many of them did not
+        need the lemmatized search.
+
+        Returns:
+            Dictionary with the statistics of the resolver
+        '''
+        with self.__lock:
+            stats = {tier: self.__counts[tier] for tier in TIERS}
+
+        stats["search_avoided"] = stats["id"] + stats["exact"] + stats["fuzzy"]
+
+        return stats
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+def get_article_resolver():
+    '''
+    Returns the ArticleResolver shared by the whole process, creating it the first time.
+
+    Returns:
+        ArticleResolver object
+    '''
+    global _resolver
+
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = ArticleResolver()
+            register_stats("article_resolver", _resolver.stats)
+
+    return _resolver
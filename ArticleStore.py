@@ -0,0 +1,388 @@
+import atexit
+import datetime
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from metrics import register_stats
+from scrapper import TOPIC_URLS
+
+logger = logging.getLogger(__name__)
+
+# SQLite file of the article store. If unset, articles are not stored
+ARTICLE_STORE_PATH = os.environ.get('LINGUO_ARTICLE_STORE_PATH')
+
+# Seconds a connection waits for the writer of another thread or process
+BUSY_TIMEOUT = 5.0
+
+# Pages which list the articles of all the sections, so they do not change the section of an article
+LISTING_SECTIONS = ("Azken berriak", "Berri irakurrienak")
+
+WORD_RE = re.compile(r'\w+')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    section TEXT,
+    headline TEXT NOT NULL,
+    sub_header TEXT,
+    sub_header_at REAL,
+    lemmas TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_last_seen ON articles (last_seen);
+CREATE INDEX IF NOT EXISTS articles_section ON articles (section, last_seen);
+'''
+
+FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5 (
+    headline, sub_header, lemmas, content = 'articles', content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts (rowid, headline, sub_header, lemmas)
+        VALUES (new.id, new.headline, new.sub_header, new.lemmas);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, headline, sub_header, lemmas)
+        VALUES ('delete', old.id, old.headline, old.sub_header, old.lemmas);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF headline, sub_header, lemmas ON articles
+    WHEN old.headline IS NOT new.headline OR old.sub_header IS NOT new.sub_header OR old.lemmas IS NOT new.lemmas
+BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, headline, sub_header, lemmas)
+        VALUES ('delete', old.id, old.headline, old.sub_header, old.lemmas);
+    INSERT INTO articles_fts (rowid, headline, sub_header, lemmas)
+        VALUES (new.id, new.headline, new.sub_header, new.lemmas);
+END;
+'''
+
+UPSERT = '''
+INSERT INTO articles (url, section, headline, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    section = CASE WHEN articles.section IS NULL OR excluded.section NOT IN (%s) THEN excluded.section
+                ELSE articles.section END,
+    headline = excluded.headline,
+    lemmas = CASE WHEN articles.headline IS excluded.headline THEN articles.lemmas ELSE NULL END,
+    last_seen = max(articles.last_seen, excluded.last_seen)
+''' % ", ".join("'%s'" % section for section in LISTING_SECTIONS)
+
+
+def get_today():
+    '''
+    Returns the timestamp of the start of the current day, in local time.
+    '''
+    return datetime.datetime.combine(datetime.date.today(), datetime.time()).timestamp()
+
+
+def get_match_query(query):
+    '''
+    Builds a full-text query which requires all the words of the user query, each of them
+    as a prefix, so that declined forms of a word also match.
+
+    Parameters:
+        - query (String): User query
+
+    Returns:
+        FTS5 query, or None if the query has no words
+    '''
+    words = WORD_RE.findall(query.casefold())
+
+    if not words:
+        return None
+
+    return " AND ".join('"%s"*' % word for word in words)
+
+
+class ArticleStore:
+
+    def __init__(self, path = ARTICLE_STORE_PATH):
+        '''
+        Constructor of ArticleStore object. Persists the scrapped articles in a SQLite
+        database, keyed by url, with their section, headline, subheader, lemmas and the
+        first and last time they were seen, so that today's and past editions can be
+        queried without the network. WAL mode lets the threads and processes of the action
+        server read while another one writes; each thread uses its own connection.
+
+        Parameters:
+            - path (String): Path of the SQLite database
+        '''
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self.__local = threading.local()
+        self.__connections = []
+        self.__lock = threading.Lock()
+
+        connection = self.__connect()
+        connection.execute("PRAGMA journal_mode = WAL")
+
+        with connection:
+            connection.executescript(SCHEMA)
+
+            # Stores created before subheaders expired have no download time
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(articles)")]
+            if 'sub_header_at' not in columns:
+                connection.execute("ALTER TABLE articles ADD COLUMN sub_header_at REAL")
+
+        try:
+            with connection:
+                connection.executescript(FTS_SCHEMA)
+
+            self.full_text = True
+
+        except sqlite3.OperationalError:
+            logger.warning("SQLite has no FTS5, stored articles are searched by their headline only", exc_info = True)
+            self.full_text = False
+
+    def __connect(self):
+        '''
+        Returns the connection of the current thread, opening it the first time.
+        '''
+        connection = getattr(self.__local, 'connection', None)
+
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout = BUSY_TIMEOUT, check_same_thread = False)
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.row_factory = sqlite3.Row
+            self.__local.connection = connection
+
+            with self.__lock:
+                self.__connections.append(connection)
+
+        return connection
+
+    def upsert_articles(self, section, articles, seen_at = None):
+        '''
+        Stores the articles of a scrapped page in a single transaction. New articles are
+        inserted, and the ones already stored get their headline and last seen time updated.
+
+        Parameters:
+            - section (String): Topic of the page
+            - articles (Dict): Dictionary where the key is the header of the article and the value its url
+            - seen_at (float): Timestamp of the scrapping. Defaults to now
+        '''
+        seen_at = time.time() if seen_at is None else seen_at
+        rows = [(url, section, headline, seen_at, seen_at) for headline, url in articles.items() if url]
+
+        connection = self.__connect()
+        with connection:
+            connection.executemany(UPSERT, rows)
+
+    def set_sub_header(self, url, sub_header, fetched_at = None):
+        '''
+        Stores the subheader of an article, if the article is stored.
+
+        Parameters:
+            - url (String): Url of the article
+            - sub_header (String): Subheader of the article
+            - fetched_at (float): Timestamp of the download of the subheader. Defaults to now
+        '''
+        fetched_at = time.time() if fetched_at is None else fetched_at
+
+        connection = self.__connect()
+        with connection:
+            connection.execute("UPDATE articles SET sub_header = ?, sub_header_at = ? WHERE url = ?",
+                                (sub_header, fetched_at, url))
+
+    def set_lemmas(self, lemmas):
+        '''
+        Stores the lemmatized headlines of several articles in a single transaction.
+
+        Parameters:
+            - lemmas (Dict): Dictionary where the key is the url of the article and the value
+              its lemmatized headline
+        '''
+        connection = self.__connect()
+        with connection:
+            connection.executemany("UPDATE articles SET lemmas = ? WHERE url = ?",
+                                    [(lemmatized, url) for url, lemmatized in lemmas.items()])
+
+    def get_article(self, url):
+        '''
+        Returns a stored article.
+
+        Parameters:
+            - url (String): Url of the article
+
+        Returns:
+            Dictionary with the columns of the article, or None if it is not stored
+        '''
+        row = self.__connect().execute("SELECT * FROM articles WHERE url = ?", (url,)).fetchone()
+
+        return dict(row) if row is not None else None
+
+    def get_sub_header(self, url, max_age = None):
+        '''
+        Returns the stored subheader of an article and the time it was downloaded.
+
+        Parameters:
+            - url (String): Url of the article
+            - max_age (float): Seconds after which a stored subheader is not returned. If None,
+              it is returned however old it is
+
+        Returns:
+            Subheader of the article and timestamp of its download, or (None, None) if it is not
+            stored or it is older than max_age
+        '''
+        row = self.__connect().execute("SELECT sub_header, sub_header_at FROM articles WHERE url = ?",
+                                        (url,)).fetchone()
+        sub_header, fetched_at = row if row is not None else (None, None)
+
+        if sub_header is not None and max_age is not None and (fetched_at is None or time.time() - fetched_at > max_age):
+            sub_header, fetched_at = None, None
+
+        with self.__lock:
+            if sub_header is None:
+                self.misses += 1
+
+            else:
+                self.hits += 1
+
+        return sub_header, fetched_at
+
+    def get_articles(self, section = None, since = None, until = None, limit = None):
+        '''
+        Returns the stored articles seen in a period, the most recently seen first.
+
+        Parameters:
+            - section (String): Topic of the articles. If None, articles of all the topics
+            - since (float): Articles last seen from this timestamp, e.g. get_today()
+            - until (float): Articles first seen before this timestamp
+            - limit (int): Maximum number of articles
+
+        Returns:
+            Dictionary where the key is the header of the article and the value its url
+        '''
+        conditions = []
+        parameters = []
+
+        for condition, value in (("section = ?", section), ("last_seen >= ?", since), ("first_seen < ?", until)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+
+        sql = "SELECT headline, url FROM articles"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        sql += " ORDER BY last_seen DESC, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+
+        return {row[0]: row[1] for row in self.__connect().execute(sql, parameters)}
+
+    def search(self, query, since = None, limit = 10):
+        '''
+        Searches the stored articles whose headline, subheader or lemmas contain all the
+        words of the query, ranked by BM25.
+
+        Parameters:
+            - query (String): User query
+            - since (float): Only articles last seen from this timestamp
+            - limit (int): Maximum number of articles
+
+        Returns:
+            List of (header, url) tuples, the best match first
+        '''
+        match_query = get_match_query(query)
+        if match_query is None:
+            return []
+
+        parameters = [match_query]
+        since_condition = ""
+
+        if since is not None:
+            since_condition = " AND articles.last_seen >= ?"
+            parameters.append(since)
+
+        parameters.append(limit)
+
+        if self.full_text:
+            sql = ("SELECT articles.headline, articles.url FROM articles_fts "
+                    "JOIN articles ON articles.id = articles_fts.rowid "
+                    "WHERE articles_fts MATCH ?" + since_condition +
+                    " ORDER BY bm25(articles_fts), articles.last_seen DESC LIMIT ?")
+
+        else:
+            words = WORD_RE.findall(query.casefold())
+            parameters = ["%" + word + "%" for word in words] + parameters[1:]
+            sql = ("SELECT headline, url FROM articles WHERE " +
+                    " AND ".join("lower(headline) LIKE ?" for _ in words) + since_condition.replace("articles.", "") +
+                    " ORDER BY last_seen DESC LIMIT ?")
+
+        return [(row[0], row[1]) for row in self.__connect().execute(sql, parameters)]
+
+    def on_section_seen(self, url, articles, seen_at):
+        '''
+        Seen listener of the SectionCache, which stores the articles of every checked topic,
+        so that the articles which stay in a page keep their last seen time up to date.
+
+        Parameters:
+            - url (String): Url of the topic
+            - articles (Dict): All the articles of the topic
+            - seen_at (float): Timestamp of the check
+        '''
+        section = next((topic for topic, topic_url in TOPIC_URLS.items() if topic_url == url), url)
+        self.upsert_articles(section, articles, seen_at)
+
+    def stats(self):
+        '''
+        Returns the counters of the store.
+
+        Returns:
+            Dictionary with the subheader hits and misses and the number of stored articles
+        '''
+        count = self.__connect().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+        with self.__lock:
+            return {"sub_header_hits": self.hits, "sub_header_misses": self.misses, "articles": count}
+
+    def close(self):
+        '''
+        Closes the connections of all the threads.
+        '''
+        with self.__lock:
+            connections = self.__connections
+            self.__connections = []
+
+        for connection in connections:
+            connection.close()
+
+        self.__local = threading.local()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_article_store():
+    '''
+    Returns the ArticleStore shared by the whole process, creating it the first time and
+    registering it as a seen listener of the SectionCache.
+
+    Returns:
+        ArticleStore object, or None if LINGUO_ARTICLE_STORE_PATH is not set
+    '''
+    global _store
+
+    if not ARTICLE_STORE_PATH:
+        return None
+
+    with _store_lock:
+        if _store is None:
+            from SectionCache import get_section_cache
+
+            _store = ArticleStore()
+            register_stats("article_store", _store.stats)
+            atexit.register(_store.close)
+
+            get_section_cache().add_seen_listener(_store.on_section_seen, replay = True)
+
+    return _store
@@ -0,0 +1,365 @@
+import argparse
+import atexit
+import logging
+import os
+import shutil
+import threading
+import time
+
+from whoosh.fields import Schema, ID, KEYWORD, STORED
+from whoosh.index import create_in, open_dir
+from whoosh.qparser import QueryParser
+
+from ArticleStore import get_article_store
+from QuerySearcher import QuerySearcher
+from metrics import register_stats
+from scrapper import get_all_articles
+
+logger = logging.getLogger(__name__)
+
+HEADLINE_INDEX_DIR = os.environ.get('LINGUO_HEADLINE_INDEX_DIR', os.path.join('index', 'headlines'))
+HEADLINE_INDEX_INTERVAL = float(os.environ.get('LINGUO_HEADLINE_INDEX_INTERVAL', 600))
+HEADLINE_INDEXER = os.environ.get('LINGUO_HEADLINE_INDEXER', '0') == '1'
+
+# Previous versions are kept for the readers which have not swapped to the current one yet
+KEEP_VERSIONS = 2
+
+CURRENT_FILE = "CURRENT"
+
+
+class HeadlineSnapshot:
+
+    def __init__(self, version, path):
+        '''
+        Constructor of HeadlineSnapshot object. Opens a version of the headline index.
+
+        Parameters:
+            - version (String): Version of the index
+            - path (String): Directory of the version
+        '''
+        self.version = version
+        self.ix = open_dir(path)
+        self.searcher = self.ix.searcher()
+        self.parser = QueryParser("document", self.ix.schema)
+        self.lock = threading.Lock()
+
+    def search(self, query):
+        '''
+        Given a lemmatized query, returns the closest article of the snapshot.
+
+        Parameters:
+            - query (String): Lemmatized user query
+
+        Returns:
+            Header and url of the closest article. In case no article is found, None is returned
+        '''
+        with self.lock:
+            results = self.searcher.search(self.parser.parse(query))
+
+            if not results:
+                return None
+
+            return results[0]['title'], results[0]['url']
+
+    def close(self):
+        '''
+        Closes the searcher of the snapshot.
+        '''
+        with self.lock:
+            self.searcher.close()
+
+
+def build_index(directory, articles, query_searcher, lemmas = None):
+    '''
+    Lemmatizes the given articles and writes them as a new version of the headline index.
+    The new version becomes the current one once it is completely written.
+
+    Parameters:
+        - directory (String): Directory of the headline index
+        - articles (Dict): Dictionary where the key is the header of the article and the value its url
+        - query_searcher (QuerySearcher): Searcher used to lemmatize the headers
+        - lemmas (Dict): Lemmatized headers of a previous build, which are not lemmatized again
+
+    Returns:
+        Version of the new index, and dictionary with the lemmatized headers
+    '''
+    titles = list(articles)
+    lemmas = lemmas or {}
+
+    missing = [title for title in titles if title not in lemmas]
+    lemmas = {title: lemmas[title] for title in titles if title in lemmas}
+    lemmas.update(zip(missing, query_searcher.lemmatize_batch(missing)))
+
+    lemmatized_titles = [lemmas[title] for title in titles]
+
+    store = get_article_store()
+    if store is not None:
+        store.set_lemmas({articles[title]: lemmatized_title for title, lemmatized_title in zip(titles, lemmatized_titles)})
+
+    version = str(time.time_ns()) + "-" + str(os.getpid())
+    path = os.path.join(directory, version)
+    os.makedirs(path)
+
+    schema = Schema(key = ID(unique = True), document = KEYWORD(stored = True), title = STORED, url = STORED)
+    ix = create_in(path, schema)
+    writer = ix.writer()
+
+    # As in QuerySearcher, the last header with the same lemmas is the one returned
+    for title, lemmatized_title in zip(titles, lemmatized_titles):
+        if lemmatized_title.strip():
+            writer.update_document(key = lemmatized_title, document = lemmatized_title,
+                                    title = title, url = articles[title])
+
+    writer.commit()
+
+    # Replacing the pointer file is atomic, so readers see either the old or the new version
+    current_path = os.path.join(directory, CURRENT_FILE)
+    tmp_path = current_path + "." + version + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+
+    os.replace(tmp_path, current_path)
+
+    versions = sorted(name for name in os.listdir(directory) if not name.startswith(CURRENT_FILE))
+    for name in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors = True)
+
+    logger.info("Headline index %s built with %d articles, %d of them lemmatized", version, len(titles), len(missing))
+
+    return version, lemmas
+
+
+def get_current_version(directory):
+    '''
+    Returns the current version of the headline index.
+
+    Parameters:
+        - directory (String): Directory of the headline index
+
+    Returns:
+        Current version, or None if no version has been built yet
+    '''
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+
+    except FileNotFoundError:
+        return None
+
+
+class HeadlineIndexer:
+
+    def __init__(self, directory = HEADLINE_INDEX_DIR, interval = HEADLINE_INDEX_INTERVAL, scrape = get_all_articles,
+                    query_searcher = None):
+        '''
+        Constructor of HeadlineIndexer object. Periodically scrapes, lemmatizes and indexes all
+        the daily articles, so that open questions only query the current snapshot.
+
+        Parameters:
+            - directory (String): Directory of the versioned headline index
+            - interval (float): Seconds between two builds of the index
+            - scrape (Callable): Function which returns all the daily articles
+            - query_searcher (QuerySearcher): Searcher used to lemmatize headers and queries
+        '''
+        self.directory = directory
+        self.interval = interval
+        self.scrape = scrape
+
+        if query_searcher is None:
+            query_searcher = QuerySearcher(index_name = "headlines")
+
+        self.query_searcher = query_searcher
+
+        self.__snapshot = None
+        self.__previous = None
+        self.__lock = threading.Lock()
+
+        # Version, articles and lemmatized headers of the last build
+        self.__version = None
+        self.__articles = None
+        self.__lemmas = {}
+        self.__counts = {"builds": 0, "skipped_builds": 0, "lemmatized_headlines": 0}
+        self.__stop = threading.Event()
+        self.__thread = None
+
+        os.makedirs(directory, exist_ok = True)
+
+    def run_once(self):
+        '''
+        Builds a new version of the index with the current daily articles and swaps to it.
+        If the articles have not changed since the last build, which is still the current
+        version, nothing is built; otherwise only the new headers are lemmatized.
+
+        Returns:
+            Version of the current index
+        '''
+        articles = self.scrape()
+
+        if articles == self.__articles and get_current_version(self.directory) == self.__version:
+            with self.__lock:
+                self.__counts["skipped_builds"] += 1
+
+            return self.__version
+
+        lemmatized = len([title for title in articles if title not in self.__lemmas])
+        version, self.__lemmas = build_index(self.directory, articles, self.query_searcher, self.__lemmas)
+        self.__articles = articles
+        self.__version = version
+
+        with self.__lock:
+            self.__counts["builds"] += 1
+            self.__counts["lemmatized_headlines"] += lemmatized
+
+        self.current()
+
+        return version
+
+    def stats(self):
+        '''
+        Returns the counters of the builds.
+
+        Returns:
+            Dictionary with the built and skipped versions, and the lemmatized headers
+        '''
+        with self.__lock:
+            return dict(self.__counts)
+
+    def current(self):
+        '''
+        Returns the snapshot of the current version of the index, swapping to a newer version
+        if another process or thread has built it.
+
+        Returns:
+            HeadlineSnapshot object, or None if no version has been built yet
+        '''
+        version = get_current_version(self.directory)
+        snapshot = self.__snapshot
+
+        if version is None or (snapshot is not None and snapshot.version == version):
+            return snapshot
+
+        with self.__lock:
+            if self.__snapshot is None or self.__snapshot.version != version:
+                try:
+                    new_snapshot = HeadlineSnapshot(version, os.path.join(self.directory, version))
+
+                except Exception:
+                    logger.warning("Could not open headline index %s", version, exc_info = True)
+                    return self.__snapshot
+
+                # The previous snapshot may still be used by a running search, so it is
+                # closed one swap later
+                if self.__previous is not None:
+                    self.__previous.close()
+
+                self.__previous = self.__snapshot
+                self.__snapshot = new_snapshot
+
+            return self.__snapshot
+
+    def search(self, query):
+        '''
+        Searches the closest article to the user query in the current snapshot.
+
+        Parameters:
+            - query (String): User query
+
+        Returns:
+            Header and url of the closest article. In case there is no snapshot or no article
+            is found, None is returned
+        '''
+        snapshot = self.current()
+        if snapshot is None:
+            return None
+
+        lemmatized_query = self.query_searcher.lemmatize_batch([query])[0]
+        return snapshot.search(lemmatized_query)
+
+    def __run(self):
+        '''
+        Loop of the scheduler thread.
+        '''
+        while not self.__stop.is_set():
+            try:
+                self.run_once()
+
+            except Exception:
+                logger.error("Could not build the headline index", exc_info = True)
+
+            self.__stop.wait(self.interval)
+
+    def start(self):
+        '''
+        Starts building the index every self.interval seconds in a background thread.
+        '''
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+
+        self.__stop.clear()
+        self.__thread = threading.Thread(target = self.__run, name = "headline-indexer", daemon = True)
+        self.__thread.start()
+
+    def stop(self):
+        '''
+        Stops the scheduler thread.
+        '''
+        self.__stop.set()
+
+        if self.__thread is not None:
+            self.__thread.join(timeout = 1.0)
+            self.__thread = None
+
+
+_indexer = None
+_indexer_lock = threading.Lock()
+
+def get_headline_indexer():
+    '''
+    Returns the HeadlineIndexer shared by the whole process, creating it the first time. If
+    LINGUO_HEADLINE_INDEXER is enabled, the index is built in a background thread of this
+    process from the SectionCache; otherwise it is expected to be built by the CLI.
+
+    Returns:
+        HeadlineIndexer object
+    '''
+    global _indexer
+
+    with _indexer_lock:
+        if _indexer is None:
+            if HEADLINE_INDEXER:
+                from SectionCache import get_section_cache
+
+                _indexer = HeadlineIndexer(scrape = get_section_cache().get_all_articles)
+                register_stats("headline_indexer", _indexer.stats)
+                _indexer.start()
+                atexit.register(_indexer.stop)
+
+            else:
+                _indexer = HeadlineIndexer()
+
+    return _indexer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build the headline index of the open questions")
+    parser.add_argument('--directory', default = HEADLINE_INDEX_DIR)
+    parser.add_argument('--interval', type = float, default = HEADLINE_INDEX_INTERVAL,
+                        help = "Seconds between two builds of the index")
+    parser.add_argument('--once', action = 'store_true', help = "Build the index once and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level = logging.INFO)
+    indexer = HeadlineIndexer(args.directory, args.interval)
+
+    if args.once:
+        print(indexer.run_once())
+
+    else:
+        while True:
+            try:
+                indexer.run_once()
+
+            except Exception:
+                logger.error("Could not build the headline index", exc_info = True)
+
+            time.sleep(args.interval)
@@ -0,0 +1,337 @@
+import importlib.util
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import increment, register_stats
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.environ.get('LINGUO_HTTP_POOL_SIZE', 10))
+HTTP_MAX_PER_HOST = int(os.environ.get('LINGUO_HTTP_MAX_PER_HOST', 8))
+
+# Requests per second allowed to each host, and requests which can be sent at once after
+# some idle time. A rate of 0 disables the limit. Once the burst is spent, the rate also
+# caps the concurrent downloads of LINGUO_SCRAPE_WORKERS: with 10 requests per second, more
+# workers only wait longer for the limiter, so the rate must be raised along with them
+HTTP_RATE = float(os.environ.get('LINGUO_HTTP_RATE', 10))
+HTTP_BURST = int(os.environ.get('LINGUO_HTTP_BURST', 20))
+
+HTTP_RETRIES = int(os.environ.get('LINGUO_HTTP_RETRIES', 2))
+HTTP_BACKOFF = float(os.environ.get('LINGUO_HTTP_BACKOFF', 0.5))
+HTTP_MAX_BACKOFF = 10.0
+
+# Consecutive failures which open the circuit of a host, and seconds until a request is
+# tried again
+BREAKER_FAILURES = int(os.environ.get('LINGUO_HTTP_BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.environ.get('LINGUO_HTTP_BREAKER_RESET', 30))
+
+# Status codes which are worth retrying, as the same request may succeed later
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# urllib3 only decodes brotli responses if a brotli module is installed
+if importlib.util.find_spec('brotli') or importlib.util.find_spec('brotlicffi'):
+    ACCEPT_ENCODING = "gzip, deflate, br"
+
+else:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+class CircuitOpenError(requests.RequestException):
+    '''
+    Raised instead of sending a request to a host whose circuit is open.
+    '''
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst):
+        '''
+        Constructor of TokenBucket object. Limits the rate of the requests to a host.
+
+        Parameters:
+            - rate (float): Tokens added per second
+            - burst (int): Maximum number of stored tokens
+        '''
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        Takes a token, waiting until there is one available.
+        '''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+
+    def __init__(self, failures = BREAKER_FAILURES, reset = BREAKER_RESET):
+        '''
+        Constructor of CircuitBreaker object. After some consecutive failures the circuit is
+        open and requests fail fast; once reset seconds have passed, a single request is let
+        through and its result closes or opens the circuit again.
+
+        Parameters:
+            - failures (int): Consecutive failures which open the circuit
+            - reset (float): Seconds the circuit stays open
+        '''
+        self.failures = failures
+        self.reset = reset
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        '''
+        Returns whether if a request can be sent.
+        '''
+        with self.lock:
+            if self.opened_at is None:
+                return True
+
+            if not self.trial and time.monotonic() - self.opened_at >= self.reset:
+                self.trial = True
+                return True
+
+            return False
+
+    def record(self, success):
+        '''
+        Records the result of a request.
+
+        Parameters:
+            - success (Boolean): Whether if the request succeeded
+        '''
+        with self.lock:
+            self.trial = False
+
+            if success:
+                self.consecutive_failures = 0
+                self.opened_at = None
+                return
+
+            self.consecutive_failures += 1
+
+            if self.opened_at is not None or self.consecutive_failures >= self.failures:
+                self.opened_at = time.monotonic()
+
+    def is_open(self):
+        with self.lock:
+            return self.opened_at is not None
+
+
+class Host:
+
+    def __init__(self, max_connections, rate, burst, failures, reset):
+        '''
+        Constructor of Host object. Stores the limits and the circuit of a host.
+        '''
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.breaker = CircuitBreaker(failures, reset)
+
+
+class HttpClient:
+
+    def __init__(self, pool_size = HTTP_POOL_SIZE, max_per_host = HTTP_MAX_PER_HOST, rate = HTTP_RATE,
+                    burst = HTTP_BURST, retries = HTTP_RETRIES, backoff = HTTP_BACKOFF,
+                    breaker_failures = BREAKER_FAILURES, breaker_reset = BREAKER_RESET):
+        '''
+        Constructor of HttpClient object. Shares kept alive connections between all the
+        requests of the process, caps the concurrent requests and the rate of every host,
+        retries the failed requests with exponential backoff, and stops sending requests to a
+        host which keeps failing, so that callers fall back to their cached data.
+
+        Parameters:
+            - pool_size (int): Kept alive connections per host
+            - max_per_host (int): Maximum concurrent requests to a host
+            - rate (float): Requests per second to a host, 0 for no limit
+            - burst (int): Requests which can be sent at once after some idle time
+            - retries (int): Retries of a failed request
+            - backoff (float): Seconds to wait before the first retry, doubled on every retry
+            - breaker_failures (int): Consecutive failures which open the circuit of a host
+            - breaker_reset (float): Seconds the circuit of a host stays open
+        '''
+        self.max_per_host = max_per_host
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = max(pool_size, max_per_host))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.__counts = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0}
+        self.__hosts = {}
+        self.__lock = threading.Lock()
+
+    def __count(self, name):
+        '''
+        Increments a counter of the client, and its metric.
+        '''
+        with self.__lock:
+            self.__counts[name] += 1
+
+        increment("http_" + name)
+
+    def __get_host(self, url):
+        '''
+        Returns the limits and circuit of the host of an url.
+        '''
+        netloc = urlsplit(url).netloc
+
+        with self.__lock:
+            host = self.__hosts.get(netloc)
+
+            if host is None:
+                host = Host(self.max_per_host, self.rate, self.burst, self.breaker_failures, self.breaker_reset)
+                self.__hosts[netloc] = host
+
+            return host
+
+    def __get_backoff(self, attempt, response = None):
+        '''
+        Returns the seconds to wait before a retry, with jitter so that concurrent retries do
+        not hit the host at the same time. A numeric Retry-After header is respected.
+        '''
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), HTTP_MAX_BACKOFF)
+
+        return min(self.backoff * 2 ** attempt + random.uniform(0, self.backoff), HTTP_MAX_BACKOFF)
+
+    def get(self, url, headers = None, timeout = None):
+        '''
+        Sends a GET request.
+
+        Parameters:
+            - url (String): Url of the request
+            - headers (Dict): Extra headers of the request
+            - timeout (float): Seconds to wait for the server on every attempt
+
+        Returns:
+            requests.Response object. Responses with an error status which is not worth
+            retrying are returned as they are
+
+        Raises:
+            CircuitOpenError if the host keeps failing, or the error of the last attempt
+        '''
+        host = self.__get_host(url)
+        attempt = 0
+
+        while True:
+            if not host.breaker.allow():
+                self.__count("rejected")
+                raise CircuitOpenError("Circuit open for " + urlsplit(url).netloc)
+
+            if host.bucket is not None:
+                host.bucket.acquire()
+
+            response = None
+            error = None
+            self.__count("requests")
+
+            with host.semaphore:
+                try:
+                    response = self.session.get(url, headers = headers, timeout = timeout)
+
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+
+                except BaseException:
+                    # Other errors are not retried, but they must be recorded too, as they may
+                    # be the trial request of a half-open circuit
+                    host.breaker.record(False)
+                    self.__count("failures")
+                    raise
+
+            success = error is None and response.status_code not in RETRY_STATUS
+            host.breaker.record(success)
+
+            if success:
+                return response
+
+            if attempt >= self.retries or host.breaker.is_open():
+                self.__count("failures")
+
+                if error is not None:
+                    raise error
+
+                return response
+
+            wait = self.__get_backoff(attempt, response)
+            logger.info("Retrying %s in %.2f seconds: %s", url, wait,
+                        error if error is not None else response.status_code)
+
+            self.__count("retries")
+            attempt += 1
+            time.sleep(wait)
+
+    def stats(self):
+        '''
+        Returns the counters of the client.
+
+        Returns:
+            Dictionary with the sent, retried, failed and rejected requests, and the open circuits
+        '''
+        with self.__lock:
+            stats = dict(self.__counts)
+            hosts = list(self.__hosts.values())
+
+        stats["open_circuits"] = sum(host.breaker.is_open() for host in hosts)
+
+        return stats
+
+    def close(self):
+        '''
+        Closes the kept alive connections.
+        '''
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_http_client():
+    '''
+    Returns the HttpClient shared by the whole process, creating it the first time.
+
+    Returns:
+        HttpClient object
+    '''
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+            register_stats("http_client", _client.stats)
+
+    return _client
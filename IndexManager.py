@@ -0,0 +1,226 @@
+import atexit
+import os
+import re
+import threading
+
+from whoosh.fields import Schema, ID, KEYWORD
+from whoosh.index import create_in, exists_in, open_dir
+from whoosh.qparser import QueryParser
+
+INDEX_DIR = os.environ.get('LINGUO_INDEX_DIR', 'index')
+WRITER_TIMEOUT = 10.0
+
+
+def get_index_dirname(name):
+    '''
+    Returns a safe directory name for an index. Topic names such as "Azken berriak" are
+    lowercased and all the characters which are not letters or digits are replaced.
+
+    Parameters:
+        - name (String): Name of the index
+
+    Returns:
+        Directory name of the index
+    '''
+    return re.sub(r'\W+', '_', str(name).lower()).strip('_') or 'default'
+
+
+class ManagedIndex:
+
+    def __init__(self, path):
+        '''
+        Constructor of ManagedIndex object. Opens the Whoosh index stored at path, creating it
+        if it does not exist, and keeps a searcher open on it.
+
+        Parameters:
+            - path (String): Directory of the index
+        '''
+        self.path = path
+        self.lock = threading.Lock()
+
+        schema = Schema(key = ID(unique = True), document = KEYWORD(stored = True))
+
+        if exists_in(path):
+            self.ix = open_dir(path)
+
+        else:
+            os.makedirs(path, exist_ok = True)
+            self.ix = create_in(path, schema)
+
+        self.searcher = self.ix.searcher()
+        self.parser = QueryParser("document", self.ix.schema)
+        self.documents = set(fields['document'] for fields in self.searcher.all_stored_fields())
+
+
+class IndexManager:
+
+    def __init__(self, directory = INDEX_DIR):
+        '''
+        Constructor of IndexManager object. Each index lives in its own subdirectory, so that
+        concurrent requests over different document sets do not overwrite each other.
+
+        Parameters:
+            - directory (String): Directory where all the indexes are stored
+        '''
+        self.directory = directory
+
+        self.__indexes = {}
+        self.__lock = threading.Lock()
+
+    def __get(self, name):
+        '''
+        Returns the ManagedIndex of the given name, opening it the first time.
+
+        Parameters:
+            - name (String): Name of the index
+
+        Returns:
+            ManagedIndex object
+        '''
+        with self.__lock:
+            index = self.__indexes.get(name)
+
+            if index is None:
+                index = ManagedIndex(os.path.join(self.directory, get_index_dirname(name)))
+                self.__indexes[name] = index
+
+        return index
+
+    def __update(self, index, documents):
+        '''
+        Makes the index contain exactly the given lemmatized documents. Must be called with
+        the lock of the index held.
+
+        Parameters:
+            - index (ManagedIndex): Index to update
+            - documents (List): List of all the lemmatized documents
+
+        Returns:
+            True if the index has been modified, False otherwise
+        '''
+        documents = set(document for document in documents if document.strip())
+
+        if documents == index.documents:
+            return False
+
+        writer = index.ix.writer(timeout = WRITER_TIMEOUT)
+
+        for document in index.documents - documents:
+            writer.delete_by_term('key', document)
+
+        for document in documents - index.documents:
+            writer.update_document(key = document, document = document)
+
+        writer.commit()
+
+        index.documents = documents
+        index.searcher.close()
+        index.searcher = index.ix.searcher()
+
+        return True
+
+    def __search(self, index, query):
+        '''
+        Returns the closest lemmatized document of the index. Must be called with the lock of
+        the index held.
+
+        Parameters:
+            - index (ManagedIndex): Index to search
+            - query (String): Lemmatized user query
+
+        Returns:
+            String with the closest lemmatized document. In case no documents are found, None is returned
+        '''
+        myquery = index.parser.parse(query)
+        results = index.searcher.search(myquery)
+
+        if not results:
+            return None
+
+        else:
+            return results[0].get('document')
+
+    def update(self, name, documents):
+        '''
+        Makes the index contain exactly the given lemmatized documents. Only the new documents
+        are added and only the stale ones are deleted, so nothing is written if the document
+        set has not changed.
+
+        Parameters:
+            - name (String): Name of the index
+            - documents (List): List of all the lemmatized documents
+
+        Returns:
+            True if the index has been modified, False otherwise
+        '''
+        index = self.__get(name)
+
+        with index.lock:
+            return self.__update(index, documents)
+
+    def search(self, name, query):
+        '''
+        Given a lemmatized query, returns the closest lemmatized document of the index.
+
+        Parameters:
+            - name (String): Name of the index
+            - query (String): Lemmatized user query
+
+        Returns:
+            String with the closest lemmatized document. In case no documents are found, None is returned
+        '''
+        index = self.__get(name)
+
+        with index.lock:
+            return self.__search(index, query)
+
+    def update_and_search(self, name, documents, query):
+        '''
+        Updates the index with the given lemmatized documents and searches the query on them,
+        holding the lock of the index in between, so that a request over another snapshot of
+        the same topic can not rewrite the index before the search.
+
+        Parameters:
+            - name (String): Name of the index
+            - documents (List): List of all the lemmatized documents
+            - query (String): Lemmatized user query
+
+        Returns:
+            String with the closest lemmatized document. In case no documents are found, None is returned
+        '''
+        index = self.__get(name)
+
+        with index.lock:
+            self.__update(index, documents)
+            return self.__search(index, query)
+
+    def close(self):
+        '''
+        Closes the searchers of all the opened indexes.
+        '''
+        with self.__lock:
+            for index in self.__indexes.values():
+                with index.lock:
+                    index.searcher.close()
+
+            self.__indexes = {}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_index_manager():
+    '''
+    Returns the IndexManager shared by the whole process, creating it the first time.
+
+    Returns:
+        IndexManager object
+    '''
+    global _manager
+
+    with _manager_lock:
+        if _manager is None:
+            _manager = IndexManager()
+            atexit.register(_manager.close)
+
+    return _manager
@@ -0,0 +1,282 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from metrics import register_stats
+
+CACHE_SIZE = int(os.environ.get('LINGUO_LEMMA_CACHE_SIZE', 4096))
+CACHE_PATH = os.environ.get('LINGUO_LEMMA_CACHE_PATH')
+
+# Texts looked for with a single query, below the default limit of variables of old SQLite versions
+SQLITE_MAX_VARIABLES = 500
+
+# Last uses of stored texts kept in memory before they are written
+USED_FLUSH_SIZE = 256
+
+
+def normalize_text(text):
+    '''
+    Normalizes a text so that equivalent inputs share the same cache entry. Unicode is
+    composed and whitespace is collapsed, which does not change IxaPipes tokenization.
+
+    Parameters:
+        - text (String): Text to normalize
+
+    Returns:
+        Normalized text
+    '''
+    return unicodedata.normalize('NFC', " ".join(str(text).split()))
+
+
+class LemmaCache:
+
+    def __init__(self, size = CACHE_SIZE, path = CACHE_PATH):
+        '''
+        Constructor of LemmaCache object. Stores the lemmatized version of the texts, keeping
+        the last size entries in memory. If a path is given, entries are also persisted in a
+        SQLite database, so that they survive action server restarts.
+
+        Parameters:
+            - size (int): Maximum number of cached texts
+            - path (String): Path of the SQLite database. If None, the cache is only kept in memory
+        '''
+        self.size = size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__connection = None
+        self.__used = {}
+        self.__rows = 0
+
+        if path:
+            self.__connection = sqlite3.connect(path, check_same_thread = False)
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS lemmas "
+                                        "(text TEXT PRIMARY KEY, lemmas TEXT NOT NULL, last_used REAL NOT NULL)")
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS lemmas_last_used ON lemmas (last_used)")
+            self.__connection.commit()
+            self.__rows = self.__connection.execute("SELECT COUNT(*) FROM lemmas").fetchone()[0]
+
+    def __load(self, keys):
+        '''
+        Looks for some texts in the SQLite database. Their last use is only recorded in
+        memory, and written with the next entries or when the cache is closed.
+
+        Parameters:
+            - keys (List): Normalized texts
+
+        Returns:
+            Dictionary with the lemmatized version of the stored texts
+        '''
+        if self.__connection is None or not keys:
+            return {}
+
+        found = {}
+        keys = list(keys)
+
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            chunk = keys[start:start + SQLITE_MAX_VARIABLES]
+            rows = self.__connection.execute("SELECT text, lemmas FROM lemmas WHERE text IN (%s)"
+                                                % ", ".join("?" * len(chunk)), chunk)
+            found.update(rows)
+
+        now = time.time()
+        for key in found:
+            self.__used[key] = now
+
+        if len(self.__used) >= USED_FLUSH_SIZE:
+            with self.__connection:
+                self.__flush_used()
+
+        return found
+
+    def __flush_used(self):
+        '''
+        Writes the pending last uses of the stored texts. Must be called inside a transaction.
+        '''
+        if self.__used:
+            self.__connection.executemany("UPDATE lemmas SET last_used = ? WHERE text = ?",
+                                            [(used, key) for key, used in self.__used.items()])
+            self.__used.clear()
+
+    def __store(self, entries):
+        '''
+        Persists some texts in the SQLite database with a single transaction, removing the
+        least recently used entries only when the database grows over the size of the cache.
+
+        Parameters:
+            - entries (List): List of (normalized text, lemmatized text) tuples
+        '''
+        if self.__connection is None or not entries:
+            return
+
+        now = time.time()
+
+        with self.__connection:
+            self.__flush_used()
+            self.__connection.executemany("INSERT OR REPLACE INTO lemmas VALUES (?, ?, ?)",
+                                            [(key, lemmas, now) for key, lemmas in entries])
+
+            self.__rows += len(entries)
+            if self.__rows <= self.size:
+                return
+
+            # Replaced texts were counted as new rows, so the real count is checked first
+            self.__rows = self.__connection.execute("SELECT COUNT(*) FROM lemmas").fetchone()[0]
+
+            if self.__rows > self.size:
+                self.__connection.execute("DELETE FROM lemmas WHERE text IN "
+                                            "(SELECT text FROM lemmas ORDER BY last_used LIMIT ?)",
+                                            (self.__rows - self.size,))
+                self.__rows = self.size
+
+    def get(self, text):
+        '''
+        Returns the lemmatized version of a text if it has been cached.
+
+        Parameters:
+            - text (String): Original text
+
+        Returns:
+            Lemmatized text, or None if it is not cached
+        '''
+        return self.get_many([text])[0]
+
+    def get_many(self, texts):
+        '''
+        Returns the lemmatized version of some texts, looking for all the ones which are not
+        in memory with a single query to the SQLite database.
+
+        Parameters:
+            - texts (List): Original texts
+
+        Returns:
+            List with the lemmatized texts in the same order, None for the ones not cached
+        '''
+        keys = [normalize_text(text) for text in texts]
+
+        with self.__lock:
+            results = [self.__entries.get(key) for key in keys]
+            stored = self.__load(set(key for key, lemmas in zip(keys, results) if lemmas is None))
+
+            for i, key in enumerate(keys):
+                if results[i] is not None:
+                    self.__entries.move_to_end(key)
+
+                elif key in stored:
+                    results[i] = stored[key]
+                    self.__remember(key, results[i])
+
+            hits = sum(lemmas is not None for lemmas in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def put(self, text, lemmas):
+        '''
+        Caches the lemmatized version of a text.
+
+        Parameters:
+            - text (String): Original text
+            - lemmas (String): Lemmatized text
+        '''
+        self.put_many([(text, lemmas)])
+
+    def put_many(self, entries):
+        '''
+        Caches the lemmatized version of some texts, persisting them with a single transaction.
+
+        Parameters:
+            - entries (List): List of (original text, lemmatized text) tuples
+        '''
+        entries = [(normalize_text(text), lemmas) for text, lemmas in entries]
+
+        with self.__lock:
+            for key, lemmas in entries:
+                self.__remember(key, lemmas)
+
+            self.__store(entries)
+
+    def __remember(self, key, lemmas):
+        '''
+        Stores an entry in memory, evicting the least recently used one if the cache is full.
+
+        Parameters:
+            - key (String): Normalized text
+            - lemmas (String): Lemmatized text
+        '''
+        self.__entries[key] = lemmas
+        self.__entries.move_to_end(key)
+
+        while len(self.__entries) > self.size:
+            self.__entries.popitem(last = False)
+
+    def stats(self):
+        '''
+        Returns the counters of the cache.
+
+        Returns:
+            Dictionary with the hits, misses, hit ratio and number of entries in memory
+        '''
+        with self.__lock:
+            requests = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "hit_ratio": self.hits / requests if requests else 0.0,
+                    "size": len(self.__entries)}
+
+    def clear(self):
+        '''
+        Removes all the entries of the cache, including the persisted ones, and resets the counters.
+        '''
+        with self.__lock:
+            self.__entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+            if self.__connection is not None:
+                self.__used.clear()
+                self.__rows = 0
+
+                with self.__connection:
+                    self.__connection.execute("DELETE FROM lemmas")
+
+    def close(self):
+        '''
+        Writes the pending last uses and closes the SQLite database, if any.
+        '''
+        with self.__lock:
+            if self.__connection is not None:
+                with self.__connection:
+                    self.__flush_used()
+
+                self.__connection.close()
+                self.__connection = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_lemma_cache():
+    '''
+    Returns the LemmaCache shared by the whole process, creating it the first time.
+
+    Returns:
+        LemmaCache object
+    '''
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = LemmaCache()
+            register_stats("lemma_cache", _cache.stats)
+            atexit.register(_cache.close)
+
+    return _cache
@@ -0,0 +1,357 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from ixapipes.tok import IxaPipesTokenizer
+from ixapipes.pos import IxaPipesPosTagger
+
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+POS_MODEL = 'morph-models-1.5.0/eu/eu-pos-perceptron-epec.bin'
+LEMMA_MODEL = 'morph-models-1.5.0/eu/eu-lemma-perceptron-epec.bin'
+
+POOL_SIZE = int(os.environ.get('LINGUO_LEMMATIZER_POOL_SIZE', 2))
+ACQUIRE_TIMEOUT = float(os.environ.get('LINGUO_LEMMATIZER_TIMEOUT', 30))
+
+# Each pair runs two IxaPipes servers, on ports BASE_PORT + 2 * i and BASE_PORT + 2 * i + 1
+BASE_PORT = int(os.environ.get('LINGUO_LEMMATIZER_BASE_PORT', 8890))
+
+# Seconds between two health checks of the idle pairs, 0 to only check the pairs that fail
+HEALTH_CHECK_INTERVAL = float(os.environ.get('LINGUO_LEMMATIZER_HEALTH_INTERVAL', 60))
+
+HEALTH_CHECK_TEXT = "Kaixo"
+
+
+def create_tools(port = BASE_PORT):
+    '''
+    Initializes tokenizer and lemmatizer objects. The tokenizer server listens on the given
+    port and the lemmatizer server on the next one. Sentences are not allowed to cross
+    paragraphs, so that texts lemmatized in batch get the same lemmas as one by one.
+
+    Parameters:
+        - port (int): Port of the tokenizer server
+
+    Returns:
+        - IxaPipesTokenizer: Tokenizer object for Basque language
+        - IxaPipesPosTagger: Lemmatizer object for Basque language
+    '''
+    tokenizer = IxaPipesTokenizer('eu', port = port, hardParagraph = True)
+    lemmatizer = IxaPipesPosTagger('eu', POS_MODEL, LEMMA_MODEL, port = port + 1)
+
+    return tokenizer, lemmatizer
+
+
+def close_tools(tools):
+    '''
+    Closes a tokenizer/lemmatizer pair, ignoring the errors of already dead tools.
+
+    Parameters:
+        - tools (Tuple): Tokenizer and lemmatizer objects
+    '''
+    for tool in tools:
+        try:
+            tool.close()
+
+        except Exception:
+            logger.debug("Error closing %s", tool, exc_info=True)
+
+
+def check_tools(tools):
+    '''
+    Checks whether a tokenizer/lemmatizer pair is still able to tag a short text.
+
+    Parameters:
+        - tools (Tuple): Tokenizer and lemmatizer objects
+
+    Returns:
+        True if the pair answered, False otherwise
+    '''
+    tokenizer, lemmatizer = tools
+
+    try:
+        tokens = tokenizer._run_text(HEALTH_CHECK_TEXT)
+        return bool(lemmatizer._run_text(tokens))
+
+    except Exception:
+        logger.warning("Lemmatizer health check failed", exc_info=True)
+        return False
+
+
+class LemmatizerPool:
+
+    def __init__(self, size = POOL_SIZE, factory = create_tools, timeout = ACQUIRE_TIMEOUT, base_port = BASE_PORT,
+                    health_interval = HEALTH_CHECK_INTERVAL):
+        '''
+        Constructor of LemmatizerPool object. Keeps up to size warm tokenizer/lemmatizer
+        pairs, so that a query only pays for the tagging itself. Once started, idle pairs
+        are checked every health_interval seconds, so that a dead IxaPipes server is
+        restarted before a query needs it.
+
+        Parameters:
+            - size (int): Maximum number of tokenizer/lemmatizer pairs
+            - factory (Callable): Function which creates a new tokenizer/lemmatizer pair given
+              the first of the two ports reserved for it
+            - timeout (float): Seconds to wait for a free pair before giving up
+            - base_port (int): First port of the IxaPipes servers of the pool
+            - health_interval (float): Seconds between two health checks of the idle pairs
+        '''
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self.size = size
+        self.factory = factory
+        self.timeout = timeout
+        self.health_interval = health_interval
+
+        # Idle pairs are stored as (port, tools), so that a pair is restarted on its own ports
+        self.__idle = queue.LifoQueue()
+        self.__free_ports = [base_port + 2 * i for i in reversed(range(size))]
+        self.__lock = threading.Lock()
+        self.__closed = False
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def __create(self, port):
+        '''
+        Creates a new pair, releasing its ports if the creation fails.
+
+        Parameters:
+            - port (int): First port reserved for the pair
+
+        Returns:
+            Tokenizer and lemmatizer objects
+        '''
+        try:
+            with span("lemmatizer_start"):
+                return self.factory(port)
+
+        except Exception:
+            self.__release(port)
+            raise
+
+    def __release(self, port):
+        '''
+        Frees the ports of a pair which no longer exists.
+
+        Parameters:
+            - port (int): First port reserved for the pair
+        '''
+        with self.__lock:
+            self.__free_ports.append(port)
+
+    def __checkout(self, timeout):
+        '''
+        Takes an idle pair from the pool. If there is none and the pool is not full,
+        a new pair is created, otherwise waits until one is returned.
+
+        Parameters:
+            - timeout (float): Seconds to wait for a free pair
+
+        Returns:
+            First port of the pair, and tokenizer and lemmatizer objects
+        '''
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError("Lemmatizer pool is closed")
+
+            try:
+                return self.__idle.get_nowait()
+
+            except queue.Empty:
+                port = self.__free_ports.pop() if self.__free_ports else None
+
+        if port is not None:
+            return port, self.__create(port)
+
+        try:
+            return self.__idle.get(timeout = timeout)
+
+        except queue.Empty:
+            raise RuntimeError("No lemmatizer available after " + str(timeout) + " seconds")
+
+    def __checkin(self, port, tools):
+        '''
+        Returns a pair to the pool. If the pool has been closed meanwhile, the pair is closed.
+
+        Parameters:
+            - port (int): First port of the pair
+            - tools (Tuple): Tokenizer and lemmatizer objects
+        '''
+        with self.__lock:
+            if not self.__closed:
+                self.__idle.put((port, tools))
+                return
+
+        close_tools(tools)
+        self.__release(port)
+
+    def __restart(self, port, tools):
+        '''
+        Closes a failed pair and replaces it by a new one on the same ports. If the new pair
+        can not be created, the ports are released.
+
+        Parameters:
+            - port (int): First port of the pair
+            - tools (Tuple): Tokenizer and lemmatizer objects
+
+        Returns:
+            New tokenizer and lemmatizer objects
+        '''
+        logger.warning("Restarting lemmatizer pair on port %d", port)
+        close_tools(tools)
+
+        try:
+            return self.__create(port)
+
+        except Exception:
+            logger.error("Lemmatizer pair could not be restarted", exc_info=True)
+            raise
+
+    @contextmanager
+    def acquire(self, timeout = None):
+        '''
+        Context manager which lends a warm tokenizer/lemmatizer pair. In case the block
+        fails and the pair does not pass the health check, it is restarted.
+
+        Parameters:
+            - timeout (float): Seconds to wait for a free pair. Defaults to self.timeout
+
+        Returns:
+            Tokenizer and lemmatizer objects
+        '''
+        with span("lemmatizer_acquire"):
+            port, tools = self.__checkout(self.timeout if timeout is None else timeout)
+
+        try:
+            yield tools
+
+        except Exception:
+            if not check_tools(tools):
+                tools = self.__restart(port, tools)
+
+            self.__checkin(port, tools)
+            raise
+
+        self.__checkin(port, tools)
+
+    def warm_up(self):
+        '''
+        Creates all the pairs of the pool in advance, so that the first queries do not
+        pay for the model loading.
+        '''
+        pairs = []
+        try:
+            for _ in range(self.size):
+                pairs.append(self.__checkout(self.timeout))
+
+        finally:
+            for port, tools in pairs:
+                self.__checkin(port, tools)
+
+    def health_check(self):
+        '''
+        Checks all the idle pairs, restarting the ones which do not answer.
+
+        Returns:
+            Number of healthy idle pairs after the check
+        '''
+        healthy = 0
+        pending = []
+
+        while True:
+            try:
+                pending.append(self.__idle.get_nowait())
+
+            except queue.Empty:
+                break
+
+        for port, tools in pending:
+            if not check_tools(tools):
+                try:
+                    tools = self.__restart(port, tools)
+
+                except Exception:
+                    continue
+
+            healthy += 1
+            self.__checkin(port, tools)
+
+        return healthy
+
+    def __run(self):
+        '''
+        Loop of the health check thread.
+        '''
+        while not self.__stop.wait(self.health_interval):
+            try:
+                self.health_check()
+
+            except Exception:
+                logger.error("Could not check the lemmatizer pairs", exc_info = True)
+
+    def start(self):
+        '''
+        Starts checking the idle pairs every self.health_interval seconds in a background thread.
+        '''
+        if self.health_interval <= 0 or (self.__thread is not None and self.__thread.is_alive()):
+            return
+
+        self.__stop.clear()
+        self.__thread = threading.Thread(target = self.__run, name = "lemmatizer-health-check", daemon = True)
+        self.__thread.start()
+
+    def stop(self):
+        '''
+        Stops the health check thread.
+        '''
+        self.__stop.set()
+
+        if self.__thread is not None:
+            self.__thread.join(timeout = 1.0)
+            self.__thread = None
+
+    def close(self):
+        '''
+        Stops the health checks and closes all the idle pairs. Pairs which are in use are
+        closed when they are returned.
+        '''
+        self.stop()
+
+        with self.__lock:
+            self.__closed = True
+
+        while True:
+            try:
+                port, tools = self.__idle.get_nowait()
+
+            except queue.Empty:
+                break
+
+            close_tools(tools)
+            self.__release(port)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_lemmatizer_pool():
+    '''
+    Returns the LemmatizerPool shared by the whole process, creating it the first time.
+
+    Returns:
+        LemmatizerPool object
+    '''
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = LemmatizerPool()
+            _pool.start()
+            atexit.register(_pool.close)
+
+    return _pool
@@ -0,0 +1,195 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Worker processes which lemmatize large sets of texts in parallel, 0 to disable them
+LEMMATIZER_PROCESSES = int(os.environ.get('LINGUO_LEMMATIZER_PROCESSES', 0))
+
+# Missing texts from which they are shared between the worker processes. Fewer texts are
+# lemmatized in the calling process, which is faster than sending them to the workers
+PARALLEL_MIN_TEXTS = int(os.environ.get('LINGUO_PARALLEL_MIN_TEXTS', 64))
+
+# Each worker runs its own IxaPipes servers, after the ports of the LemmatizerPool pairs
+PROCESS_BASE_PORT = int(os.environ.get('LINGUO_LEMMATIZER_PROCESS_BASE_PORT', 8950))
+
+# Tokenizer and lemmatizer of the worker process
+_worker_tools = None
+
+
+def init_worker(factory, base_port, counter):
+    '''
+    Creates the tokenizer/lemmatizer pair of a worker process, on the next free ports. The
+    pair is closed when the worker exits.
+
+    Parameters:
+        - factory (Callable): Function which creates a tokenizer/lemmatizer pair given the
+          first of the two ports reserved for it
+        - base_port (int): First port of the IxaPipes servers of the workers
+        - counter (multiprocessing.Value): Number of workers started so far by the pool
+    '''
+    global _worker_tools
+
+    from LemmatizerPool import close_tools
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    _worker_tools = factory(base_port + 2 * index)
+    Finalize(None, close_tools, args = (_worker_tools,), exitpriority = 10)
+
+
+def lemmatize_in_worker(texts):
+    '''
+    Lemmatizes a batch of texts with the pair of the worker process.
+
+    Parameters:
+        - texts (List): Normalized texts to lemmatize, none of them empty
+
+    Returns:
+        List with the lemmatized texts, in the same order
+    '''
+    from QuerySearcher import lemmatize_paragraphs
+
+    tokenizer, lemmatizer = _worker_tools
+    return lemmatize_paragraphs(texts, tokenizer, lemmatizer)
+
+
+def warm_up_worker(seconds):
+    '''
+    Keeps a worker busy for some time, so that all the workers are started.
+    '''
+    import time
+
+    time.sleep(seconds)
+
+    return os.getpid()
+
+
+class LemmatizerProcessPool:
+
+    def __init__(self, processes = LEMMATIZER_PROCESSES, factory = None, base_port = PROCESS_BASE_PORT,
+                    min_texts = PARALLEL_MIN_TEXTS):
+        '''
+        Constructor of LemmatizerProcessPool object. Shares the batches of a large set of
+        texts, such as all the headlines of the day, between worker processes which hold
+        their own warm tokenizer/lemmatizer pair, so that the tagging and the parsing of
+        the NAF files use several cores. Workers are started with the first set of texts.
+
+        Parameters:
+            - processes (int): Number of worker processes
+            - factory (Callable): Picklable function which creates a tokenizer/lemmatizer pair
+              given the first of the two ports reserved for it. Defaults to the IxaPipes tools
+            - base_port (int): First port of the IxaPipes servers of the workers. Each worker
+              uses two consecutive ports
+            - min_texts (int): Minimum number of texts to share them between the workers
+        '''
+        if processes < 1:
+            raise ValueError("Number of processes must be at least 1")
+
+        if factory is None:
+            from LemmatizerPool import create_tools
+            factory = create_tools
+
+        self.processes = processes
+        self.factory = factory
+        self.base_port = base_port
+        self.min_texts = min_texts
+
+        self.__executor = None
+        self.__counter = None
+        self.__lock = threading.Lock()
+
+    def __get_executor(self):
+        '''
+        Returns the executor of the workers, creating it the first time or after it broke.
+        The workers of a new executor take the ports after the ones of the previous
+        executors, whose workers may still be closing their IxaPipes servers.
+        '''
+        with self.__lock:
+            if self.__executor is None:
+                # Fork is avoided, as the action server runs threads which may hold locks
+                context = multiprocessing.get_context('spawn')
+
+                if self.__counter is None:
+                    self.__counter = context.Value('i', 0)
+
+                self.__executor = ProcessPoolExecutor(self.processes, mp_context = context, initializer = init_worker,
+                                                        initargs = (self.factory, self.base_port, self.__counter))
+
+            return self.__executor
+
+    def lemmatize(self, batches):
+        '''
+        Lemmatizes batches of texts in the worker processes, each batch with a single
+        IxaPipes round trip.
+
+        Parameters:
+            - batches (List): Batches of normalized texts, none of them empty
+
+        Returns:
+            List with the lemmatized texts of every batch, in the same order
+        '''
+        executor = self.__get_executor()
+
+        try:
+            with span("lemmatize_parallel"):
+                return list(executor.map(lemmatize_in_worker, batches))
+
+        except Exception:
+            # A broken pool can not be used again, so it is replaced on the next call
+            with self.__lock:
+                if self.__executor is executor:
+                    self.__executor = None
+
+            executor.shutdown(wait = False)
+            raise
+
+    def warm_up(self):
+        '''
+        Starts all the worker processes and their pairs in advance.
+        '''
+        executor = self.__get_executor()
+        list(executor.map(warm_up_worker, [0.1] * self.processes))
+
+    def close(self):
+        '''
+        Stops the worker processes, which close their pairs.
+        '''
+        with self.__lock:
+            executor = self.__executor
+            self.__executor = None
+
+        if executor is not None:
+            executor.shutdown()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_lemmatizer_process_pool():
+    '''
+    Returns the LemmatizerProcessPool shared by the whole process, creating it the first time.
+
+    Returns:
+        LemmatizerProcessPool object, or None if LINGUO_LEMMATIZER_PROCESSES is 0
+    '''
+    global _pool
+
+    if LEMMATIZER_PROCESSES < 1:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = LemmatizerProcessPool()
+            atexit.register(_pool.close)
+
+    return _pool
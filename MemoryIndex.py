@@ -0,0 +1,252 @@
+import math
+import threading
+from collections import Counter
+
+# Same parameters as Whoosh's default BM25F scoring
+BM25_B = 0.75
+BM25_K1 = 1.2
+
+
+class MemoryIndex:
+
+    def __init__(self, scoring = "bm25"):
+        '''
+        Constructor of MemoryIndex object. Keeps the inverted postings of a small set of
+        lemmatized documents in memory, so that searches need no disk I/O.
+
+        Parameters:
+            - scoring (String): "bm25" to rank like Whoosh, requiring all the query terms, or
+              "overlap" to rank by the number of shared terms
+        '''
+        if scoring not in ("bm25", "overlap"):
+            raise ValueError("Unknown scoring: " + str(scoring))
+
+        self.scoring = scoring
+        self.documents = []
+        self.postings = {}
+        self.lengths = []
+        self.average_length = 0.0
+
+    def update(self, documents):
+        '''
+        Rebuilds the postings if the set of lemmatized documents has changed.
+
+        Parameters:
+            - documents (List): List of all the lemmatized documents
+
+        Returns:
+            True if the index has been modified, False otherwise
+        '''
+        # Keep the first appearance of each document, as Whoosh keeps insertion order
+        documents = list(dict.fromkeys(document for document in documents if document.strip()))
+
+        if documents == self.documents:
+            return False
+
+        postings = {}
+        lengths = []
+
+        for docnum, document in enumerate(documents):
+            terms = document.split()
+            lengths.append(len(terms))
+
+            for term, frequency in Counter(terms).items():
+                postings.setdefault(term, []).append((docnum, frequency))
+
+        self.documents = documents
+        self.postings = postings
+        self.lengths = lengths
+        self.average_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+        return True
+
+    def __bm25(self, terms):
+        '''
+        Scores the documents which contain all the query terms with BM25.
+
+        Parameters:
+            - terms (List): Terms of the lemmatized query
+
+        Returns:
+            Dictionary where the key is the document number and the value its score
+        '''
+        n_documents = len(self.documents)
+        scores = None
+
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                return {}
+
+            idf = math.log(n_documents / (len(postings) + 1)) + 1
+            term_scores = {}
+
+            for docnum, frequency in postings:
+                norm = (1 - BM25_B) + BM25_B * self.lengths[docnum] / self.average_length
+                term_scores[docnum] = idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * norm)
+
+            if scores is None:
+                scores = term_scores
+
+            else:
+                scores = {docnum: score + term_scores[docnum] for docnum, score in scores.items()
+                            if docnum in term_scores}
+
+        return scores or {}
+
+    def __overlap(self, terms):
+        '''
+        Scores the documents by the number of distinct query terms they contain.
+
+        Parameters:
+            - terms (List): Terms of the lemmatized query
+
+        Returns:
+            Dictionary where the key is the document number and the value its score
+        '''
+        scores = Counter()
+
+        for term in set(terms):
+            for docnum, _ in self.postings.get(term, []):
+                scores[docnum] += 1
+
+        return scores
+
+    def search(self, query):
+        '''
+        Given a lemmatized query, returns the closest lemmatized document. Ties are broken by
+        document order.
+
+        Parameters:
+            - query (String): Lemmatized user query
+
+        Returns:
+            String with the closest lemmatized document. In case no documents are found, None is returned
+        '''
+        terms = query.split()
+        if not terms or not self.documents:
+            return None
+
+        if self.scoring == "bm25":
+            scores = self.__bm25(terms)
+
+        else:
+            scores = self.__overlap(terms)
+
+        if not scores:
+            return None
+
+        docnum = min(scores, key = lambda docnum: (-scores[docnum], docnum))
+        return self.documents[docnum]
+
+
+class MemoryIndexManager:
+
+    def __init__(self, scoring = "bm25"):
+        '''
+        Constructor of MemoryIndexManager object. Has the same interface as IndexManager, but
+        keeps every index in memory.
+
+        Parameters:
+            - scoring (String): Scoring used by the indexes, "bm25" or "overlap"
+        '''
+        self.scoring = scoring
+
+        self.__indexes = {}
+        self.__lock = threading.Lock()
+
+    def __get(self, name):
+        '''
+        Returns the MemoryIndex of the given name, creating it the first time.
+
+        Parameters:
+            - name (String): Name of the index
+
+        Returns:
+            MemoryIndex object
+        '''
+        with self.__lock:
+            index = self.__indexes.get(name)
+
+            if index is None:
+                index = MemoryIndex(self.scoring)
+                self.__indexes[name] = index
+
+        return index
+
+    def update(self, name, documents):
+        '''
+        Makes the index contain exactly the given lemmatized documents.
+
+        Parameters:
+            - name (String): Name of the index
+            - documents (List): List of all the lemmatized documents
+
+        Returns:
+            True if the index has been modified, False otherwise
+        '''
+        index = self.__get(name)
+
+        with self.__lock:
+            return index.update(documents)
+
+    def search(self, name, query):
+        '''
+        Given a lemmatized query, returns the closest lemmatized document of the index.
+
+        Parameters:
+            - name (String): Name of the index
+            - query (String): Lemmatized user query
+
+        Returns:
+            String with the closest lemmatized document. In case no documents are found, None is returned
+        '''
+        index = self.__get(name)
+
+        with self.__lock:
+            return index.search(query)
+
+    def update_and_search(self, name, documents, query):
+        '''
+        Updates the index with the given lemmatized documents and searches the query on them,
+        holding the lock in between.
+
+        Parameters:
+            - name (String): Name of the index
+            - documents (List): List of all the lemmatized documents
+            - query (String): Lemmatized user query
+
+        Returns:
+            String with the closest lemmatized document. In case no documents are found, None is returned
+        '''
+        index = self.__get(name)
+
+        with self.__lock:
+            index.update(documents)
+            return index.search(query)
+
+    def close(self):
+        '''
+        Removes all the indexes.
+        '''
+        with self.__lock:
+            self.__indexes = {}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_memory_index_manager():
+    '''
+    Returns the MemoryIndexManager shared by the whole process, creating it the first time.
+
+    Returns:
+        MemoryIndexManager object
+    '''
+    global _manager
+
+    with _manager_lock:
+        if _manager is None:
+            _manager = MemoryIndexManager()
+
+    return _manager
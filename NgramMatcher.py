@@ -0,0 +1,311 @@
+import importlib.util
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from LemmaCache import normalize_text
+from metrics import register_stats
+
+logger = logging.getLogger(__name__)
+
+# If enabled, queries are first matched by their character n-grams, and only lemmatized if
+# the match is not confident enough
+NGRAM_MATCHER = os.environ.get('LINGUO_NGRAM_MATCHER', '0') == '1'
+
+# NumPy is installed with Rasa, but the matcher is optional
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+# Minimum cosine similarity for a match to be trusted without the lemmatized search
+NGRAM_THRESHOLD = float(os.environ.get('LINGUO_NGRAM_THRESHOLD', 0.6))
+
+# Same features as the CountVectorsFeaturizer of config.yml
+MIN_NGRAM = 1
+MAX_NGRAM = 4
+
+# Number of sets of documents whose matrix is kept, e.g. the topics and the headlines of a snapshot
+MATRIX_CACHE_SIZE = 32
+
+NON_WORD_RE = re.compile(r'[^\w]+')
+
+
+def normalize_query(text):
+    '''
+    Normalizes a query or a document, ignoring case and punctuation.
+
+    Parameters:
+        - text (String): Query or document
+
+    Returns:
+        Normalized text
+    '''
+    return normalize_text(NON_WORD_RE.sub(" ", text.casefold()))
+
+
+def get_ngrams(text, min_n = MIN_NGRAM, max_n = MAX_NGRAM):
+    '''
+    Returns the character n-grams of the words of a normalized text, each word padded with
+    spaces, like the "char_wb" analyzer of the NLU pipeline.
+
+    Parameters:
+        - text (String): Normalized text
+        - min_n (int): Minimum length of the n-grams
+        - max_n (int): Maximum length of the n-grams
+
+    Returns:
+        Counter with the frequency of every n-gram
+    '''
+    ngrams = Counter()
+
+    for word in text.split():
+        word = " " + word + " "
+
+        for n in range(min_n, max_n + 1):
+            ngrams.update(word[i:i + n] for i in range(len(word) - n + 1))
+
+    return ngrams
+
+
+class NgramMatcher:
+
+    def __init__(self, documents, threshold = NGRAM_THRESHOLD, min_n = MIN_NGRAM, max_n = MAX_NGRAM):
+        '''
+        Constructor of NgramMatcher object. Builds once the TF-IDF matrix of the character
+        n-grams of the documents, stored by column in CSR-style arrays, so that scoring a
+        query is a single sparse product with NumPy. Declined words share most of their
+        n-grams, so no lemmatization is needed.
+
+        Parameters:
+            - documents (List): Documents to match, e.g. the topics or the headlines
+            - threshold (float): Minimum cosine similarity of a confident match
+            - min_n (int): Minimum length of the n-grams
+            - max_n (int): Maximum length of the n-grams
+
+        Raises:
+            ImportError if NumPy is not installed
+        '''
+        import numpy as np
+
+        self.np = np
+        self.documents = list(documents)
+        self.threshold = threshold
+        self.min_n = min_n
+        self.max_n = max_n
+
+        counts = [get_ngrams(normalize_query(document), min_n, max_n) for document in self.documents]
+
+        document_frequency = Counter()
+        for document_counts in counts:
+            document_frequency.update(document_counts.keys())
+
+        # Smoothed idf, as if a document contained every n-gram. Unknown n-grams of a query
+        # get the idf of an n-gram which appears in no document
+        n_documents = len(self.documents)
+        self.vocabulary = {ngram: column for column, ngram in enumerate(sorted(document_frequency))}
+        self.idf = np.array([math.log((1 + n_documents) / (1 + document_frequency[ngram])) + 1
+                                for ngram in sorted(document_frequency)], dtype = np.float64)
+        self.unknown_idf = math.log(1 + n_documents) + 1
+
+        # Entries of the L2 normalized rows, grouped by column
+        columns = []
+        rows = []
+        values = []
+
+        for row, document_counts in enumerate(counts):
+            if not document_counts:
+                continue
+
+            document_columns = np.fromiter((self.vocabulary[ngram] for ngram in document_counts), dtype = np.int64,
+                                            count = len(document_counts))
+            weights = np.fromiter(document_counts.values(), dtype = np.float64,
+                                    count = len(document_counts)) * self.idf[document_columns]
+
+            columns.append(document_columns)
+            rows.append(np.full(len(document_columns), row, dtype = np.int64))
+            values.append(weights / np.linalg.norm(weights))
+
+        columns = np.concatenate(columns) if columns else np.zeros(0, dtype = np.int64)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype = np.int64)
+        values = np.concatenate(values) if values else np.zeros(0, dtype = np.float64)
+
+        order = np.argsort(columns, kind = 'stable')
+        self.rows = rows[order]
+        self.values = values[order]
+        self.indptr = np.zeros(len(self.vocabulary) + 1, dtype = np.int64)
+        np.cumsum(np.bincount(columns, minlength = len(self.vocabulary)), out = self.indptr[1:])
+
+    def score(self, query):
+        '''
+        Returns the cosine similarity of the query with every document.
+
+        Parameters:
+            - query (String): User query
+
+        Returns:
+            NumPy array with the similarity of every document, in the same order
+        '''
+        np = self.np
+        query_counts = get_ngrams(normalize_query(query), self.min_n, self.max_n)
+        scores = np.zeros(len(self.documents), dtype = np.float64)
+
+        known = [(self.vocabulary[ngram], count) for ngram, count in query_counts.items() if ngram in self.vocabulary]
+        unknown = [count for ngram, count in query_counts.items() if ngram not in self.vocabulary]
+
+        if not known:
+            return scores
+
+        query_columns = np.array([column for column, _ in known], dtype = np.int64)
+        weights = np.array([count for _, count in known], dtype = np.float64) * self.idf[query_columns]
+
+        # Unknown n-grams make the query less similar to every document
+        norm = math.sqrt(float(weights @ weights) + sum((count * self.unknown_idf) ** 2 for count in unknown))
+        weights /= norm
+
+        # Gather the entries of the query columns and add them up by row
+        starts = self.indptr[query_columns]
+        lengths = self.indptr[query_columns + 1] - starts
+        total = int(lengths.sum())
+
+        if total == 0:
+            return scores
+
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return np.bincount(self.rows[offsets], weights = self.values[offsets] * np.repeat(weights, lengths),
+                            minlength = len(self.documents))
+
+    def match(self, query):
+        '''
+        Returns the closest document to the query, if the match is confident enough.
+
+        Parameters:
+            - query (String): User query
+
+        Returns:
+            Closest document and its similarity. In case the best similarity is below
+            self.threshold, or shared by two different documents, None is returned
+        '''
+        if not self.documents:
+            return None
+
+        scores = self.score(query)
+        best = int(scores.argmax())
+
+        if scores[best] < self.threshold:
+            return None
+
+        if len(scores) > 1:
+            second = self.np.partition(scores, -2)[-2]
+            tied = self.np.flatnonzero(scores == scores[best])
+
+            if second == scores[best] and len({self.documents[i] for i in tied}) > 1:
+                return None
+
+        return self.documents[best], float(scores[best])
+
+
+class NgramMatcherCache:
+
+    def __init__(self, size = MATRIX_CACHE_SIZE, threshold = NGRAM_THRESHOLD):
+        '''
+        Constructor of NgramMatcherCache object. Keeps the matchers of the last sets of
+        documents, so that the matrix of a snapshot of the headlines is only built once.
+
+        Parameters:
+            - size (int): Maximum number of cached matchers
+            - threshold (float): Minimum cosine similarity of a confident match
+        '''
+        self.size = size
+        self.threshold = threshold
+        self.matches = 0
+        self.fallbacks = 0
+
+        self.__matchers = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, documents):
+        '''
+        Returns the matcher of a set of documents, building it the first time.
+
+        Parameters:
+            - documents (List): Documents to match
+
+        Returns:
+            NgramMatcher object
+        '''
+        key = tuple(documents)
+
+        with self.__lock:
+            matcher = self.__matchers.get(key)
+
+            if matcher is not None:
+                self.__matchers.move_to_end(key)
+                return matcher
+
+        matcher = NgramMatcher(key, self.threshold)
+
+        with self.__lock:
+            self.__matchers[key] = matcher
+
+            while len(self.__matchers) > self.size:
+                self.__matchers.popitem(last = False)
+
+        return matcher
+
+    def match(self, documents, query):
+        '''
+        Returns the closest document to the query, if the match is confident enough.
+
+        Parameters:
+            - documents (List): Documents to match
+            - query (String): User query
+
+        Returns:
+            Closest document, or None if the lemmatized search is needed
+        '''
+        result = self.get(documents).match(query)
+
+        with self.__lock:
+            if result is None:
+                self.fallbacks += 1
+
+            else:
+                self.matches += 1
+
+        return result[0] if result is not None else None
+
+    def stats(self):
+        '''
+        Returns the counters of the matcher.
+
+        Returns:
+            Dictionary with the confident matches, the fallbacks to the lemmatized search and
+            the cached matrices
+        '''
+        with self.__lock:
+            return {"matches": self.matches, "fallbacks": self.fallbacks, "matrices": len(self.__matchers)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_ngram_matcher_cache():
+    '''
+    Returns the NgramMatcherCache shared by the whole process, creating it the first time.
+
+    Returns:
+        NgramMatcherCache object, or None if LINGUO_NGRAM_MATCHER is disabled or NumPy is
+        not installed
+    '''
+    global _cache
+
+    if not NGRAM_MATCHER or not NUMPY_AVAILABLE:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = NgramMatcherCache()
+            register_stats("ngram_matcher", _cache.stats)
+
+    return _cache
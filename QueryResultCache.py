@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+
+from LemmaCache import normalize_text
+from TTLCache import TTLCache
+from metrics import register_stats
+
+QUERY_CACHE_SIZE = int(os.environ.get('LINGUO_QUERY_CACHE_SIZE', 1024))
+QUERY_CACHE_TTL = float(os.environ.get('LINGUO_QUERY_CACHE_TTL', 600))
+
+# Stored for the queries which found no document, as they are asked again too
+NO_RESULT = object()
+
+
+def get_fingerprint(documents):
+    '''
+    Returns a fingerprint of a list of candidate documents, which changes whenever one of
+    them is added, removed or changed.
+
+    Parameters:
+        - documents (List): Candidate documents
+
+    Returns:
+        String with the fingerprint
+    '''
+    digest = hashlib.sha1()
+
+    for document in documents:
+        digest.update(document.encode('utf-8'))
+        digest.update(b'\0')
+
+    return digest.hexdigest()
+
+
+class QueryResultCache:
+
+    def __init__(self, size = QUERY_CACHE_SIZE, ttl = QUERY_CACHE_TTL):
+        '''
+        Constructor of QueryResultCache object. Stores the document found for a query among
+        a set of candidate documents. Keys include the fingerprint of the candidates, so
+        that a new snapshot of a section never gets the results of the previous one.
+
+        Parameters:
+            - size (int): Maximum number of cached results
+            - ttl (float): Seconds a result is valid
+        '''
+        self.cache = TTLCache(size, ttl)
+
+    def get_key(self, query, documents):
+        '''
+        Returns the key of a query among some candidate documents. Queries which only differ
+        in whitespace or Unicode composition, which get the same lemmas, share the key.
+
+        Parameters:
+            - query (String): User query
+            - documents (List): Candidate documents
+
+        Returns:
+            Tuple with the normalized query and the fingerprint of the documents
+        '''
+        return normalize_text(query), get_fingerprint(documents)
+
+    def get(self, key):
+        '''
+        Returns the cached result of a key.
+
+        Parameters:
+            - key (Tuple): Key returned by get_key
+
+        Returns:
+            Cached document, NO_RESULT if no document was found, or None if the key is not cached
+        '''
+        return self.cache.get(key)
+
+    def put(self, key, result):
+        '''
+        Caches the result of a key.
+
+        Parameters:
+            - key (Tuple): Key returned by get_key
+            - result (String): Document found, or None if no document was found
+        '''
+        self.cache.put(key, NO_RESULT if result is None else result)
+
+    def stats(self):
+        return self.cache.stats()
+
+    def clear(self):
+        self.cache.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_query_result_cache():
+    '''
+    Returns the QueryResultCache shared by the whole process, creating it the first time.
+
+    Returns:
+        QueryResultCache object, or None if LINGUO_QUERY_CACHE_SIZE is 0
+    '''
+    global _cache
+
+    if QUERY_CACHE_SIZE < 1:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryResultCache()
+            register_stats("query_result_cache", _cache.stats)
+
+    return _cache
@@ -1,14 +1,21 @@
 
-from whoosh.fields import Schema, KEYWORD
-from whoosh.index import create_in
-from whoosh.qparser import QueryParser
+from LemmaCache import get_lemma_cache, normalize_text
+from QueryResultCache import NO_RESULT, get_query_result_cache
+from metrics import increment, span, timed
+from scrapper import get_lemmatized_paragraphs, get_lemmatized_text
 
-from ixapipes.tok import IxaPipesTokenizer
-from ixapipes.pos import IxaPipesPosTagger
+import logging
+import os
 
-from scrapper import get_lemmatized_text
+logger = logging.getLogger(__name__)
 
-import os.path
+SEARCH_BACKEND = os.environ.get('LINGUO_SEARCH_BACKEND', 'whoosh')
+
+LEMMATIZE_BATCH_SIZE = int(os.environ.get('LINGUO_LEMMATIZE_BATCH_SIZE', 32))
+
+# IxaPipes passes the whole input of a call as a single shell argument, which Linux limits
+# to 128 KiB, and the NAF file of the tokenizer is much longer than the original text
+LEMMATIZE_BATCH_CHARS = int(os.environ.get('LINGUO_LEMMATIZE_BATCH_CHARS', 4000))
 
 topics = ["Azken berriak", "Berri irakurrienak", "Gizartea", "Politika", "Ekonomia", "Mundua", "Iritzia"
             , "Kultura", "Kirola", "Bizigiro"]
@@ -18,15 +25,93 @@ articles = ["Akusatuek uste dute auzia «torturak pozoituta» dagoela hastapenet
             "Bederatzi lagun hil dira Suedian, hegazkin istripu batean", 
             "Agustin Ibarrolaren 'Gernika' erosi du Bilboko Arte Ederren Museoak"]
 
+def lemmatize_text(text, tokenizer, lemmatizer):
+    '''
+    Lemmatizes a single text with IxaPipes
+
+    Parameters:
+        - text (String): Text to lemmatize
+        - tokenizer (IxaPipesTokenizer): Tokenizer object
+        - lemmatizer (IxaPipesPosTagger): Lemmatizer object
+
+    Returns:
+        String which contains the lemmatized text
+    '''
+    with span("ixapipes_tokenize"):
+        tokens = tokenizer._run_text(text)
+
+    with span("ixapipes_tag"):
+        naf_text = lemmatizer._run_text(tokens)
+
+    increment("ixapipes_round_trips")
+    lemmatized_text = get_lemmatized_text(str(naf_text))
+    return lemmatized_text
+
+
+def lemmatize_paragraphs(texts, tokenizer, lemmatizer):
+    '''
+    Lemmatizes several texts with a single IxaPipes round trip. Texts are sent as separate
+    paragraphs and the lemmas of each paragraph are mapped back to its text. In case the
+    paragraphs do not match the texts, they are lemmatized one by one.
+
+    Parameters:
+        - texts (List): Normalized texts to lemmatize, none of them empty
+        - tokenizer (IxaPipesTokenizer): Tokenizer object
+        - lemmatizer (IxaPipesPosTagger): Lemmatizer object
+
+    Returns:
+        List with the lemmatized texts, in the same order
+    '''
+    if len(texts) == 1:
+        return [lemmatize_text(texts[0], tokenizer, lemmatizer)]
+
+    with span("ixapipes_tokenize"):
+        tokens = tokenizer._run_text("\n\n".join(texts))
+
+    with span("ixapipes_tag"):
+        naf_text = lemmatizer._run_text(tokens)
+
+    increment("ixapipes_round_trips")
+    lemmatized_texts = get_lemmatized_paragraphs(str(naf_text))
+
+    if len(lemmatized_texts) != len(texts):
+        logger.warning("Got %d paragraphs for %d texts, lemmatizing them one by one",
+                        len(lemmatized_texts), len(texts))
+        return [lemmatize_text(text, tokenizer, lemmatizer) for text in texts]
+
+    return lemmatized_texts
+
+
 class QuerySearcher:
 
-    def __init__(self, documents = []):
+    def __init__(self, documents = [], lemmatizer_pool = None, lemma_cache = None, index_name = None,
+                    index_manager = None, backend = SEARCH_BACKEND, batch_size = LEMMATIZE_BATCH_SIZE,
+                    process_pool = None, ngram_matchers = None, result_cache = None):
         '''
         Constructor of QuerySearcher object. If no documents are given, the list is filled
         with predefined values.
 
         Parameters:
             - documents (List): List of the documents to search
+            - lemmatizer_pool (LemmatizerPool): Pool of warm tokenizer/lemmatizer pairs. If not
+              given, the pool shared by the whole process is used
+            - lemma_cache (LemmaCache): Cache of lemmatized texts. If not given, the cache shared
+              by the whole process is used
+            - index_name (String): Name of the persistent index of the documents, e.g. the topic of
+              the articles. Defaults to "topics" for the predefined values and to "documents" otherwise
+            - index_manager (IndexManager): Manager of the indexes. If not given, the manager of
+              the backend shared by the whole process is used
+            - backend (String): "whoosh" to search on persistent Whoosh indexes, or "memory" to
+              search on in-memory postings, which is faster for small sets of documents
+            - batch_size (int): Maximum number of documents lemmatized with a single IxaPipes round trip
+            - process_pool (LemmatizerProcessPool): Worker processes which lemmatize large sets of
+              documents in parallel. If not given, the pool shared by the whole process is used,
+              if enabled
+            - ngram_matchers (NgramMatcherCache): Matchers of the character n-grams, which answer
+              confident queries without lemmatizing them. If not given, the matchers shared by
+              the whole process are used, if enabled
+            - result_cache (QueryResultCache): Cache of the documents found for the queries. If
+              not given, the cache shared by the whole process is used, if enabled
         '''
         if documents == []:
             self.documents = ["Azken berriak", 
@@ -40,96 +125,203 @@ class QuerySearcher:
                             "Kirola", 
                             "Bizigiro"]
 
+            default_index_name = "topics"
+
         else:
             self.documents = documents
 
+            default_index_name = "documents"
+
+        self.index_name = index_name or default_index_name
+
         self.dict_documents = {}
+
+        # IxaPipes and Whoosh are imported when first needed, so that importing this module
+        # does not slow down the startup of the action server
+        if lemmatizer_pool is None:
+            from LemmatizerPool import get_lemmatizer_pool
+            lemmatizer_pool = get_lemmatizer_pool()
+
+        self.lemmatizer_pool = lemmatizer_pool
+
+        if lemma_cache is None:
+            lemma_cache = get_lemma_cache()
+
+        self.lemma_cache = lemma_cache
+
+        if index_manager is None:
+            if backend == "whoosh":
+                from IndexManager import get_index_manager
+                index_manager = get_index_manager()
+
+            elif backend == "memory":
+                from MemoryIndex import get_memory_index_manager
+                index_manager = get_memory_index_manager()
+
+            else:
+                raise ValueError("Unknown search backend: " + str(backend))
+
+        self.index_manager = index_manager
+
+        if process_pool is None:
+            from LemmatizerProcessPool import get_lemmatizer_process_pool
+            process_pool = get_lemmatizer_process_pool()
+
+        self.process_pool = process_pool
+
+        if ngram_matchers is None:
+            from NgramMatcher import get_ngram_matcher_cache
+            ngram_matchers = get_ngram_matcher_cache()
+
+        self.ngram_matchers = ngram_matchers
+
+        if result_cache is None:
+            result_cache = get_query_result_cache()
+
+        self.result_cache = result_cache
+
+        self.batch_size = batch_size
+        self.batch_chars = LEMMATIZE_BATCH_CHARS
     
 
-    def __lemmatize_query(self, query, tokenizer, lemmatizer):
+    def __split_batches(self, texts, batch_size):
         '''
-        Lemmatizes the query given by the user
+        Splits texts in batches of at most batch_size texts and self.batch_chars characters.
 
         Parameters:
-            - query (String): Query given by the user
-            - tokenizer (IxaPipesTokenizer): Tokenizer object
-            - lemmatizer (IxaPipesPosTagger): Lemmatizer object
+            - texts (List): Texts to split
+            - batch_size (int): Maximum number of texts of a batch
 
         Returns:
-            String which contains the lemmatized user query 
+            List of batches
         '''
-        tokens = tokenizer._run_text(query)
-        naf_text = lemmatizer._run_text(tokens)
-        lemmatized_text = get_lemmatized_text(str(naf_text))
-        return lemmatized_text
+        batches = []
+        batch = []
+        chars = 0
+
+        for text in texts:
+            if batch and (len(batch) >= batch_size or chars + len(text) > self.batch_chars):
+                batches.append(batch)
+                batch = []
+                chars = 0
+
+            batch.append(text)
+            chars += len(text)
+
+        if batch:
+            batches.append(batch)
 
-    def __lemmatize_documents(self, tokenizer, lemmatizer):
+        return batches
+
+    @timed("lemmatize_batch")
+    def lemmatize_batch(self, texts, batch_size = None):
         '''
-        Lemmatizes all the documents stored at self.documents attribute. self.dict_documents is filled 
-        where: key = lemmatized document, value = original document
+        Lemmatizes a list of texts. Cached texts are taken from self.lemma_cache, and a
+        tokenizer/lemmatizer pair is only borrowed from the pool if some text is missing.
+        Missing texts are packed in batches, each of them lemmatized with a single IxaPipes
+        round trip, which gives the same lemmas as lemmatizing them one by one.
 
         Parameters:
-            - tokenizer (IxaPipesTokenizer): Tokenizer object
-            - lemmatizer (IxaPipesPosTagger): Lemmatizer object
+            - texts (List): Texts to lemmatize
+            - batch_size (int): Maximum number of texts per IxaPipes round trip. Defaults to
+              self.batch_size; 1 lemmatizes the texts one by one
 
         Returns:
-            List with all the lemmatized documents 
+            List with the lemmatized texts, in the same order
         '''
-        documents = []
-        for document in self.documents:
-            tokens = tokenizer._run_text(document)
-            naf_text = lemmatizer._run_text(tokens)
-            lemmatized_text = get_lemmatized_text(naf_text)
-            documents.append(lemmatized_text)
-            self.dict_documents[lemmatized_text] = document
+        batch_size = batch_size or self.batch_size
+        texts = list(texts)
+        lemmatized_texts = self.lemma_cache.get_many(texts)
+
+        # Key: normalized missing text, value: positions of the text
+        missing = {}
+        for i, lemmatized_text in enumerate(lemmatized_texts):
+            if lemmatized_text is None:
+                text = normalize_text(texts[i])
 
-        return documents
+                # Empty texts have no lemmas, so they are not sent to IxaPipes
+                if not text:
+                    lemmatized_texts[i] = ""
 
-    def __initialize_tools(self):
+                else:
+                    missing.setdefault(text, []).append(i)
+
+        if missing:
+            increment("lemmatized_texts", len(missing))
+            batches = self.__split_batches(list(missing), batch_size)
+
+            entries = []
+
+            for batch, lemmatized_batch in zip(batches, self.__lemmatize_batches(batches)):
+                for text, lemmatized_text in zip(batch, lemmatized_batch):
+                    entries.append((text, lemmatized_text))
+
+                    for i in missing[text]:
+                        lemmatized_texts[i] = lemmatized_text
+
+            self.lemma_cache.put_many(entries)
+
+        return lemmatized_texts
+
+    def __lemmatize_batches(self, batches):
         '''
-        Initializes tokenizer and lemmatizer objects.
+        Lemmatizes batches of texts. Large sets of texts are shared between the worker
+        processes of self.process_pool, and otherwise all the batches are lemmatized with a
+        single pair of self.lemmatizer_pool.
+
+        Parameters:
+            - batches (List): Batches of normalized texts
 
         Returns:
-            - IxaPipesTokenizer: Tokenizer object for Basque language
-            - IxaPipesPosTagger: Lemmatizer object for Basque language
+            List with the lemmatized texts of every batch, in the same order
         '''
-        tokenizer = IxaPipesTokenizer('eu')
-        lemmatizer = IxaPipesPosTagger('eu',
-                                    'morph-models-1.5.0/eu/eu-pos-perceptron-epec.bin',
-                                    'morph-models-1.5.0/eu/eu-lemma-perceptron-epec.bin')
+        texts = sum(len(batch) for batch in batches)
 
-        return tokenizer, lemmatizer
+        if self.process_pool is not None and len(batches) > 1 and texts >= self.process_pool.min_texts:
+            try:
+                return self.process_pool.lemmatize(batches)
 
-    
-    def __initialize_documents_schema(self, documents):
+            except Exception:
+                logger.warning("Parallel lemmatization failed, lemmatizing in this process", exc_info = True)
+
+        # Borrow a warm tokenizer/lemmatizer pair instead of loading the models again
+        with self.lemmatizer_pool.acquire() as (tokenizer, lemmatizer):
+            return [lemmatize_paragraphs(batch, tokenizer, lemmatizer) for batch in batches]
+
+    def __lemmatize_query(self, query):
         '''
-        Initializes Whoosh schema with the lemmatized documents
+        Lemmatizes the query given by the user
 
         Parameters:
-            - documents (List): List of all the lemmatized documents
+            - query (String): Query given by the user
 
         Returns:
-            Whoosh writer object
+            String which contains the lemmatized user query 
         '''
-        schema = Schema(document = KEYWORD(stored=True))
-    
-        if not os.path.exists("index"):
-            os.mkdir("index")
+        return self.lemmatize_batch([query])[0]
 
-        ix = create_in("index", schema)
+    def __lemmatize_documents(self):
+        '''
+        Lemmatizes all the documents stored at self.documents attribute. self.dict_documents is filled 
+        where: key = lemmatized document, value = original document
 
-        writer = ix.writer()
+        Returns:
+            List with all the lemmatized documents 
+        '''
+        documents = list(self.documents)
+        lemmatized_documents = self.lemmatize_batch(documents)
 
-        for document in documents:
-            writer.add_document(document = document)
+        for document, lemmatized_text in zip(documents, lemmatized_documents):
+            self.dict_documents[lemmatized_text] = document
 
-        writer.commit()
+        return lemmatized_documents
 
-        return ix
 
     def __search(self, query, documents):
         '''
-        Given lemmatized query and documents, returns the closest lemmatized document to the user query
+        Given lemmatized query and documents, returns the closest lemmatized document to the user query.
+        The index of self.index_name is only updated if the lemmatized documents have changed, and
+        it is searched before any other request can update it again.
 
         Parameters:
             - query (String): Lemmatized user query
@@ -138,21 +330,11 @@ class QuerySearcher:
         Returns:
             String with the closest lemmatized document. In case no documents are found, None is returned
         '''
-        ix = self.__initialize_documents_schema(documents)
-
-        with ix.searcher() as searcher:
-            parser = QueryParser("document", ix.schema)
-            myquery = parser.parse(query)
-
-            results = searcher.search(myquery)
-
-            if not results:
-                return None
-
-            else:
-                return results[0].get('document')
+        with span("index_search"):
+            return self.index_manager.update_and_search(self.index_name, documents, query)
 
 
+    @timed("search_query")
     def search_query(self, query):
         '''
         Searches the closest document of self.documents attribute to the user query. In case no 
@@ -164,27 +346,64 @@ class QuerySearcher:
         Returns:
             Closest document to the user query, if found
         '''
-        print("Received query: " + str(query))
-        tokenizer, lemmatizer = self.__initialize_tools()
-        lemmatized_query = self.__lemmatize_query(query, tokenizer, lemmatizer)
-        lemmatized_documents = self.__lemmatize_documents(tokenizer, lemmatizer)
+        logger.debug("Received query: %s", query)
 
-        print("lemmatized_query "+ lemmatized_query)
-        print("lemmatized documents " + str(lemmatized_documents))
+        # A cached result skips the lemmatization and the index
+        key = None
+        if self.result_cache is not None:
+            key = self.result_cache.get_key(query, self.documents)
+            result = self.result_cache.get(key)
 
-        result = self.__search(lemmatized_query, lemmatized_documents)
+            if result is not None:
+                logger.debug("cached result %s", result)
 
-        print(result)
+                if result is NO_RESULT:
+                    raise Exception()
+
+                return result
+
+        result = self.__find(query)
+
+        if key is not None:
+            self.result_cache.put(key, result)
 
         if result == None:
             raise Exception()
 
-        tokenizer.close()
-        lemmatizer.close()
+        return result
 
-        result = self.dict_documents.get(result)
+    def __find(self, query):
+        '''
+        Finds the closest document of self.documents attribute to the user query, first by its
+        character n-grams if enabled, and otherwise with the lemmatized search.
 
-        return result
+        Parameters:
+            - query (String): User query
+
+        Returns:
+            Closest document to the user query. In case no document is found, None is returned
+        '''
+        if self.ngram_matchers is not None:
+            result = self.ngram_matchers.match(self.documents, query)
+
+            if result is not None:
+                logger.debug("n-gram result %s", result)
+                return result
+
+        lemmatized_query = self.__lemmatize_query(query)
+        lemmatized_documents = self.__lemmatize_documents()
+
+        logger.debug("lemmatized_query %s", lemmatized_query)
+        logger.debug("lemmatized documents %s", lemmatized_documents)
+
+        result = self.__search(lemmatized_query, lemmatized_documents)
+
+        logger.debug("result %s", result)
+
+        if result == None:
+            return None
+
+        return self.dict_documents.get(result)
 
 
 
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import time
+
+REMINDER_INTERVAL = float(os.environ.get('LINGUO_REMINDER_INTERVAL', 15))
+REMINDER_BROADCAST = os.environ.get('LINGUO_REMINDER_BROADCAST', '1') == '1'
+
+
+class ReminderBroadcaster:
+
+    def __init__(self, render, interval = REMINDER_INTERVAL):
+        '''
+        Constructor of ReminderBroadcaster object. Reminders of the same topic fired in the same
+        time window share a single rendered message, built from a single scrape.
+
+        Parameters:
+            - render (Callable): Coroutine function which receives a topic and returns the message,
+              the buttons and the articles to send
+            - interval (float): Seconds of each time window
+        '''
+        self.render = render
+        self.interval = interval
+        self.renders = 0
+
+        # Key: topic, value: (window, event loop, task rendering the message)
+        self.__broadcasts = {}
+
+    async def get_broadcast(self, topic):
+        '''
+        Returns the message of a topic for the current time window, rendering it only if no
+        other reminder of the window has done it.
+
+        Parameters:
+            - topic (String): Topic of the reminder
+
+        Returns:
+            Message, buttons and articles of the topic
+        '''
+        window = int(time.time() // self.interval)
+        loop = asyncio.get_running_loop()
+        broadcast = self.__broadcasts.get(topic)
+
+        if broadcast is None or broadcast[0] != window or broadcast[1] is not loop:
+            task = loop.create_task(self.render(topic))
+            self.__broadcasts[topic] = (window, loop, task)
+            self.renders += 1
+
+        else:
+            task = broadcast[2]
+
+        try:
+            return await asyncio.shield(task)
+
+        except Exception:
+            # A failed message is not shared, so that the next reminder tries again
+            if self.__broadcasts.get(topic, (None, None, None))[2] is task:
+                del self.__broadcasts[topic]
+            raise
@@ -0,0 +1,357 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import register_stats
+from scrapper import SCRAPE_WORKERS, fetch_page, get_file_url, get_page_fingerprint, parse_articles, topics
+
+logger = logging.getLogger(__name__)
+
+SECTION_TTL = float(os.environ.get('LINGUO_SECTION_TTL', 60))
+
+all_topics = ["Azken berriak", "Berri irakurrienak"] + topics
+
+
+class SectionSnapshot:
+
+    def __init__(self, url, articles, etag = None, last_modified = None, fingerprint = None):
+        '''
+        Constructor of SectionSnapshot object. Stores the articles of a topic page at a given time.
+
+        Parameters:
+            - url (String): Url of the topic
+            - articles (Dict): Dictionary where the key is the header of the article and the value its url
+            - etag (String): ETag header of the page
+            - last_modified (String): Last-Modified header of the page
+            - fingerprint (String): Fingerprint of the headers of the page
+        '''
+        self.url = url
+        self.articles = articles
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fingerprint = fingerprint
+        self.checked_at = time.time()
+
+    def age(self):
+        '''
+        Returns the seconds since the page was last checked.
+        '''
+        return time.time() - self.checked_at
+
+
+class SectionCache:
+
+    def __init__(self, ttl = SECTION_TTL):
+        '''
+        Constructor of SectionCache object. Keeps the latest articles of every topic page, so
+        that readers get them without any network I/O. Pages are refreshed in the background
+        every ttl seconds.
+
+        Parameters:
+            - ttl (float): Seconds after which the articles of a topic are refreshed
+        '''
+        self.ttl = ttl
+
+        # Key: url of the topic, value: whether if it is the main page of the site
+        self.sections = {get_file_url(topic): topic == "Azken berriak" for topic in all_topics}
+
+        self.__snapshots = {}
+        self.__locks = {url: threading.Lock() for url in self.sections}
+        self.__refreshing = set()
+        self.__lock = threading.Lock()
+        self.__listeners = []
+        self.__seen_listeners = []
+        self.__counts = {"fetched": 0, "not_modified": 0, "unchanged": 0, "parsed": 0,
+                            "parsed_articles": 0, "added_articles": 0, "removed_articles": 0}
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def add_listener(self, listener, replay = False):
+        '''
+        Registers a function which is called every time the articles of a topic change, as
+        listener(url, articles, added, removed).
+
+        Parameters:
+            - listener (Callable): Function to call
+            - replay (Boolean): Whether if the listener is first called with the articles of the
+              topics already cached, as if all of them were new
+        '''
+        self.__listeners.append(listener)
+
+        if replay:
+            for url, snapshot in list(self.__snapshots.items()):
+                listener(url, dict(snapshot.articles), dict(snapshot.articles), {})
+
+    def add_seen_listener(self, listener, replay = False):
+        '''
+        Registers a function which is called every time a topic page is checked, even if its
+        articles have not changed, as listener(url, articles, seen_at).
+
+        Parameters:
+            - listener (Callable): Function to call
+            - replay (Boolean): Whether if the listener is first called with the articles of the
+              topics already cached, at the time they were last checked
+        '''
+        self.__seen_listeners.append(listener)
+
+        if replay:
+            for url, snapshot in list(self.__snapshots.items()):
+                listener(url, dict(snapshot.articles), snapshot.checked_at)
+
+    def __notify(self, listeners, *args):
+        '''
+        Calls some listeners, logging their errors.
+        '''
+        for listener in listeners:
+            try:
+                listener(*args)
+
+            except Exception:
+                logger.error("Section cache listener failed", exc_info = True)
+
+    def __count(self, **counts):
+        '''
+        Adds to the counters of the refreshes.
+        '''
+        with self.__lock:
+            for name, value in counts.items():
+                self.__counts[name] += value
+
+    def refresh(self, url):
+        '''
+        Downloads the page of a topic if it has changed since it was last downloaded. Pages
+        whose headers have the same fingerprint as the previous version are not parsed, and
+        listeners only get the articles which were added or removed. Seen listeners get the
+        articles of every checked page. In case of error, the previous articles are kept.
+
+        Parameters:
+            - url (String): Url of the topic
+
+        Returns:
+            SectionSnapshot with the latest articles of the topic
+        '''
+        with self.__locks.setdefault(url, threading.Lock()):
+            previous = self.__snapshots.get(url)
+
+            try:
+                if previous is None:
+                    response = fetch_page(url)
+
+                else:
+                    response = fetch_page(url, previous.etag, previous.last_modified)
+
+            except Exception:
+                if previous is None:
+                    raise
+
+                logger.warning("Could not refresh %s, keeping stale articles", url, exc_info = True)
+                return previous
+
+            if response.status_code == 304:
+                self.__count(fetched = 1, not_modified = 1)
+                previous.checked_at = time.time()
+                self.__notify(self.__seen_listeners, url, dict(previous.articles), previous.checked_at)
+                return previous
+
+            fingerprint = get_page_fingerprint(response.text)
+
+            if previous is not None and previous.fingerprint == fingerprint:
+                self.__count(fetched = 1, unchanged = 1)
+                previous.etag = response.headers.get('ETag')
+                previous.last_modified = response.headers.get('Last-Modified')
+                previous.checked_at = time.time()
+                self.__notify(self.__seen_listeners, url, dict(previous.articles), previous.checked_at)
+                return previous
+
+            articles = parse_articles(response.text, self.sections.get(url, False))
+            snapshot = SectionSnapshot(url, articles, response.headers.get('ETag'),
+                                        response.headers.get('Last-Modified'), fingerprint)
+            self.__snapshots[url] = snapshot
+            self.__notify(self.__seen_listeners, url, dict(articles), snapshot.checked_at)
+
+        old_articles = previous.articles if previous is not None else {}
+        added = {article: link for article, link in articles.items() if article not in old_articles}
+        removed = {article: link for article, link in old_articles.items() if article not in articles}
+
+        self.__count(fetched = 1, parsed = 1, parsed_articles = len(articles), added_articles = len(added),
+                        removed_articles = len(removed))
+        logger.debug("Refreshed %s: %d articles, %d added, %d removed", url, len(articles), len(added), len(removed))
+
+        if added or removed:
+            self.__notify(self.__listeners, url, articles, added, removed)
+
+        return snapshot
+
+    def __refresh_later(self, url):
+        '''
+        Refreshes the articles of a topic in a background thread, unless it is already being refreshed.
+
+        Parameters:
+            - url (String): Url of the topic
+        '''
+        with self.__lock:
+            if url in self.__refreshing:
+                return
+
+            self.__refreshing.add(url)
+
+        def refresh():
+            try:
+                self.refresh(url)
+
+            except Exception:
+                logger.warning("Could not refresh %s", url, exc_info = True)
+
+            finally:
+                with self.__lock:
+                    self.__refreshing.discard(url)
+
+        threading.Thread(target = refresh, daemon = True).start()
+
+    def get_articles(self, url, main_articles = False):
+        '''
+        Returns the latest articles of a topic. Only the first call for a topic downloads the
+        page; afterwards, stale articles are returned while they are refreshed in the background.
+
+        Parameters:
+            - url (String): Url of the topic
+            - main_articles (Boolean): Whether if the url is the main page of the site or not
+
+        Returns:
+            - A dictionary where:
+                Key: Main header of the article
+                Value: Url to the article
+        '''
+        self.sections.setdefault(url, main_articles)
+        snapshot = self.__snapshots.get(url)
+
+        if snapshot is None:
+            snapshot = self.refresh(url)
+
+        elif snapshot.age() > self.ttl:
+            self.__refresh_later(url)
+
+        return dict(snapshot.articles)
+
+    def get_all_articles(self, max_workers = SCRAPE_WORKERS, topics = topics):
+        '''
+        Returns all the daily articles of the cached topics. Topics which have not been
+        downloaded yet are downloaded concurrently, as scrapper.get_all_articles does. In
+        case some topic can not be downloaded, the articles of the rest of topics are returned.
+
+        Parameters:
+            - max_workers (int): Maximum number of topics downloaded at the same time
+            - topics (List): Topics whose articles are returned, by default the daily topics
+
+        Returns:
+            Dictionary where, the key is the header of the article, and the value is the url of it.
+        '''
+        urls = [get_file_url(topic) for topic in topics]
+
+        def get_articles(url):
+            try:
+                return self.get_articles(url), None
+
+            except Exception as e:
+                return None, e
+
+        if max_workers > 1 and sum(url not in self.__snapshots for url in urls) > 1:
+            with ThreadPoolExecutor(max_workers = max_workers) as executor:
+                results = list(executor.map(get_articles, urls))
+
+        else:
+            results = [get_articles(url) for url in urls]
+
+        global_articles = {}
+        errors = []
+
+        # Results are merged in topic order, as if they had been downloaded one after another
+        for topic, (articles, error) in zip(topics, results):
+            if error is not None:
+                logger.warning("Articles of %s could not be scrapped: %s", topic, error)
+                errors.append(error)
+
+            else:
+                global_articles.update(articles)
+
+        if len(errors) == len(topics):
+            raise errors[-1]
+
+        return global_articles
+
+    def __run(self):
+        '''
+        Loop of the background thread, which refreshes every topic whose articles are older than self.ttl.
+        '''
+        while not self.__stop.is_set():
+            for url in list(self.sections):
+                if self.__stop.is_set():
+                    break
+
+                snapshot = self.__snapshots.get(url)
+                if snapshot is None or snapshot.age() >= self.ttl:
+                    try:
+                        self.refresh(url)
+
+                    except Exception:
+                        logger.warning("Could not refresh %s", url, exc_info = True)
+
+            self.__stop.wait(min(self.ttl, 5.0))
+
+    def stats(self):
+        '''
+        Returns the counters of the refreshes.
+
+        Returns:
+            Dictionary with the fetched pages, the ones which were not modified, unchanged or
+            parsed, and the parsed, added and removed articles
+        '''
+        with self.__lock:
+            return dict(self.__counts)
+
+    def start(self):
+        '''
+        Starts refreshing the topics in a background thread.
+        '''
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+
+        self.__stop.clear()
+        self.__thread = threading.Thread(target = self.__run, name = "section-cache", daemon = True)
+        self.__thread.start()
+
+    def stop(self):
+        '''
+        Stops the background thread.
+        '''
+        self.__stop.set()
+
+        if self.__thread is not None:
+            self.__thread.join(timeout = 1.0)
+            self.__thread = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_section_cache():
+    '''
+    Returns the SectionCache shared by the whole process, creating it and starting its
+    background refresh the first time.
+
+    Returns:
+        SectionCache object
+    '''
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = SectionCache()
+            register_stats("section_cache", _cache.stats)
+            _cache.start()
+            atexit.register(_cache.stop)
+
+    return _cache
@@ -0,0 +1,193 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ArticleStore import get_article_store
+from SectionCache import get_section_cache
+from TTLCache import TTLCache
+from metrics import register_stats
+from scrapper import get_sub_header
+
+logger = logging.getLogger(__name__)
+
+SUB_HEADER_CACHE_SIZE = int(os.environ.get('LINGUO_SUB_HEADER_CACHE_SIZE', 1024))
+SUB_HEADER_TTL = float(os.environ.get('LINGUO_SUB_HEADER_TTL', 3600))
+PREFETCH_SUB_HEADERS = os.environ.get('LINGUO_PREFETCH_SUB_HEADERS', '0') == '1'
+PREFETCH_WORKERS = int(os.environ.get('LINGUO_PREFETCH_WORKERS', 2))
+
+
+class SubHeaderCache:
+
+    def __init__(self, size = SUB_HEADER_CACHE_SIZE, ttl = SUB_HEADER_TTL, fetch = get_sub_header,
+                    prefetch_workers = PREFETCH_WORKERS, store = None):
+        '''
+        Constructor of SubHeaderCache object. Stores the subheaders of the articles by url, so
+        that users choosing the same article do not download it again.
+
+        Parameters:
+            - size (int): Maximum number of cached subheaders
+            - ttl (float): Seconds a subheader is valid
+            - fetch (Callable): Function which downloads the subheader of an article url
+            - prefetch_workers (int): Number of threads which prefetch subheaders in the background
+            - store (ArticleStore): Store where the subheaders are persisted, so that they are not
+              downloaded again after a restart while they are valid. If None, subheaders are
+              only kept in memory
+        '''
+        self.ttl = ttl
+        self.cache = TTLCache(size, ttl)
+        self.fetch = fetch
+        self.prefetch_workers = prefetch_workers
+        self.store = store
+
+        self.__pending = {}
+        self.__lock = threading.Lock()
+        self.__executor = None
+
+    def get_sub_header(self, url):
+        '''
+        Returns the subheader of an article, downloading it only if it is not cached. Concurrent
+        requests for the same article share a single download.
+
+        Parameters:
+            - url (String): Url of the article
+
+        Returns:
+            Subheader of the article
+        '''
+        sub_header = self.cache.get(url)
+        if sub_header is not None:
+            return sub_header
+
+        with self.__lock:
+            future = self.__pending.get(url)
+            owner = future is None
+
+            if owner:
+                future = Future()
+                self.__pending[url] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            sub_header, fetched_at = None, None
+
+            if self.store is not None:
+                sub_header, fetched_at = self.store.get_sub_header(url, self.ttl)
+
+            if sub_header is None:
+                sub_header = self.fetch(url)
+                self.cache.put(url, sub_header)
+
+                if self.store is not None:
+                    self.store.set_sub_header(url, sub_header)
+
+            elif self.ttl is None:
+                self.cache.put(url, sub_header)
+
+            else:
+                # A stored subheader is only valid for the rest of its ttl
+                self.cache.put(url, sub_header, max(0.0, self.ttl - (time.time() - fetched_at)))
+
+            future.set_result(sub_header)
+
+        except Exception as e:
+            # An expired subheader is better than none while the site is failing
+            sub_header = self.cache.get_stale(url)
+
+            if sub_header is None and self.store is not None:
+                sub_header = self.store.get_sub_header(url)[0]
+
+            if sub_header is None:
+                future.set_exception(e)
+                raise
+
+            logger.warning("Could not download the subheader of %s, using the expired one: %s", url, e)
+            future.set_result(sub_header)
+
+        finally:
+            with self.__lock:
+                del self.__pending[url]
+
+        return sub_header
+
+    def __prefetch_one(self, url):
+        '''
+        Downloads the subheader of an article in the background, ignoring the errors.
+
+        Parameters:
+            - url (String): Url of the article
+        '''
+        try:
+            self.get_sub_header(url)
+
+        except Exception as e:
+            logger.debug("Could not prefetch subheader of %s: %s", url, e)
+
+    def prefetch(self, urls):
+        '''
+        Downloads in the background the subheaders of the articles which are not cached yet.
+
+        Parameters:
+            - urls (List): Urls of the articles
+        '''
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers = self.prefetch_workers,
+                                                        thread_name_prefix = "sub-header-prefetch")
+
+            executor = self.__executor
+
+        for url in urls:
+            if url and url not in self.cache:
+                executor.submit(self.__prefetch_one, url)
+
+    def on_section_refresh(self, url, articles, added, removed):
+        '''
+        Listener of the SectionCache, which prefetches the subheaders of the new articles.
+
+        Parameters:
+            - url (String): Url of the topic
+            - articles (Dict): All the articles of the topic
+            - added (Dict): New articles of the topic
+            - removed (Dict): Articles no longer in the topic
+        '''
+        self.prefetch(added.values())
+
+    def close(self):
+        '''
+        Stops the background prefetch, cancelling the pending downloads.
+        '''
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown(wait = False, cancel_futures = True)
+                self.__executor = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_sub_header_cache():
+    '''
+    Returns the SubHeaderCache shared by the whole process, creating it the first time. If
+    LINGUO_PREFETCH_SUB_HEADERS is enabled, subheaders of the articles already cached are
+    prefetched, and the ones of new articles every time the SectionCache refreshes a topic.
+
+    Returns:
+        SubHeaderCache object
+    '''
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = SubHeaderCache(store = get_article_store())
+            register_stats("sub_header_cache", _cache.cache.stats)
+            atexit.register(_cache.close)
+
+            if PREFETCH_SUB_HEADERS:
+                get_section_cache().add_listener(_cache.on_section_refresh, replay = True)
+
+    return _cache
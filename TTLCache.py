@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+
+    def __init__(self, size, ttl):
+        '''
+        Constructor of TTLCache object. Thread safe cache bounded by size with LRU eviction,
+        whose entries expire ttl seconds after being stored.
+
+        Parameters:
+            - size (int): Maximum number of entries
+            - ttl (float): Seconds an entry is valid. If None, entries do not expire
+        '''
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default = None):
+        '''
+        Returns the value of a key if it is cached and has not expired.
+
+        Parameters:
+            - key (Hashable): Key of the entry
+            - default (Any): Value returned if the key is not cached
+
+        Returns:
+            Cached value, or default
+        '''
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+            # Expired entries are kept until evicted, as they can be used by get_stale
+            if entry is not None and entry[1] is not None and entry[1] < time.monotonic():
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self.__entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[0]
+
+    def get_stale(self, key, default = None):
+        '''
+        Returns the value of a key even if it has expired, e.g. when it can not be refreshed.
+
+        Parameters:
+            - key (Hashable): Key of the entry
+            - default (Any): Value returned if the key is not cached
+
+        Returns:
+            Cached value, or default
+        '''
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+        return entry[0] if entry is not None else default
+
+    def put(self, key, value, ttl = None):
+        '''
+        Caches the value of a key, evicting the least recently used entry if the cache is full.
+
+        Parameters:
+            - key (Hashable): Key of the entry
+            - value (Any): Value to cache
+            - ttl (float): Seconds the entry is valid. Defaults to self.ttl
+        '''
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self.__lock:
+            self.__entries[key] = (value, expires_at)
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.size:
+                self.__entries.popitem(last = False)
+
+    def __contains__(self, key):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            return entry is not None and (entry[1] is None or entry[1] >= time.monotonic())
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    def pop(self, key, default = None):
+        '''
+        Removes a key from the cache.
+
+        Parameters:
+            - key (Hashable): Key of the entry
+            - default (Any): Value returned if the key is not cached
+
+        Returns:
+            Removed value, or default
+        '''
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+
+        return entry[0] if entry is not None else default
+
+    def clear(self):
+        '''
+        Removes all the entries and resets the counters.
+        '''
+        with self.__lock:
+            self.__entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        '''
+        Returns the counters of the cache.
+
+        Returns:
+            Dictionary with the hits, misses, hit ratio and number of entries
+        '''
+        with self.__lock:
+            requests = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "hit_ratio": self.hits / requests if requests else 0.0,
+                    "size": len(self.__entries)}
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import re
+import threading
+
+from LemmaCache import normalize_text
+from scrapper import TOPIC_URLS
+
+logger = logging.getLogger(__name__)
+
+NLU_PATH = os.environ.get('LINGUO_NLU_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'nlu.yml'))
+
+TOPIC_ENTITY = "topic"
+TOPIC_INTENT = "choose_topic"
+
+# Shorter stems would match unrelated words by their prefix
+MIN_STEM_LENGTH = 4
+
+NON_WORD_RE = re.compile(r'[^\w]+')
+ENTITY_RE = re.compile(r'\[([^\]]+)\](\{[^}]*\})')
+EXAMPLE_RE = re.compile(r'^\s*-\s*(.*)$')
+
+
+def normalize_topic(text):
+    '''
+    Normalizes a topic or a query, ignoring case and punctuation.
+
+    Parameters:
+        - text (String): Topic or query
+
+    Returns:
+        Normalized text
+    '''
+    return normalize_text(NON_WORD_RE.sub(" ", text.casefold())).strip()
+
+
+def get_stem(word):
+    '''
+    Returns the stem of a normalized word of a topic, removing its final article, so that
+    the declined forms of the word ("kiroletako", "gizartean") share its prefix.
+
+    Parameters:
+        - word (String): Normalized word
+
+    Returns:
+        Stem of the word
+    '''
+    for suffix in ("ak", "a"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+
+    return word
+
+
+def load_nlu_topics(path = NLU_PATH):
+    '''
+    Reads the values of the topic entity annotated in the training data, and the synonyms
+    of the topics.
+
+    Parameters:
+        - path (String): Path of the nlu.yml file
+
+    Returns:
+        List of (text, topic) tuples. The topic is None if the example does not set a value
+    '''
+    import yaml
+
+    with open(path, encoding = 'utf-8') as f:
+        nlu = yaml.safe_load(f).get('nlu', [])
+
+    values = []
+
+    for item in nlu:
+        examples = [EXAMPLE_RE.match(line).group(1) for line in (item.get('examples') or "").splitlines()
+                        if EXAMPLE_RE.match(line)]
+
+        if 'synonym' in item:
+            values.extend((example, item['synonym']) for example in examples)
+
+        elif item.get('intent') == TOPIC_INTENT:
+            for example in examples:
+                for text, entity in ENTITY_RE.findall(example):
+                    try:
+                        entity = json.loads(entity)
+
+                    except ValueError:
+                        continue
+
+                    if entity.get('entity') == TOPIC_ENTITY:
+                        values.append((text, entity.get('value')))
+
+    return values
+
+
+class TopicMatcher:
+
+    def __init__(self, topics = None, nlu_path = NLU_PATH):
+        '''
+        Constructor of TopicMatcher object. Builds once the table which maps the normalized
+        topics, their synonyms and the examples of the training data to the topics, so that
+        most queries do not need to be lemmatized.
+
+        Parameters:
+            - topics (List): Topics which can be chosen. By default, the topics of the site
+            - nlu_path (String): Path of the nlu.yml file with the examples. If None, only the
+              names of the topics are used
+        '''
+        if topics is None:
+            topics = list(TOPIC_URLS)
+
+        self.topics = topics
+        self.hits = 0
+        self.misses = 0
+
+        # Key: normalized text, value: topic
+        self.table = {}
+
+        # Key: stem of a word which only appears in the name of one topic, value: topic
+        self.stems = {}
+
+        stem_topics = {}
+        for topic in topics:
+            self.table[normalize_topic(topic)] = topic
+
+            for word in normalize_topic(topic).split():
+                stem_topics.setdefault(get_stem(word), set()).add(topic)
+
+        for stem, stem_topic in stem_topics.items():
+            if len(stem_topic) == 1 and len(stem) >= MIN_STEM_LENGTH:
+                self.stems[stem] = stem_topic.pop()
+
+        if nlu_path is not None:
+            try:
+                nlu_topics = load_nlu_topics(nlu_path)
+
+            except Exception:
+                logger.warning("Could not read the topics of %s", nlu_path, exc_info = True)
+                nlu_topics = []
+
+            for text, topic in nlu_topics:
+                if topic not in topics:
+                    topic = self.__match_words(normalize_topic(text))
+
+                if topic is not None:
+                    self.table.setdefault(normalize_topic(text), topic)
+
+    def __match_word(self, word):
+        '''
+        Returns the topic whose stem is a prefix of the word, if any.
+        '''
+        topic = self.table.get(word)
+        if topic is not None:
+            return topic
+
+        for length in range(len(word), MIN_STEM_LENGTH - 1, -1):
+            topic = self.stems.get(word[:length])
+
+            if topic is not None:
+                return topic
+
+        return None
+
+    def __match_words(self, normalized):
+        '''
+        Returns the topic matched by the words of a normalized query, only if all the matched
+        words agree on the same topic.
+        '''
+        matches = {self.__match_word(word) for word in normalized.split()}
+        matches.discard(None)
+
+        if len(matches) == 1:
+            return matches.pop()
+
+        return None
+
+    def match(self, query):
+        '''
+        Returns the topic of the user query.
+
+        Parameters:
+            - query (String): User query
+
+        Returns:
+            Matched topic. In case the query does not match a single topic, None is returned
+        '''
+        normalized = normalize_topic(query)
+
+        topic = self.table.get(normalized)
+        if topic is None:
+            topic = self.__match_words(normalized)
+
+        if topic is None:
+            self.misses += 1
+
+        else:
+            self.hits += 1
+
+        return topic
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_topic_matcher():
+    '''
+    Returns the TopicMatcher shared by the whole process, creating it the first time.
+
+    Returns:
+        TopicMatcher object
+    '''
+    global _matcher
+
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = TopicMatcher()
+
+    return _matcher
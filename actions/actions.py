@@ -8,6 +8,7 @@
 # This is a simple example for a custom action which utters "Hello World!"
 
 import datetime
+import logging
 import traceback
 
 from typing import Any, Text, Dict, List
@@ -16,9 +17,25 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, ReminderScheduled, ReminderCancelled
 
+from ArticleRegistry import get_article_id, get_article_registry
 from QuerySearcher import QuerySearcher
-from scrapper import  get_articles, get_sub_header, get_all_articles, get_file_url
+from ReminderBroadcaster import REMINDER_BROADCAST, REMINDER_INTERVAL, ReminderBroadcaster
+from TopicMatcher import get_topic_matcher
+from async_layer import (get_articles_async, get_all_articles_async, get_sub_header_async,
+                            search_query_async, has_headline_index_async, search_headlines_async,
+                            search_stored_articles_async, resolve_article_async, resolve_articles_async,
+                            resolve_chosen_id_async, resolve_chosen_article_async)
+from metrics import start_metrics, timed
+from scrapper import get_file_url
+from warmup import WARM_UP, warm_up
 
+logger = logging.getLogger(__name__)
+
+start_metrics()
+
+# The action server only starts answering once this module is imported
+if WARM_UP:
+    warm_up()
 
 menu_btn = {"title":"Hasierako menura itzuli", "payload":"/show_menu"}
 articles_btn = {"title":"Artikuluen zerrenda erakutsi", "payload":"/show_news_menu"}
@@ -26,54 +43,104 @@ topics = ['Azken berriak', 'Berri irakurrienak', 'Gizartea',
             'Politika', 'Ekonomia', 'Mundua', 'Iritzia', 'Kultura', 'Kirola', 'Bizigiro']
 
 
-def send_articles(dispatcher, article_topic, show_next_news = False):
+def get_article_button(article, article_id):
     '''
-    Gets all the articles of the selected topic, sends them to the user and creates
-    a menu with buttons.
+    Creates the button of an article, whose payload only carries the id of the article.
+
+    Parameters:
+        - article (String): Header of the article
+        - article_id (String): Id of the article
+
+    Returns:
+        - Button of the article
+    '''
+    return {"title":article, 
+            "payload":"/choose_news_with_keywords{\"article\":\"" + article_id + "\"}"}
+
+
+async def render_articles(article_topic, show_next_news = False):
+    '''
+    Gets all the articles of the selected topic and creates the message and the menu with
+    buttons which display them.
 
     Parameters:
-        - dispatcher (CollectingDispatcher): Last instance of the CollectingDispatcher object
         - article_topic (String): Topic chosen by the user
         - show_next_news (Boolean): Whether if articles are shown by user's innactivity or not
 
     Returns:
-        - Events of the set slots
+        - Message, buttons and list with the ids of the articles
     '''
 
-    events = []
-
     # Get the url of the topic html file
     url = get_file_url(article_topic)
 
     last_news = article_topic == 'Azken berriak'
 
-    # Store the headers and their url in a list
-    global_articles = get_articles(url, last_news)
+    # Store the headers and their url in a list, as last refreshed by the section cache
+    global_articles = await get_articles_async(url, last_news)
+
+    # Slots and payloads only carry the ids, the headers and urls are kept by the registry
+    article_ids = get_article_registry().register(global_articles)
 
     buttons = []
 
     # Create the message and the buttons menu that will be displayed
     message = "Artikuluen arloa: " + article_topic + "\n  \n"
-    for article in global_articles.keys():
+    for article, article_id in zip(global_articles.keys(), article_ids):
         message += article + "\n \n"
-        entity = article.replace(" artikulua", "")
-        btn = {"title":article, 
-              "payload":"/choose_news_with_keywords{\"article\":" + entity + "}"}
-        buttons.append(btn)
+        buttons.append(get_article_button(article, article_id))
 
     buttons.append(menu_btn)
 
     if show_next_news:
         next_news_button = {"title":"Ez bidali mezu gehiago", "payload":"/cancel_show_news_reminder"}
         buttons.append(next_news_button)
-    
 
-    dispatcher.utter_message(text = message, buttons=buttons, button_type="reply")
+    return message, buttons, article_ids
+
+
+def utter_articles(dispatcher, article_topic, message, buttons, article_ids):
+    '''
+    Sends the rendered articles of a topic to the user.
+
+    Parameters:
+        - dispatcher (CollectingDispatcher): Last instance of the CollectingDispatcher object
+        - article_topic (String): Topic chosen by the user
+        - message (String): Message with the headers of the articles
+        - buttons (List): Buttons of the menu
+        - article_ids (List): Ids of the articles
+
+    Returns:
+        - Events of the set slots
+    '''
+
+    # Each user gets their own copy, as the dispatcher may modify the buttons
+    dispatcher.utter_message(text = message, buttons=[dict(btn) for btn in buttons], button_type="reply")
+
+    return [SlotSet('topic', article_topic), SlotSet('global_articles', list(article_ids))]
+
+
+async def send_articles(dispatcher, article_topic, show_next_news = False):
+    '''
+    Gets all the articles of the selected topic, sends them to the user and creates
+    a menu with buttons.
+
+    Parameters:
+        - dispatcher (CollectingDispatcher): Last instance of the CollectingDispatcher object
+        - article_topic (String): Topic chosen by the user
+        - show_next_news (Boolean): Whether if articles are shown by user's innactivity or not
+
+    Returns:
+        - Events of the set slots
+    '''
+
+    message, buttons, article_ids = await render_articles(article_topic, show_next_news)
+
+    return utter_articles(dispatcher, article_topic, message, buttons, article_ids)
 
-    events.append(SlotSet('topic', article_topic))
-    events.append(SlotSet('global_articles', global_articles))
 
-    return events
+# Reminders of idle users which show the same topic at the same time share the message
+reminder_broadcaster = ReminderBroadcaster(lambda article_topic: render_articles(article_topic, True))
 
 
 def get_next_topic(tracker):
@@ -97,6 +164,7 @@ class ActionAnswerOpenQuestion(Action):
     def name(self) -> Text:
         return "action_answer_open_question"
 
+    @timed("action_answer_open_question")
     async def run(
         self,
         dispatcher: CollectingDispatcher,
@@ -117,6 +185,7 @@ class ActionCancelNewsReminder(Action):
     def name(self) -> Text:
         return "action_cancel_news_reminder"
 
+    @timed("action_cancel_news_reminder")
     async def run(
         self,
         dispatcher: CollectingDispatcher,
@@ -136,6 +205,7 @@ class ActionSetNewsReminder(Action):
     def name(self) -> Text:
         return "action_set_news_reminder"
 
+    @timed("action_set_news_reminder")
     async def run(
         self,
         dispatcher: CollectingDispatcher,
@@ -145,14 +215,15 @@ class ActionSetNewsReminder(Action):
 
         '''
         Creates a reminder to show the articles of a topic when user is innactive.
-        Articles will be shown every 15 seconds if the user does not send any message.
+        Articles will be shown every REMINDER_INTERVAL seconds (15 by default) if the user
+        does not send any message.
         '''
 
         read_next_news = tracker.get_slot('read_next_news')
 
         if read_next_news:
 
-            date = datetime.datetime.now() + datetime.timedelta(seconds =  15)
+            date = datetime.datetime.now() + datetime.timedelta(seconds = REMINDER_INTERVAL)
             entities = tracker.latest_message.get('entities')
 
             reminder = ReminderScheduled(
@@ -175,6 +246,7 @@ class ActionReactReminder(Action):
     def name(self) -> Text:
         return "action_react_reminder"
 
+    @timed("action_react_reminder")
     async def run(
         self,
         dispatcher: CollectingDispatcher,
@@ -189,19 +261,24 @@ class ActionReactReminder(Action):
 
         read_next_news = tracker.get_slot('read_next_news')
 
-        print("read_next_news: " + str(read_next_news))
+        logger.debug("read_next_news: %s", read_next_news)
 
         events = []
 
         article_topic, event = get_next_topic(tracker)
         
         # Display all the articles and get the events of them
-        news_events = send_articles(dispatcher, article_topic, True)
+        if REMINDER_BROADCAST:
+            message, buttons, article_ids = await reminder_broadcaster.get_broadcast(article_topic)
+            news_events = utter_articles(dispatcher, article_topic, message, buttons, article_ids)
+
+        else:
+            news_events = await send_articles(dispatcher, article_topic, True)
 
         events.append(event)
         events.extend(news_events)
 
-        date = datetime.datetime.now() + datetime.timedelta(seconds =  15)
+        date = datetime.datetime.now() + datetime.timedelta(seconds = REMINDER_INTERVAL)
         entities = tracker.latest_message.get('entities')
 
         # Create the reminder
@@ -224,7 +301,8 @@ class ActionGetArticles(Action):
     def name(self) -> Text:
         return "action_show_topic_news"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    @timed("action_show_topic_news")
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -239,10 +317,14 @@ class ActionGetArticles(Action):
             input_msg = tracker.get_slot('topic')
             print("Taken entity: " + input_msg)
             
-            query_searcher = QuerySearcher()
-            article_topic = query_searcher.search_query(input_msg)
+            # The precompiled table of topics answers most queries without lemmatizing them
+            article_topic = get_topic_matcher().match(input_msg)
+
+            if article_topic is None:
+                query_searcher = QuerySearcher()
+                article_topic = await search_query_async(query_searcher, input_msg)
             
-            events = send_articles(dispatcher, article_topic)
+            events = await send_articles(dispatcher, article_topic)
 
             return events
 
@@ -264,7 +346,8 @@ class ActionReturnNewsTitle(Action):
     def name(self) -> Text:
         return "action_return_news_title"
 
-    def run(self, dispatcher: CollectingDispatcher, 
+    @timed("action_return_news_title")
+    async def run(self, dispatcher: CollectingDispatcher, 
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -282,25 +365,53 @@ class ActionReturnNewsTitle(Action):
             input_msg = input_msg.replace('"','')
             print("Taken entity of article: " + str(input_msg) )
             
-            if open_question:
-                global_articles = get_all_articles()
+            url = None
+            registry = get_article_registry()
+
+            # The buttons of the articles send their id, so no search is needed
+            article = await resolve_chosen_id_async(input_msg)
+
+            if article is not None:
+                url = article[1]
+                last_article = input_msg
+
+            if url is None and open_question:
+                # Query the latest snapshot of the headline index, if it has been built
+                indexed = await has_headline_index_async()
+                article = await search_headlines_async(input_msg) if indexed else None
+
+                # Otherwise today's stored articles are searched, before scrapping all the topics
+                if article is None:
+                    article = await search_stored_articles_async(input_msg)
+
+                if article is not None:
+                    url = article[1]
+                    last_article = registry.register({article[0]: url})[0]
+
+                # All the topics are only scrapped until the first version of the index exists
+                elif indexed:
+                    raise Exception()
+
+            if url is None:
+                if open_question:
+                    global_articles = await get_all_articles_async()
+                    registry.register(global_articles)
+                    index_name = "all_articles"
 
-            else:
-                # Get all the articles from slot
-                global_articles = tracker.get_slot('global_articles')
+                else:
+                    # Get all the articles of the ids saved in the slot
+                    global_articles = await resolve_articles_async(tracker.get_slot('global_articles'))
+                    index_name = tracker.get_slot('topic')
 
-            query_searcher = QuerySearcher(global_articles.keys())
-            input_msg = query_searcher.search_query(input_msg)
+                # Exact and fuzzy matches of the header are tried before the lemmatized search
+                # The resolver logs the tier which found the article
+                article, _ = await resolve_chosen_article_async(input_msg, global_articles, index_name)
 
-            # Get chosen article
-            for article in global_articles.keys():
-                if article == input_msg:
-                    url = global_articles.get(article)
-                    last_article = [article, url]
-                    break
+                url = global_articles.get(article)
+                last_article = get_article_id(url)
 
             # Get the subheader of the article
-            subheader = get_sub_header(url)
+            subheader = await get_sub_header_async(url)
 
             buttons = [{"title":"Informazio gehiago eman", "payload":"/more_information"}]
             buttons.append(articles_btn)
@@ -313,7 +424,7 @@ class ActionReturnNewsTitle(Action):
         except Exception as e:
             dispatcher.utter_message(response = 'utter_error_msg')
 
-            return [SlotSet('last_article', []), SlotSet('open_question', False)]
+            return [SlotSet('last_article', ""), SlotSet('open_question', False)]
 
 
 
@@ -322,7 +433,8 @@ class ActionGetUrl(Action):
     def name(self) -> Text:
         return "action_return_url"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    @timed("action_return_url")
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -335,7 +447,8 @@ class ActionGetUrl(Action):
         try:
 
             buttons = [articles_btn, menu_btn]
-            dispatcher.utter_message(text=last_article[1], buttons = buttons, button_type="reply")
+            url = (await resolve_article_async(last_article))[1]
+            dispatcher.utter_message(text=url, buttons = buttons, button_type="reply")
 
         except Exception as e:
             print(traceback.format_exc())
@@ -350,7 +463,8 @@ class ActionShowLastTopicNews(Action):
     def name(self) -> Text:
         return "action_show_last_topic_news"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    @timed("action_show_last_topic_news")
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -358,7 +472,7 @@ class ActionShowLastTopicNews(Action):
         Returns all the articles saved of the last chosen topic
         '''
 
-        global_articles = tracker.get_slot('global_articles')
+        article_ids = tracker.get_slot('global_articles')
         
         try:
             article_topic = tracker.get_slot('topic')
@@ -366,11 +480,10 @@ class ActionShowLastTopicNews(Action):
             buttons = []
 
             # Get all the saved messages
-            for article in global_articles.keys():
+            global_articles = await resolve_articles_async(article_ids)
+            for article, url in global_articles.items():
                 message += article + "\n \n"
-                entity = article.replace(" artikulua", "")
-                buttons.append({"title":article, 
-                                "payload":"/choose_news_with_keywords{\"article\":\"" + entity + "\"}"})
+                buttons.append(get_article_button(article, get_article_id(url)))
 
             buttons.append(menu_btn)
 
@@ -0,0 +1,155 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ArticleRegistry import get_article_registry
+from ArticleResolver import get_article_resolver
+from SectionCache import get_section_cache
+from SubHeaderCache import get_sub_header_cache
+
+# Scrapping waits on the network and IxaPipes on its client processes, so threads are enough
+# to keep the event loop of the action server free
+ACTION_WORKERS = int(os.environ.get('LINGUO_ACTION_WORKERS', 16))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    '''
+    Returns the executor where the blocking work of the actions runs, creating it the first time.
+
+    Returns:
+        ThreadPoolExecutor object
+    '''
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers = ACTION_WORKERS, thread_name_prefix = "linguo-action")
+
+    return _executor
+
+
+async def run_blocking(function, *args, **kwargs):
+    '''
+    Runs a blocking function in the executor, without blocking the event loop.
+
+    Parameters:
+        - function (Callable): Function to run
+        - args, kwargs: Arguments of the function
+
+    Returns:
+        Result of the function
+    '''
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(function, *args, **kwargs))
+
+
+async def get_articles_async(url, main_articles = False):
+    '''
+    Async version of SectionCache.get_articles.
+    '''
+    return await run_blocking(get_section_cache().get_articles, url, main_articles)
+
+
+async def get_all_articles_async():
+    '''
+    Async version of SectionCache.get_all_articles.
+    '''
+    return await run_blocking(get_section_cache().get_all_articles)
+
+
+async def get_sub_header_async(url):
+    '''
+    Async version of SubHeaderCache.get_sub_header.
+    '''
+    return await run_blocking(get_sub_header_cache().get_sub_header, url)
+
+
+async def search_query_async(query_searcher, query):
+    '''
+    Async version of QuerySearcher.search_query.
+
+    Parameters:
+        - query_searcher (QuerySearcher): Searcher of the documents
+        - query (String): User query
+    '''
+    return await run_blocking(query_searcher.search_query, query)
+
+
+async def search_headlines_async(query):
+    '''
+    Async version of HeadlineIndexer.search on the indexer shared by the process.
+    '''
+    # Whoosh is only imported once an open question is asked
+    from HeadlineIndexer import get_headline_indexer
+
+    return await run_blocking(get_headline_indexer().search, query)
+
+
+async def has_headline_index_async():
+    '''
+    Returns whether a version of the headline index has been built, so that open questions
+    can be answered without scrapping all the topics.
+    '''
+    from HeadlineIndexer import get_headline_indexer
+
+    return await run_blocking(get_headline_indexer().current) is not None
+
+
+async def search_stored_articles_async(query):
+    '''
+    Searches the query among today's articles of the ArticleStore, if enabled.
+
+    Parameters:
+        - query (String): User query
+
+    Returns:
+        Header and url of the best stored article. In case the store is disabled or no
+        article is found, None is returned
+    '''
+    from ArticleStore import get_article_store, get_today
+
+    store = get_article_store()
+    if store is None:
+        return None
+
+    results = await run_blocking(store.search, query, get_today(), 1)
+
+    return results[0] if results else None
+
+
+async def resolve_article_async(article_id):
+    '''
+    Async version of ArticleRegistry.resolve, as unknown ids may need to load the articles.
+    '''
+    return await run_blocking(get_article_registry().resolve, article_id)
+
+
+async def resolve_articles_async(article_ids):
+    '''
+    Async version of ArticleRegistry.resolve_all.
+    '''
+    return await run_blocking(get_article_registry().resolve_all, article_ids)
+
+
+async def resolve_chosen_id_async(article_id):
+    '''
+    Async version of ArticleResolver.resolve_id on the resolver shared by the process.
+    '''
+    return await run_blocking(get_article_resolver().resolve_id, article_id)
+
+
+async def resolve_chosen_article_async(query, articles, index_name = None):
+    '''
+    Async version of ArticleResolver.resolve on the resolver shared by the process.
+
+    Parameters:
+        - query (String): Header or keywords sent by the user
+        - articles (Dict): Headers and urls of the articles the user can choose
+        - index_name (String): Name of the index of the articles
+    '''
+    return await run_blocking(get_article_resolver().resolve, query, articles, index_name)
@@ -0,0 +1,91 @@
+'''
+Micro-benchmark of the lemma extraction from NAF files, comparing get_lemmatized_text with
+the previous BeautifulSoup implementation over synthetic batches of headlines.
+
+Usage:
+    python -m benchmarks.bench_naf [--sizes 10,100,1000] [--repeat N]
+'''
+
+import argparse
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+from QuerySearcher import articles
+from scrapper import get_lemmatized_text
+
+
+def build_naf(headlines):
+    '''
+    Builds a NAF file similar to the output of IxaPipes for the given headlines, where the
+    lemma of every word is the word lowercased.
+
+    Parameters:
+        - headlines (List): Headlines of the NAF file
+
+    Returns:
+        String with the NAF file
+    '''
+    words = [word for headline in headlines for word in headline.split()]
+
+    text = ['<?xml version="1.0" encoding="UTF-8"?>\n<NAF xml:lang="eu" version="v3">\n  <text>']
+    for i, word in enumerate(words):
+        text.append('    <wf id="w%d" offset="0" length="%d" sent="1" para="1"><![CDATA[%s]]></wf>' % (i, len(word), word))
+
+    text.append('  </text>\n  <terms>')
+    for i, word in enumerate(words):
+        lemma = word.lower().replace('&', '&amp;').replace('"', '&quot;').replace('<', '&lt;')
+        text.append('    <term id="t%d" type="open" lemma="%s" pos="N" morphofeat="IZE">' % (i, lemma))
+        text.append('      <span><target id="w%d" /></span>\n    </term>' % i)
+
+    text.append('  </terms>\n</NAF>')
+    return "\n".join(text)
+
+
+def get_lemmatized_text_soup(naf_text):
+    '''
+    Previous implementation of get_lemmatized_text, without the debug printing.
+    '''
+    soup = BeautifulSoup(naf_text, "xml")
+
+    terms = soup.find('terms').find_all('term')
+
+    final_terms = ""
+    for term in terms:
+        final_terms += " " + term['lemma']
+
+    return final_terms
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "NAF lemma extraction benchmark")
+    parser.add_argument('--sizes', default = "10,100,1000", help = "Comma separated numbers of headlines")
+    parser.add_argument('--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    print("%10s %14s %14s %8s %10s" % ("headlines", "soup ms", "streaming ms", "speedup", "identical"))
+
+    for size in [int(size) for size in args.sizes.split(',')]:
+        headlines = [articles[i % len(articles)] for i in range(size)]
+        naf_text = build_naf(headlines)
+
+        timings = {}
+        results = {}
+
+        for name, function in (("soup", get_lemmatized_text_soup), ("streaming", get_lemmatized_text)):
+            latencies = []
+
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results[name] = function(naf_text)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            timings[name] = statistics.median(latencies)
+
+        print("%10d %14.3f %14.3f %7.1fx %10s" % (size, timings["soup"], timings["streaming"],
+                timings["soup"] / timings["streaming"], results["soup"] == results["streaming"]))
+
+
+if __name__ == "__main__":
+    main()
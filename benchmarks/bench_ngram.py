@@ -0,0 +1,160 @@
+'''
+Agreement and latency of the character n-gram matcher against the lemmatized search_query.
+Queries are the topic examples of the training data, matched against the topics, and
+declined keywords of the headlines saved as fixtures, matched against all the headlines.
+Both sets of queries know their right answer, so the accuracy of each method is reported
+too, along with the share of queries which the matcher answers for every threshold.
+
+Usage:
+    python -m benchmarks.bench_ngram [FIXTURES_DIR] [--lemmatizer fake|recorded|real]
+        [--thresholds 0.4,0.5,0.6,0.7,0.8]
+'''
+
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_suite import install_lemmatizer, percentile
+from benchmarks.stub_server import StubServer
+
+# Basque suffixes appended to the keywords, as typed by the users
+SUFFIXES = ["", "ak", "ko", "ari", "aren", "etan"]
+
+
+def get_topic_queries():
+    '''
+    Returns the topic examples of the training data and their topic. Examples without a
+    value are labelled by the TopicMatcher.
+    '''
+    from TopicMatcher import TopicMatcher, load_nlu_topics
+
+    matcher = TopicMatcher()
+    queries = [(text, topic or matcher.match(text)) for text, topic in load_nlu_topics()]
+
+    return [(text, topic) for text, topic in queries if topic is not None]
+
+
+def get_headline_queries(headlines, count, seed = 0):
+    '''
+    Builds queries of two consecutive words of random headlines, the last one declined.
+    '''
+    rng = random.Random(seed)
+    queries = []
+
+    for headline in rng.sample(headlines, min(count, len(headlines))):
+        words = headline.replace('"', '').split()
+        if len(words) < 2:
+            continue
+
+        start = rng.randrange(len(words) - 1)
+        queries.append((words[start] + " " + words[start + 1] + rng.choice(SUFFIXES), headline))
+
+    return queries
+
+
+def compare(name, documents, queries, thresholds, index_name):
+    '''
+    Runs the queries with search_query and with the n-gram matcher, and prints the results.
+    '''
+    from NgramMatcher import NgramMatcher
+    from QuerySearcher import QuerySearcher
+
+    searcher = QuerySearcher(documents, index_name = index_name)
+    searcher.lemmatize_batch(documents)
+
+    search_results = []
+    search_latencies = []
+    for query, _ in queries:
+        start = time.perf_counter()
+        try:
+            search_results.append(searcher.search_query(query))
+
+        except Exception:
+            search_results.append(None)
+
+        search_latencies.append(time.perf_counter() - start)
+
+    # NumPy is imported before measuring the build of the matrix
+    NgramMatcher([])
+
+    start = time.perf_counter()
+    matcher = NgramMatcher(documents)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    scores = []
+    ngram_latencies = []
+    for query, _ in queries:
+        start = time.perf_counter()
+        scores.append(matcher.score(query))
+        ngram_latencies.append(time.perf_counter() - start)
+
+    expected = [answer for _, answer in queries]
+    search_accuracy = sum(r == e for r, e in zip(search_results, expected)) / len(queries)
+
+    print("\n%s: %d queries, %d documents, matrix built in %.2f ms" % (name, len(queries), len(documents), build_ms))
+    print("search_query p50 %.3f ms p95 %.3f ms, n-gram p50 %.3f ms p95 %.3f ms" % (
+            percentile(search_latencies, 50) * 1000, percentile(search_latencies, 95) * 1000,
+            percentile(ngram_latencies, 50) * 1000, percentile(ngram_latencies, 95) * 1000))
+    print("search_query accuracy %.3f" % search_accuracy)
+    print("%10s %10s %12s %16s %18s" % ("threshold", "answered", "agreement", "n-gram accuracy", "combined accuracy"))
+
+    for threshold in thresholds:
+        matcher.threshold = threshold
+        answered = agreed = right = combined = 0
+
+        for (query, answer), search_result in zip(queries, search_results):
+            result = matcher.match(query)
+
+            if result is None:
+                combined += search_result == answer
+                continue
+
+            answered += 1
+            agreed += result[0] == search_result
+            right += result[0] == answer
+            combined += result[0] == answer
+
+        print("%10.2f %10.3f %12.3f %16.3f %18.3f" % (threshold, answered / len(queries),
+                agreed / answered if answered else 0.0, right / answered if answered else 0.0,
+                combined / len(queries)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Agreement and latency of the n-gram matcher")
+    parser.add_argument('fixtures_dir', nargs = '?', help = "Fixtures of the headlines, only topics are used if not given")
+    parser.add_argument('--lemmatizer', choices = ['fake', 'recorded', 'real'], default = 'fake')
+    parser.add_argument('--naf-dir', help = "Folder of the recorded NAF files, FIXTURES_DIR/naf by default")
+    parser.add_argument('--queries', type = int, default = 200, help = "Number of headline queries")
+    parser.add_argument('--thresholds', default = "0.4,0.5,0.6,0.7,0.8")
+    args = parser.parse_args()
+
+    thresholds = [float(threshold) for threshold in args.thresholds.split(',')]
+
+    with StubServer(args.fixtures_dir) if args.fixtures_dir else contextlib.nullcontext() as server:
+        # Configuration is read at import time
+        os.environ['LINGUO_INDEX_DIR'] = tempfile.mkdtemp()
+        os.environ['LINGUO_NGRAM_MATCHER'] = '0'
+        os.environ['LINGUO_QUERY_CACHE_SIZE'] = '0'
+
+        if server is not None:
+            os.environ['LINGUO_BERRIA_URL'] = server.url
+
+        naf_dir = args.naf_dir or os.path.join(args.fixtures_dir or ".", "naf")
+        install_lemmatizer(args.lemmatizer, naf_dir)
+
+        from QuerySearcher import topics
+        from scrapper import get_all_articles
+
+        compare("Topics", topics, get_topic_queries(), thresholds, "bench_ngram_topics")
+
+        if server is not None:
+            headlines = list(get_all_articles())
+            compare("Headlines", headlines, get_headline_queries(headlines, args.queries), thresholds,
+                    "bench_ngram_headlines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+'''
+Throughput of the lemmatization of a large set of headlines in the calling process, with a
+single tokenizer/lemmatizer pair, and shared between growing numbers of worker processes.
+The lemma cache is emptied before every run, and the results of the workers are checked
+against the ones of the calling process.
+
+Usage:
+    python -m benchmarks.bench_parallel_lemmatize [--texts N] [--processes 1,2,4] [--latency SECONDS] [--real]
+'''
+
+import argparse
+import functools
+import os
+import statistics
+import time
+
+from QuerySearcher import articles
+
+
+def get_headlines(count):
+    '''
+    Builds count different headlines from the sample articles.
+    '''
+    return ["%s %d" % (articles[i % len(articles)], i) for i in range(count)]
+
+
+def measure(searcher, headlines, repeat):
+    '''
+    Lemmatizes the headlines several times, without cached lemmas.
+
+    Returns:
+        Median seconds of a run, and lemmatized headlines
+    '''
+    seconds = []
+
+    for _ in range(repeat):
+        searcher.lemma_cache.clear()
+
+        start = time.perf_counter()
+        lemmatized = searcher.lemmatize_batch(headlines)
+        seconds.append(time.perf_counter() - start)
+
+    return statistics.median(seconds), lemmatized
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Throughput of the parallel lemmatization")
+    parser.add_argument('--texts', type = int, default = 400)
+    parser.add_argument('--processes', default = ",".join(str(n) for n in sorted({1, 2, 4, os.cpu_count()}) if n <= os.cpu_count()),
+                        help = "Comma separated numbers of worker processes")
+    parser.add_argument('--latency', type = float, default = 0.05, help = "Simulated latency of each IxaPipes call")
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--real', action = 'store_true', help = "Use the real IxaPipes tools")
+    args = parser.parse_args()
+
+    from LemmaCache import LemmaCache
+    from LemmatizerPool import LemmatizerPool, create_tools
+    from LemmatizerProcessPool import LemmatizerProcessPool
+    from QuerySearcher import QuerySearcher
+    from benchmarks.fake_lemmatizer import create_fake_tools
+
+    factory = create_tools if args.real else functools.partial(create_fake_tools, latency = args.latency)
+    headlines = get_headlines(args.texts)
+
+    def create_searcher(process_pool):
+        return QuerySearcher(headlines, lemmatizer_pool = LemmatizerPool(1, factory = factory),
+                                lemma_cache = LemmaCache(path = None), backend = "memory",
+                                process_pool = process_pool)
+
+    searcher = create_searcher(None)
+    searcher.lemmatize_batch(headlines[:1])
+    base_seconds, expected = measure(searcher, headlines, args.repeat)
+
+    print("%-12s %12s %12s %10s %8s" % ("processes", "seconds", "texts/s", "speedup", "same"))
+    print("%-12s %12.3f %12.1f %10.2f %8s" % ("in-process", base_seconds, args.texts / base_seconds, 1.0, "-"))
+
+    for processes in [int(processes) for processes in args.processes.split(',')]:
+        pool = LemmatizerProcessPool(processes, factory = factory, min_texts = 0)
+
+        try:
+            pool.warm_up()
+            seconds, lemmatized = measure(create_searcher(pool), headlines, args.repeat)
+
+        finally:
+            pool.close()
+
+        print("%-12d %12.3f %12.1f %10.2f %8s" % (processes, seconds, args.texts / seconds,
+                base_seconds / seconds, lemmatized == expected))
+
+
+if __name__ == "__main__":
+    main()
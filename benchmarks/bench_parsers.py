@@ -0,0 +1,99 @@
+'''
+Compares the parse time and peak memory of the extraction backends of the scrapper over
+saved pages, and checks that all of them give the same output as html.parser.
+
+The main page is "index.html", article pages contain "__" in their name and the rest of
+pages are topics (see benchmarks.stub_server). Peak memory is measured with tracemalloc,
+which does not see the memory allocated by libxml2, so it is a lower bound for lxml.
+
+Usage:
+    python -m benchmarks.bench_parsers [FIXTURES_DIR] [--repeat N]
+'''
+
+import argparse
+import os
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.stub_server import FIXTURES_DIR
+from scrapper import PARSER_BACKENDS, parse_articles, parse_sub_header
+
+
+def get_parser(name):
+    '''
+    Returns the function which extracts the contents of a saved page.
+
+    Parameters:
+        - name (String): Name of the fixture file
+
+    Returns:
+        Function which receives the html file and the backend
+    '''
+    if name == 'index.html':
+        return lambda html_file, backend: parse_articles(html_file, True, backend)
+
+    elif '__' in name:
+        return parse_sub_header
+
+    else:
+        return parse_articles
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Extraction backends benchmark")
+    parser.add_argument('fixtures_dir', nargs = '?', default = FIXTURES_DIR)
+    parser.add_argument('--repeat', type = int, default = 10)
+    args = parser.parse_args()
+
+    pages = []
+    for name in sorted(os.listdir(args.fixtures_dir)):
+        if name.endswith('.html'):
+            with open(os.path.join(args.fixtures_dir, name), encoding = 'utf-8') as f:
+                pages.append((name, f.read()))
+
+    print("%-12s %12s %12s %14s %10s" % ("backend", "median ms", "total ms", "peak mem KiB", "identical"))
+
+    reference = {}
+
+    for backend in PARSER_BACKENDS:
+        latencies = []
+        peak = 0
+        identical = True
+
+        for name, html_file in pages:
+            parse = get_parser(name)
+
+            tracemalloc.start()
+            try:
+                result = parse(html_file, backend)
+
+            except Exception as e:
+                result = type(e)
+
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+            if backend == PARSER_BACKENDS[0]:
+                reference[name] = result
+
+            elif result != reference[name] or (isinstance(result, dict) and list(result) != list(reference[name])):
+                print("Different output for " + name + " with " + backend)
+                identical = False
+
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                try:
+                    parse(html_file, backend)
+
+                except Exception:
+                    pass
+
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        print("%-12s %12.3f %12.1f %14.1f %10s" % (backend, statistics.median(latencies),
+                sum(latencies) / args.repeat, peak / 1024, identical))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+'''
+Compares sequential and concurrent get_all_articles against the stub server.
+
+Usage:
+    python -m benchmarks.bench_scraping [FIXTURES_DIR] [--latency SECONDS] [--repeat N]
+'''
+
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.stub_server import FIXTURES_DIR, StubServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "get_all_articles benchmark")
+    parser.add_argument('fixtures_dir', nargs = '?', default = FIXTURES_DIR)
+    parser.add_argument('--latency', type = float, default = 0.1, help = "Simulated latency of the site")
+    parser.add_argument('--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    with StubServer(args.fixtures_dir, latency = args.latency) as server:
+        # Urls of the scrapper are read at import time
+        os.environ['LINGUO_BERRIA_URL'] = server.url
+        from scrapper import get_all_articles
+
+        reference = None
+
+        for workers in (1, 2, 4, 8):
+            latencies = []
+
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                articles = get_all_articles(max_workers = workers)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            if reference is None:
+                reference = articles
+
+            print("workers=%d median=%.1f ms articles=%d identical=%s" % (workers, statistics.median(latencies),
+                    len(articles), list(articles.items()) == list(reference.items())))
+
+
+if __name__ == "__main__":
+    main()
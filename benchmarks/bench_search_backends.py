@@ -0,0 +1,116 @@
+'''
+Compares the latency and the agreement of the Whoosh and the in-memory search backends.
+
+Documents are simplified with lowercasing and whitespace tokenization instead of IxaPipes,
+since both backends receive already lemmatized texts.
+
+Usage:
+    python -m benchmarks.bench_search_backends [--repeat N]
+'''
+
+import argparse
+import re
+import statistics
+import tempfile
+import time
+
+from IndexManager import IndexManager
+from MemoryIndex import MemoryIndexManager
+from QuerySearcher import topics, articles
+
+
+def simplify(text):
+    '''
+    Approximates the lemmatization of a text by lowercasing it and removing punctuation.
+
+    Parameters:
+        - text (String): Original text
+
+    Returns:
+        Simplified text
+    '''
+    return " ".join(re.findall(r'\w+', text.lower()))
+
+
+def build_queries(documents):
+    '''
+    Builds the benchmark queries: every word of every document and every pair of consecutive words.
+
+    Parameters:
+        - documents (List): List of the simplified documents
+
+    Returns:
+        List of queries
+    '''
+    queries = []
+    for document in documents:
+        words = document.split()
+        queries.extend(words)
+        queries.extend(" ".join(words[i:i + 2]) for i in range(len(words) - 1))
+
+    return queries
+
+
+def time_searches(manager, name, queries, repeat):
+    '''
+    Searches all the queries repeat times.
+
+    Parameters:
+        - manager (IndexManager or MemoryIndexManager): Index manager to benchmark
+        - name (String): Name of the index
+        - queries (List): Queries to search
+        - repeat (int): Number of repetitions
+
+    Returns:
+        List with the results of the first repetition and list with the latency of every search in ms
+    '''
+    results = []
+    latencies = []
+
+    for i in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            result = manager.search(name, query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            if i == 0:
+                results.append(result)
+
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Whoosh vs in-memory search backend benchmark")
+    parser.add_argument('--repeat', type = int, default = 20)
+    args = parser.parse_args()
+
+    print("%-10s %-8s %10s %10s %10s %10s" % ("set", "backend", "update ms", "p50 ms", "p99 ms", "agreement"))
+
+    for set_name, documents in (("topics", topics), ("articles", articles)):
+        documents = [simplify(document) for document in documents]
+        queries = build_queries(documents)
+
+        with tempfile.TemporaryDirectory() as directory:
+            backends = (("whoosh", IndexManager(directory)), ("memory", MemoryIndexManager()))
+            reference = None
+
+            for backend, manager in backends:
+                start = time.perf_counter()
+                manager.update(set_name, documents)
+                update_ms = (time.perf_counter() - start) * 1000
+
+                results, latencies = time_searches(manager, set_name, queries, args.repeat)
+                manager.close()
+
+                if reference is None:
+                    reference = results
+
+                agreement = sum(a == b for a, b in zip(reference, results)) / len(results)
+                latencies.sort()
+
+                print("%-10s %-8s %10.3f %10.3f %10.3f %9.1f%%" % (set_name, backend, update_ms,
+                        statistics.median(latencies), latencies[int(len(latencies) * 0.99)], agreement * 100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+'''
+Startup benchmark of the action server: time until the actions module is imported, which
+is when the server starts answering, and time of the first response, with and without the
+warm-up phase. Every run is a new process against the stub server and the fake lemmatizer,
+whose startup delay simulates the loading of the IxaPipes models.
+
+Usage:
+    python -m benchmarks.bench_startup [FIXTURES_DIR] [--runs N] [--model-load SECONDS]
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.stub_server import FIXTURES_DIR, StubServer
+
+
+def run_child(model_load):
+    '''
+    Imports the actions and answers the first request of a session, printing the timings as JSON.
+    '''
+    start = time.perf_counter()
+
+    from benchmarks.fake_lemmatizer import install_fake_lemmatizer
+    install_fake_lemmatizer(startup = model_load)
+
+    import asyncio
+
+    from rasa_sdk import Tracker
+    from rasa_sdk.executor import CollectingDispatcher
+
+    from actions.actions import ActionGetArticles, ActionReturnNewsTitle
+
+    ready = time.perf_counter()
+
+    def make_tracker(slots):
+        return Tracker("startup", slots, {"entities": []}, [], False, None, {}, None)
+
+    slots = {'topic': 'Kirola', 'open_question': False}
+    events = asyncio.run(ActionGetArticles().run(CollectingDispatcher(), make_tracker(slots), {}))
+    first_response = time.perf_counter()
+
+    for event in events:
+        if event.get('name') is not None:
+            slots[event['name']] = event['value']
+
+    # Keywords of a headline, so that the query is lemmatized and searched
+    from ArticleRegistry import get_article_registry
+    title = get_article_registry().resolve(slots['global_articles'][0])[0]
+    slots['article'] = " ".join(title.replace('"', '').split()[:2])
+
+    asyncio.run(ActionReturnNewsTitle().run(CollectingDispatcher(), make_tracker(slots), {}))
+    first_choice = time.perf_counter()
+
+    print(json.dumps({"ready_ms": (ready - start) * 1000,
+                      "first_response_ms": (first_response - ready) * 1000,
+                      "first_choice_ms": (first_choice - first_response) * 1000,
+                      "total_ms": (first_choice - start) * 1000}))
+
+
+def run_process(server_url, warm_up, model_load):
+    '''
+    Runs the benchmark in a new process.
+
+    Returns:
+        Dictionary with the timings of the process
+    '''
+    env = dict(os.environ, LINGUO_BERRIA_URL = server_url, LINGUO_INDEX_DIR = tempfile.mkdtemp(),
+                LINGUO_WARM_UP = '1' if warm_up else '0')
+
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child",
+                                "--model-load", str(model_load)],
+                            env = env, check = True, capture_output = True, text = True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Startup benchmark of the action server")
+    parser.add_argument('fixtures_dir', nargs = '?', default = FIXTURES_DIR)
+    parser.add_argument('--runs', type = int, default = 5)
+    parser.add_argument('--model-load', type = float, default = 2.0,
+                        help = "Simulated seconds to load the IxaPipes models")
+    parser.add_argument('--child', action = 'store_true', help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.model_load)
+        return
+
+    metrics = ["ready_ms", "first_response_ms", "first_choice_ms", "total_ms"]
+
+    with StubServer(args.fixtures_dir) as server:
+        print("%-10s %12s %20s %18s %12s" % ("warm-up", "ready ms", "first response ms", "first choice ms", "total ms"))
+
+        for warm_up in (False, True):
+            runs = [run_process(server.url, warm_up, args.model_load) for _ in range(args.runs)]
+            medians = [statistics.median(run[metric] for run in runs) for metric in metrics]
+
+            print("%-10s %12.1f %20.1f %18.1f %12.1f" % ("on" if warm_up else "off", *medians))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+'''
+End-to-end benchmark of the hot paths: scrapping, subheaders, lemma extraction, search and
+the run of every action, offline against the stub server. Reports the p50/p95/p99 latency,
+the throughput and the peak memory of every stage, and compares them with a stored baseline.
+
+The lemmatizer can be the fake one, the recorded NAF files of the real IxaPipes tools, or
+the real tools, which require Java and the Basque models. NAF files are recorded with
+--lemmatizer record, and stored in the "naf" folder of the fixtures by default.
+
+Peak memory is measured with tracemalloc in separate runs of each stage, so that tracing
+does not slow down the measured latencies.
+
+By default the synthetic pages of benchmarks/fixtures are served, and the results are compared
+with benchmarks/baseline.json, which was measured on them with the fake lemmatizer. The
+requests are not rate limited, as LINGUO_HTTP_RATE is disabled while the suite runs.
+
+Usage:
+    python -m benchmarks.bench_suite [FIXTURES_DIR] [--lemmatizer fake|recorded|record|real]
+        [--repeat N] [--output FILE] [--baseline FILE] [--tolerance RATIO]
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.stub_server import FIXTURES_DIR, SITE_URL, StubServer, get_fixture_name
+
+LEMMATIZERS = ['fake', 'recorded', 'record', 'real']
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Stages faster than this are not compared with the baseline, as their noise is too high
+MIN_COMPARED_MS = 0.05
+
+MEMORY_RUNS = 3
+
+
+def percentile(values, p):
+    '''
+    Returns the p percentile of a list of values.
+    '''
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def measure(function, repeat):
+    '''
+    Runs a function several times and measures its latency, throughput and peak memory.
+
+    Parameters:
+        - function (Callable): Function to measure
+        - repeat (int): Number of measured runs
+
+    Returns:
+        Dictionary with the results of the stage
+    '''
+    # The first run fills the caches of the imports and of the connections
+    function()
+
+    latencies = []
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        run_start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - run_start)
+
+    seconds = time.perf_counter() - start
+
+    # The lowest of several traced runs, as a single one also sees the garbage of the previous runs
+    peaks = []
+    for _ in range(MEMORY_RUNS):
+        tracemalloc.start()
+        function()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    peak = min(peaks)
+
+    return {"p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000, "ops_per_s": repeat / seconds,
+            "peak_kib": peak / 1024}
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Compares the results with a baseline.
+
+    Parameters:
+        - results (Dict): Results of the stages
+        - baseline (Dict): Results of the stages in the baseline
+        - tolerance (float): Allowed relative increase of the p50 latency and the peak memory
+
+    Returns:
+        List with the regressions found
+    '''
+    regressions = []
+
+    for stage, result in results.items():
+        reference = baseline.get(stage)
+        if reference is None:
+            continue
+
+        for metric in ("p50_ms", "peak_kib"):
+            if metric == "p50_ms" and reference[metric] < MIN_COMPARED_MS:
+                continue
+
+            if result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append("%s %s: %.2f -> %.2f" % (stage, metric, reference[metric], result[metric]))
+
+    return regressions
+
+
+def install_lemmatizer(lemmatizer, naf_dir):
+    '''
+    Replaces the LemmatizerPool of the process by the chosen lemmatizer.
+    '''
+    from benchmarks import fake_lemmatizer
+
+    if lemmatizer == 'fake':
+        fake_lemmatizer.install_fake_lemmatizer()
+
+    elif lemmatizer == 'recorded':
+        fake_lemmatizer.install_recorded_lemmatizer(naf_dir)
+
+    elif lemmatizer == 'record':
+        fake_lemmatizer.install_recording_lemmatizer(naf_dir)
+
+
+def get_stages(fixtures_dir, server):
+    '''
+    Builds the stages of the benchmark.
+
+    Parameters:
+        - fixtures_dir (String): Folder of the fixtures
+        - server (StubServer): Running stub server
+
+    Returns:
+        List of (name, function) tuples
+    '''
+    from rasa_sdk import Tracker
+    from rasa_sdk.executor import CollectingDispatcher
+
+    from LemmatizerPool import get_lemmatizer_pool
+    from QueryResultCache import QueryResultCache
+    from QuerySearcher import QuerySearcher
+    from actions import actions
+    from scrapper import get_all_articles, get_articles, get_file_url, get_lemmatized_text, get_sub_header
+
+    topic = 'Kirola'
+    topic_url = get_file_url(topic)
+    articles = get_articles(topic_url)
+    titles = list(articles)
+
+    # Only the articles saved as fixtures have a subheader
+    saved_urls = [url for url in get_all_articles().values()
+                    if os.path.exists(os.path.join(fixtures_dir, get_fixture_name(url.replace(server.url, SITE_URL))))]
+
+    with get_lemmatizer_pool().acquire() as (tokenizer, lemmatizer):
+        naf_text = lemmatizer._run_text(tokenizer._run_text("\n\n".join(titles)))
+
+    def run_action(action, slots):
+        tracker = Tracker("bench", dict(slots), {"entities": []}, [], False, None, {}, None)
+        return asyncio.run(action.run(CollectingDispatcher(), tracker, {}))
+
+    slots = {'topic': topic, 'open_question': False, 'topic_list': list(actions.topics)}
+    for event in run_action(actions.ActionGetArticles(), slots):
+        slots[event['name']] = event['value']
+
+    # As the actions do, quotes are removed from the queries
+    query = titles[0].replace('"', '')
+
+    chosen = dict(slots, article = slots['global_articles'][0])
+    typed = dict(slots, article = titles[0])
+    keywords = dict(slots, article = " ".join(query.split()[:2]))
+
+    stages = [
+        ("get_articles", lambda: get_articles(topic_url)),
+        ("get_all_articles", get_all_articles),
+        ("get_lemmatized_text", lambda: get_lemmatized_text(naf_text)),
+        # A result cache of size 0 keeps nothing, so that every run lemmatizes and searches
+        ("search_query", lambda: QuerySearcher(titles, index_name = "bench",
+                                                result_cache = QueryResultCache(0)).search_query(query)),
+        ("search_query.cached", lambda: QuerySearcher(titles, index_name = "bench").search_query(query)),
+        ("action_show_topic_news", lambda: run_action(actions.ActionGetArticles(), slots)),
+        ("action_return_news_title.id", lambda: run_action(actions.ActionReturnNewsTitle(), chosen)),
+        ("action_return_news_title.header", lambda: run_action(actions.ActionReturnNewsTitle(), typed)),
+        ("action_return_news_title.keywords", lambda: run_action(actions.ActionReturnNewsTitle(), keywords)),
+        ("action_show_last_topic_news", lambda: run_action(actions.ActionShowLastTopicNews(), slots)),
+        ("action_react_to_reminder", lambda: run_action(actions.ActionReactReminder(), slots)),
+    ]
+
+    if saved_urls:
+        stages.insert(2, ("get_sub_header", lambda: get_sub_header(saved_urls[0])))
+        stages.append(("action_return_url", lambda: run_action(actions.ActionGetUrl(),
+                        dict(slots, last_article = slots['global_articles'][0]))))
+
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "End-to-end benchmark of the hot paths")
+    parser.add_argument('fixtures_dir', nargs = '?', default = FIXTURES_DIR)
+    parser.add_argument('--lemmatizer', choices = LEMMATIZERS, default = 'fake')
+    parser.add_argument('--naf-dir', help = "Folder of the recorded NAF files, FIXTURES_DIR/naf by default")
+    parser.add_argument('--latency', type = float, default = 0.0, help = "Simulated latency of the site")
+    parser.add_argument('--repeat', type = int, default = 20)
+    parser.add_argument('--output', help = "File where the results are saved as JSON, to be used as baseline")
+    parser.add_argument('--baseline', default = BASELINE,
+                        help = "JSON file with the results to compare with, an empty string to not compare")
+    parser.add_argument('--tolerance', type = float, default = 0.25,
+                        help = "Allowed relative increase of the p50 latency and the peak memory")
+    args = parser.parse_args()
+
+    naf_dir = args.naf_dir or os.path.join(args.fixtures_dir, "naf")
+
+    with StubServer(args.fixtures_dir, latency = args.latency) as server:
+        # Configuration is read at import time
+        os.environ['LINGUO_BERRIA_URL'] = server.url
+        os.environ['LINGUO_INDEX_DIR'] = tempfile.mkdtemp()
+        # The stub server is local, so the rate limit of HttpClient would only time the throttle
+        os.environ['LINGUO_HTTP_RATE'] = '0'
+
+        install_lemmatizer(args.lemmatizer, naf_dir)
+
+        print("%-36s %10s %10s %10s %10s %12s" % ("stage", "p50 ms", "p95 ms", "p99 ms", "ops/s", "peak KiB"))
+
+        results = {}
+        for name, function in get_stages(args.fixtures_dir, server):
+            results[name] = result = measure(function, args.repeat)
+            print("%-36s %10.2f %10.2f %10.2f %10.1f %12.1f" % (name, result["p50_ms"], result["p95_ms"],
+                    result["p99_ms"], result["ops_per_s"], result["peak_kib"]))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"lemmatizer": args.lemmatizer, "stages": results}, f, indent = 2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        # Latencies of different lemmatizers are not comparable
+        if baseline.get("lemmatizer") != args.lemmatizer:
+            print("Baseline " + args.baseline + " was measured with the " + str(baseline.get("lemmatizer")) +
+                    " lemmatizer, results are not compared")
+            return
+
+        regressions = compare(results, baseline["stages"], args.tolerance)
+
+        for regression in regressions:
+            print("REGRESSION " + regression)
+
+        if regressions:
+            sys.exit(1)
+
+        print("No regressions against " + args.baseline)
+
+
+if __name__ == "__main__":
+    main()
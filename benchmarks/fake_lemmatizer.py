@@ -0,0 +1,235 @@
+'''
+Fake IxaPipes tokenizer and lemmatizer, so that benchmarks can run without Java and the
+Basque models. The lemma of every token is the token lowercased, and each call can wait
+some time to simulate the IxaPipes client process.
+
+The NAF files returned by the real IxaPipes tools can also be recorded and replayed, so that
+benchmarks parse the same output as in production. Texts which were not recorded are
+answered by the fake tools.
+'''
+
+import hashlib
+import os
+import re
+import time
+from xml.sax.saxutils import escape, quoteattr
+
+import LemmatizerPool
+
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+
+class FakeTokenizer:
+
+    def __init__(self, latency = 0.0):
+        '''
+        Constructor of FakeTokenizer object.
+
+        Parameters:
+            - latency (float): Seconds each call waits
+        '''
+        self.latency = latency
+
+    def _run_text(self, text):
+        '''
+        Tokenizes a text, separating paragraphs by blank lines, and returns it as a NAF file.
+        '''
+        time.sleep(self.latency)
+
+        words = []
+        paragraphs = [paragraph for paragraph in re.split(r'\n\s*\n', text) if paragraph.strip()]
+
+        for para, paragraph in enumerate(paragraphs, 1):
+            for token in TOKEN_RE.findall(paragraph):
+                words.append('<wf id="w%d" sent="%d" para="%d">%s</wf>' % (len(words) + 1, para, para, escape(token)))
+
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n<NAF xml:lang="eu" version="v3">\n<text>\n'
+                + "\n".join(words) + '\n</text>\n</NAF>')
+
+    def close(self):
+        pass
+
+
+class FakePosTagger(FakeTokenizer):
+
+    WF_RE = re.compile(r'<wf id="(w\d+)"[^>]*>([^<]*)</wf>')
+
+    def _run_text(self, naf_text):
+        '''
+        Adds a terms layer to the NAF file of the tokenizer, with the tokens lowercased as lemmas.
+        '''
+        time.sleep(self.latency)
+
+        terms = []
+        for i, (word_id, token) in enumerate(self.WF_RE.findall(naf_text), 1):
+            lemma = token.lower().replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>')
+            terms.append('<term id="t%d" lemma=%s><span><target id="%s"/></span></term>' % (i, quoteattr(lemma), word_id))
+
+        return naf_text.replace('</NAF>', '<terms>\n' + "\n".join(terms) + '\n</terms>\n</NAF>')
+
+
+def get_naf_name(tool_name, text):
+    '''
+    Returns the name of the file where the output of a tool for a text is recorded.
+
+    Parameters:
+        - tool_name (String): "tok" or "pos"
+        - text (String): Input text of the tool
+
+    Returns:
+        Name of the NAF file
+    '''
+    return tool_name + "-" + hashlib.sha1(text.encode('utf-8')).hexdigest()[:20] + ".naf"
+
+
+class RecordedTool:
+
+    def __init__(self, tool_name, naf_dir, fallback, latency = 0.0):
+        '''
+        Constructor of RecordedTool object. Replays the recorded outputs of a tool.
+
+        Parameters:
+            - tool_name (String): "tok" or "pos"
+            - naf_dir (String): Folder of the recorded NAF files
+            - fallback (Object): Tool which answers the texts which were not recorded
+            - latency (float): Seconds each call waits
+        '''
+        self.tool_name = tool_name
+        self.naf_dir = naf_dir
+        self.fallback = fallback
+        self.latency = latency
+        self.misses = 0
+
+    def _run_text(self, text):
+        time.sleep(self.latency)
+
+        try:
+            with open(os.path.join(self.naf_dir, get_naf_name(self.tool_name, text)), encoding = 'utf-8') as f:
+                return f.read()
+
+        except FileNotFoundError:
+            self.misses += 1
+            return self.fallback._run_text(text)
+
+    def close(self):
+        pass
+
+
+class RecordingTool:
+
+    def __init__(self, tool_name, naf_dir, tool):
+        '''
+        Constructor of RecordingTool object. Saves the outputs of a real IxaPipes tool.
+
+        Parameters:
+            - tool_name (String): "tok" or "pos"
+            - naf_dir (String): Folder of the recorded NAF files
+            - tool (Object): Real IxaPipes tool
+        '''
+        self.tool_name = tool_name
+        self.naf_dir = naf_dir
+        self.tool = tool
+
+    def _run_text(self, text):
+        naf_text = self.tool._run_text(text)
+
+        with open(os.path.join(self.naf_dir, get_naf_name(self.tool_name, text)), 'w', encoding = 'utf-8') as f:
+            f.write(naf_text)
+
+        return naf_text
+
+    def close(self):
+        self.tool.close()
+
+
+def create_fake_tools(port = 0, latency = 0.0, startup = 0.0):
+    '''
+    Creates a fake tokenizer/lemmatizer pair.
+
+    Parameters:
+        - port (int): Unused, as the fake tools run no server
+        - latency (float): Seconds each call waits
+        - startup (float): Seconds the creation waits, to simulate the loading of the models
+
+    Returns:
+        Tokenizer and lemmatizer objects
+    '''
+    time.sleep(startup)
+
+    return FakeTokenizer(latency), FakePosTagger(latency)
+
+
+def install_fake_lemmatizer(latency = 0.0, size = LemmatizerPool.POOL_SIZE, startup = 0.0):
+    '''
+    Replaces the LemmatizerPool shared by the process by a pool of fake tools.
+
+    Parameters:
+        - latency (float): Seconds each call waits
+        - size (int): Size of the pool
+        - startup (float): Seconds the creation of each pair waits
+
+    Returns:
+        New LemmatizerPool object
+    '''
+    pool = LemmatizerPool.LemmatizerPool(size, factory = lambda port: create_fake_tools(port, latency, startup))
+    LemmatizerPool._pool = pool
+
+    return pool
+
+
+def create_recorded_tools(naf_dir, latency = 0.0):
+    '''
+    Creates a tokenizer/lemmatizer pair which replays the recorded NAF files.
+
+    Parameters:
+        - naf_dir (String): Folder of the recorded NAF files
+        - latency (float): Seconds each call waits
+
+    Returns:
+        Tokenizer and lemmatizer objects
+    '''
+    return (RecordedTool("tok", naf_dir, FakeTokenizer(), latency),
+            RecordedTool("pos", naf_dir, FakePosTagger(), latency))
+
+
+def install_recorded_lemmatizer(naf_dir, latency = 0.0, size = LemmatizerPool.POOL_SIZE):
+    '''
+    Replaces the LemmatizerPool shared by the process by a pool which replays the recorded
+    NAF files.
+
+    Parameters:
+        - naf_dir (String): Folder of the recorded NAF files
+        - latency (float): Seconds each call waits
+        - size (int): Size of the pool
+
+    Returns:
+        New LemmatizerPool object
+    '''
+    pool = LemmatizerPool.LemmatizerPool(size, factory = lambda port: create_recorded_tools(naf_dir, latency))
+    LemmatizerPool._pool = pool
+
+    return pool
+
+
+def install_recording_lemmatizer(naf_dir, size = LemmatizerPool.POOL_SIZE):
+    '''
+    Replaces the LemmatizerPool shared by the process by a pool of real IxaPipes tools which
+    record their NAF files. Requires Java and the Basque models.
+
+    Parameters:
+        - naf_dir (String): Folder where the NAF files are recorded
+        - size (int): Size of the pool
+
+    Returns:
+        New LemmatizerPool object
+    '''
+    os.makedirs(naf_dir, exist_ok = True)
+
+    def create_tools(port):
+        tokenizer, lemmatizer = LemmatizerPool.create_tools(port)
+        return RecordingTool("tok", naf_dir, tokenizer), RecordingTool("pos", naf_dir, lemmatizer)
+
+    pool = LemmatizerPool.LemmatizerPool(size, factory = create_tools)
+    LemmatizerPool._pool = pool
+
+    return pool
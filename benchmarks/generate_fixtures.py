@@ -0,0 +1,114 @@
+'''
+Generates a small synthetic copy of berria.eus for the stub server, with the same markup
+that the scrapper parses: the main page, every topic page and some of their articles. The
+pages are generated from a fixed seed, so that the benchmarks can be run and compared with
+their baseline on a fresh checkout, without recording the real site first.
+
+The generated pages are stored in benchmarks/fixtures, the default folder of the benchmarks.
+
+Usage:
+    python -m benchmarks.generate_fixtures [FIXTURES_DIR] [--articles N] [--saved N] [--seed N]
+'''
+
+import argparse
+import os
+import random
+
+from benchmarks.stub_server import FIXTURES_DIR, SITE_URL, get_fixture_name
+
+# Path of every topic page, except the main page
+TOPIC_PATHS = ["irakurriena", "gizartea", "politika", "ekonomia", "mundua", "iritzia", "kultura", "kirola", "bizigiro"]
+
+WORDS = ["euskara", "gobernu", "lege", "greba", "langile", "enpresa", "ekonomia", "mundu", "kultura",
+            "liburu", "musika", "jaialdi", "kirola", "futbol", "partida", "irabazi", "galdu", "berri"]
+
+# Headers of the main page which are taken from the articles of the topics
+MAIN_SPECIAL = 5
+MAIN_ARTICLES = 10
+
+
+def get_headline(rng):
+    '''
+    Returns a random headline of 4 to 9 words.
+    '''
+    words = [rng.choice(WORDS) for _ in range(rng.randint(4, 9))]
+    return " ".join(words).capitalize()
+
+
+def get_link(tag, headline, url):
+    '''
+    Returns the markup of a header linking to an article.
+    '''
+    return '<%s class="article-titu"><a href="%s">%s</a></%s>' % (tag, url, headline, tag)
+
+
+def get_article_page(headline):
+    '''
+    Returns the page of an article, with its subheader and first paragraph.
+    '''
+    return ('<html><body><nav>menu</nav><div id="albistea_titu"><h1>%s</h1>'
+            '<div class="article-sarrera">%s sarrera</div></div>'
+            '<div class="article-testua"><p>Lehen paragrafoa</p></div></body></html>' % (headline, headline))
+
+
+def generate(fixtures_dir, articles = 12, saved = 3, seed = 0):
+    '''
+    Writes the pages of the synthetic site.
+
+    Parameters:
+        - fixtures_dir (String): Folder of the fixtures
+        - articles (int): Articles of every topic page
+        - saved (int): Articles of every topic whose page is saved, so that they have a subheader
+        - seed (int): Seed of the random headlines
+
+    Returns:
+        Number of pages written
+    '''
+    rng = random.Random(seed)
+    pages = {}
+    main_links = []
+
+    for path in TOPIC_PATHS:
+        links = []
+
+        for i in range(articles):
+            headline = get_headline(rng)
+            url = "%s/%s/%d/%s.htm" % (SITE_URL, path, i, "-".join(headline.lower().split()))
+            links.append((headline, url))
+
+            if i < saved:
+                pages[url] = get_article_page(headline)
+
+        pages[SITE_URL + "/" + path + "/"] = ('<html><body><nav>menu</nav>' +
+            "".join('<div class="art">%s</div>' % get_link(rng.choice(['h2', 'h3', 'h4']), headline, url)
+                    for headline, url in links) + '</body></html>')
+
+        main_links.extend(links[:2])
+
+    special = "".join(get_link('h3', headline, url) for headline, url in main_links[:MAIN_SPECIAL])
+    main = "".join(get_link('h2', headline, url) for headline, url in main_links[MAIN_SPECIAL:MAIN_SPECIAL + MAIN_ARTICLES])
+    pages[SITE_URL + "/"] = ('<html><body><div id="bereziak">%s</div><div id="nagusiak">%s</div></body></html>'
+                                % (special, main))
+
+    os.makedirs(fixtures_dir, exist_ok = True)
+
+    for url, html_file in pages.items():
+        with open(os.path.join(fixtures_dir, get_fixture_name(url)), 'w', encoding = 'utf-8') as f:
+            f.write(html_file + "\n")
+
+    return len(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Generate a synthetic berria.eus for the stub server")
+    parser.add_argument('fixtures_dir', nargs = '?', default = FIXTURES_DIR)
+    parser.add_argument('--articles', type = int, default = 12, help = "Articles per topic")
+    parser.add_argument('--saved', type = int, default = 3, help = "Articles saved per topic")
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+
+    print(str(generate(args.fixtures_dir, args.articles, args.saved, args.seed)) + " pages written to " + args.fixtures_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+'''
+Load test of the custom actions: N simultaneous sessions ask for the articles of a topic
+and then choose one of them, against the stub server and the fake lemmatizer. Reports the
+p50/p99 latency of every action and the throughput of the sessions.
+
+Usage:
+    python -m benchmarks.load_test [FIXTURES_DIR] [--sessions 1,4,16,64] [--latency SECONDS]
+'''
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.stub_server import FIXTURES_DIR, StubServer
+
+
+def percentile(values, p):
+    '''
+    Returns the p percentile of a list of values.
+    '''
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def make_tracker(sender_id, slots):
+    '''
+    Builds the Tracker of a session with the given slots.
+    '''
+    from rasa_sdk import Tracker
+
+    return Tracker(sender_id, slots, {"entities": []}, [], False, None, {}, None)
+
+
+async def run_session(session_id, topic, latencies):
+    '''
+    Runs a session which asks for the articles of a topic and chooses one of them.
+
+    Parameters:
+        - session_id (int): Id of the session
+        - topic (String): Topic asked by the session
+        - latencies (Dict): Latencies of every action, filled by the session
+    '''
+    from rasa_sdk.executor import CollectingDispatcher
+    from actions.actions import ActionGetArticles, ActionReturnNewsTitle
+
+    slots = {'topic': topic, 'open_question': False}
+
+    start = time.perf_counter()
+    events = await ActionGetArticles().run(CollectingDispatcher(), make_tracker(str(session_id), slots), {})
+    latencies["action_show_topic_news"].append(time.perf_counter() - start)
+
+    for event in events:
+        if event.get('name') is not None:
+            slots[event['name']] = event['value']
+
+    if not slots.get('global_articles'):
+        return
+
+    slots['article'] = random.choice(list(slots['global_articles'])).replace(" artikulua", "")
+
+    start = time.perf_counter()
+    await ActionReturnNewsTitle().run(CollectingDispatcher(), make_tracker(str(session_id), slots), {})
+    latencies["action_return_news_title"].append(time.perf_counter() - start)
+
+
+async def run_load(sessions, topics):
+    '''
+    Runs the given number of sessions at the same time.
+
+    Returns:
+        Dictionary with the latencies of every action and the total seconds
+    '''
+    latencies = {"action_show_topic_news": [], "action_return_news_title": []}
+
+    start = time.perf_counter()
+    await asyncio.gather(*[run_session(i, topics[i % len(topics)], latencies) for i in range(sessions)])
+
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Load test of the custom actions")
+    parser.add_argument('fixtures_dir', nargs = '?', default = FIXTURES_DIR)
+    parser.add_argument('--sessions', default = "1,4,16,64", help = "Comma separated numbers of sessions")
+    parser.add_argument('--latency', type = float, default = 0.05, help = "Simulated latency of the site")
+    parser.add_argument('--lemmatizer-latency', type = float, default = 0.2,
+                        help = "Simulated latency of each IxaPipes call")
+    args = parser.parse_args()
+
+    with StubServer(args.fixtures_dir, latency = args.latency) as server:
+        # Configuration is read at import time
+        os.environ['LINGUO_BERRIA_URL'] = server.url
+        os.environ['LINGUO_INDEX_DIR'] = tempfile.mkdtemp()
+
+        from benchmarks.fake_lemmatizer import install_fake_lemmatizer
+        install_fake_lemmatizer(args.lemmatizer_latency)
+
+        topics = ['Gizartea', 'Politika', 'Ekonomia', 'Mundua', 'Iritzia', 'Kultura', 'Kirola', 'Bizigiro']
+
+        print("%9s %-26s %10s %10s %16s" % ("sessions", "action", "p50 ms", "p99 ms", "sessions/s"))
+
+        for sessions in [int(sessions) for sessions in args.sessions.split(',')]:
+            latencies, seconds = asyncio.run(run_load(sessions, topics))
+
+            for action, values in latencies.items():
+                if values:
+                    print("%9d %-26s %10.1f %10.1f %16.2f" % (sessions, action, percentile(values, 50) * 1000,
+                            percentile(values, 99) * 1000, sessions / seconds))
+
+        from ArticleResolver import get_article_resolver
+        print("Articles resolved by tier: %s" % get_article_resolver().stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+'''
+Saves the current berria.eus topic pages, and optionally some of their articles, as fixtures
+for the stub server.
+
+Usage:
+    python -m benchmarks.record_fixtures FIXTURES_DIR [--articles N]
+'''
+
+import argparse
+import os
+
+from benchmarks.stub_server import get_fixture_name
+from scrapper import fetch_html, get_file_url, parse_articles
+
+all_topics = ['Azken berriak', 'Berri irakurrienak', 'Gizartea',
+            'Politika', 'Ekonomia', 'Mundua', 'Iritzia', 'Kultura', 'Kirola', 'Bizigiro']
+
+
+def save_page(fixtures_dir, url):
+    '''
+    Downloads a page and stores it in the fixtures folder.
+
+    Parameters:
+        - fixtures_dir (String): Folder of the fixtures
+        - url (String): Url of the page
+
+    Returns:
+        Text of the html page
+    '''
+    html_file = fetch_html(url)
+
+    with open(os.path.join(fixtures_dir, get_fixture_name(url)), 'w', encoding = 'utf-8') as f:
+        f.write(html_file)
+
+    return html_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Record berria.eus pages as fixtures")
+    parser.add_argument('fixtures_dir')
+    parser.add_argument('--articles', type = int, default = 3, help = "Articles saved per topic")
+    args = parser.parse_args()
+
+    os.makedirs(args.fixtures_dir, exist_ok = True)
+
+    for topic in all_topics:
+        url = get_file_url(topic)
+        html_file = save_page(args.fixtures_dir, url)
+        articles = parse_articles(html_file, topic == 'Azken berriak')
+        print(topic + ": " + str(len(articles)) + " articles")
+
+        for article_url in list(articles.values())[:args.articles]:
+            try:
+                save_page(args.fixtures_dir, article_url)
+
+            except Exception as e:
+                print("Could not save " + str(article_url) + ": " + str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+'''
+Local HTTP server which serves saved berria.eus pages, so that the scrapper can be run offline.
+
+A page is stored in the fixtures folder with the name given by get_fixture_name, e.g.
+"/gizartea/" is served from "gizartea.html" and "/" from "index.html". Links to the site
+inside the pages are rewritten to point to the stub server.
+
+Latency and failures can be injected to test the retries and the circuit breaker of the
+scrapper: a ratio of the requests, or the next N requests, are answered with an error status.
+Pages are gzip compressed when the client accepts it.
+
+Usage:
+    python -m benchmarks.stub_server [FIXTURES_DIR] [--port PORT] [--latency SECONDS] [--failure-rate RATIO]
+
+    LINGUO_BERRIA_URL=http://localhost:PORT rasa run actions
+'''
+
+import argparse
+import gzip
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+SITE_URL = "https://www.berria.eus"
+
+# Synthetic pages generated by generate_fixtures, used when no fixtures folder is given
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def get_fixture_name(url):
+    '''
+    Returns the name of the file where the page of an url is stored.
+
+    Parameters:
+        - url (String): Url or path of the page
+
+    Returns:
+        Name of the fixture file
+    '''
+    path = urlsplit(url).path.strip('/')
+    name = path.replace('/', '__') or 'index'
+
+    if not name.endswith('.html'):
+        name += '.html'
+
+    return name
+
+
+class StubServer:
+
+    def __init__(self, fixtures_dir, port = 0, latency = 0.0, failure_rate = 0.0, failure_status = 503):
+        '''
+        Constructor of StubServer object. Latency and failures can be changed while serving.
+
+        Parameters:
+            - fixtures_dir (String): Folder with the saved pages
+            - port (int): Port of the server. If 0, a free port is chosen
+            - latency (float): Seconds to wait before answering each request
+            - failure_rate (float): Ratio of the requests answered with failure_status
+            - failure_status (int): Status code of the failed requests
+        '''
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.requests = 0
+        self.failures = 0
+        self.pending_failures = 0
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                path = os.path.join(stub.fixtures_dir, get_fixture_name(self.path))
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                if stub.should_fail():
+                    self.send_error(stub.failure_status)
+                    return
+
+                if not os.path.exists(path):
+                    self.send_error(404)
+                    return
+
+                with open(path, encoding = 'utf-8') as f:
+                    body = f.read().replace(SITE_URL, stub.url).encode('utf-8')
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body)
+                    self.send_header('Content-Encoding', 'gzip')
+
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:" + str(self.server.server_address[1])
+        self.thread = None
+
+    def should_fail(self):
+        '''
+        Counts a request and decides whether if it has to fail.
+
+        Returns:
+            True if the request has to be answered with an error, False otherwise
+        '''
+        with self.lock:
+            self.requests += 1
+            fail = self.pending_failures > 0 or random.random() < self.failure_rate
+
+            if self.pending_failures > 0:
+                self.pending_failures -= 1
+
+            self.failures += fail
+
+        return fail
+
+    def fail_next(self, count):
+        '''
+        Makes the next requests fail.
+
+        Parameters:
+            - count (int): Number of requests which will fail
+        '''
+        with self.lock:
+            self.pending_failures = count
+
+    def start(self):
+        '''
+        Starts serving in a background thread.
+
+        Returns:
+            Url of the server
+        '''
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        '''
+        Stops the server.
+        '''
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Serve saved berria.eus pages")
+    parser.add_argument('fixtures_dir', nargs = '?', default = FIXTURES_DIR)
+    parser.add_argument('--port', type = int, default = 8000)
+    parser.add_argument('--latency', type = float, default = 0.0)
+    parser.add_argument('--failure-rate', type = float, default = 0.0, help = "Ratio of the requests which fail")
+    args = parser.parse_args()
+
+    server = StubServer(args.fixtures_dir, args.port, args.latency, args.failure_rate)
+    print("Serving " + args.fixtures_dir + " at " + server.url)
+
+    try:
+        server.server.serve_forever()
+
+    except KeyboardInterrupt:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
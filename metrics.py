@@ -0,0 +1,313 @@
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Metrics are only collected if enabled. Otherwise spans are a shared no-op context manager
+# and timed functions are not wrapped at all
+METRICS_ENABLED = os.environ.get('LINGUO_METRICS', '0') == '1'
+
+# Port of the Prometheus text endpoint, 0 to disable it
+METRICS_PORT = int(os.environ.get('LINGUO_METRICS_PORT', 9108))
+
+# Seconds between two structured logs of the metrics, 0 to disable them
+METRICS_LOG_INTERVAL = float(os.environ.get('LINGUO_METRICS_LOG_INTERVAL', 0))
+
+METRICS_PREFIX = "linguo"
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_NOOP_SPAN = contextlib.nullcontext()
+
+
+class Stage:
+
+    def __init__(self, name):
+        '''
+        Constructor of Stage object. Stores the latency histogram and the in-flight count of a stage.
+
+        Parameters:
+            - name (String): Name of the stage
+        '''
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.in_flight = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def observe(self, seconds, failed = False):
+        '''
+        Records a finished run of the stage.
+
+        Parameters:
+            - seconds (float): Duration of the run
+            - failed (Boolean): Whether if the run raised an exception
+        '''
+        with self.lock:
+            self.in_flight -= 1
+            self.count += 1
+            self.total += seconds
+            self.errors += failed
+
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+                    break
+
+
+class Span:
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.stage.start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stage.observe(time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+
+_stages = {}
+_counters = {}
+_stats = {}
+_lock = threading.Lock()
+_started = False
+
+
+def get_stage(name):
+    '''
+    Returns the stage with the given name, creating it the first time.
+    '''
+    stage = _stages.get(name)
+
+    if stage is None:
+        with _lock:
+            stage = _stages.setdefault(name, Stage(name))
+
+    return stage
+
+
+def span(name):
+    '''
+    Context manager which measures the latency and the in-flight runs of a stage.
+
+    Parameters:
+        - name (String): Name of the stage
+
+    Returns:
+        Context manager of the span
+    '''
+    if not METRICS_ENABLED:
+        return _NOOP_SPAN
+
+    return Span(get_stage(name))
+
+
+def timed(name):
+    '''
+    Decorator which measures every call of a function, or coroutine function, as a stage.
+    If metrics are disabled, the function is returned as it is.
+
+    Parameters:
+        - name (String): Name of the stage
+    '''
+    def decorator(function):
+        if not METRICS_ENABLED:
+            return function
+
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def increment(name, value = 1):
+    '''
+    Increments a counter.
+
+    Parameters:
+        - name (String): Name of the counter
+        - value (int): Amount to add
+    '''
+    if not METRICS_ENABLED:
+        return
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def register_stats(name, stats):
+    '''
+    Registers a function which returns numeric statistics, such as the hits of a cache, to be
+    exported as gauges.
+
+    Parameters:
+        - name (String): Name of the statistics source
+        - stats (Callable): Function which returns a dictionary of numbers
+    '''
+    with _lock:
+        _stats[name] = stats
+
+
+def snapshot():
+    '''
+    Returns the current value of all the metrics.
+
+    Returns:
+        Dictionary with the stages, counters and statistics
+    '''
+    with _lock:
+        stages = list(_stages.values())
+        counters = dict(_counters)
+        stats = dict(_stats)
+
+    result = {"stages": {}, "counters": counters, "stats": {}}
+
+    for stage in stages:
+        with stage.lock:
+            result["stages"][stage.name] = {"count": stage.count, "errors": stage.errors,
+                                            "seconds": stage.total, "in_flight": stage.in_flight,
+                                            "buckets": list(stage.buckets)}
+
+    for name, function in stats.items():
+        try:
+            result["stats"][name] = {key: value for key, value in function().items()
+                                        if isinstance(value, (int, float))}
+
+        except Exception:
+            logger.debug("Could not read the statistics of %s", name, exc_info = True)
+
+    return result
+
+
+def render():
+    '''
+    Returns all the metrics in the Prometheus text format.
+
+    Returns:
+        Text of the metrics
+    '''
+    metrics = snapshot()
+    lines = []
+
+    lines.append("# TYPE %s_stage_seconds histogram" % METRICS_PREFIX)
+    for name, stage in sorted(metrics["stages"].items()):
+        cumulative = 0
+
+        for bound, count in zip(BUCKETS, stage["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else repr(bound)
+            lines.append('%s_stage_seconds_bucket{stage="%s",le="%s"} %d' % (METRICS_PREFIX, name, le, cumulative))
+
+        lines.append('%s_stage_seconds_sum{stage="%s"} %f' % (METRICS_PREFIX, name, stage["seconds"]))
+        lines.append('%s_stage_seconds_count{stage="%s"} %d' % (METRICS_PREFIX, name, stage["count"]))
+
+    lines.append("# TYPE %s_stage_errors_total counter" % METRICS_PREFIX)
+    for name, stage in sorted(metrics["stages"].items()):
+        lines.append('%s_stage_errors_total{stage="%s"} %d' % (METRICS_PREFIX, name, stage["errors"]))
+
+    lines.append("# TYPE %s_stage_in_flight gauge" % METRICS_PREFIX)
+    for name, stage in sorted(metrics["stages"].items()):
+        lines.append('%s_stage_in_flight{stage="%s"} %d' % (METRICS_PREFIX, name, stage["in_flight"]))
+
+    lines.append("# TYPE %s_events_total counter" % METRICS_PREFIX)
+    for name, value in sorted(metrics["counters"].items()):
+        lines.append('%s_events_total{event="%s"} %d' % (METRICS_PREFIX, name, value))
+
+    for source, stats in sorted(metrics["stats"].items()):
+        for key, value in sorted(stats.items()):
+            lines.append("# TYPE %s_%s_%s gauge" % (METRICS_PREFIX, source, key))
+            lines.append("%s_%s_%s %s" % (METRICS_PREFIX, source, key, float(value)))
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def log_metrics(interval):
+    '''
+    Logs all the metrics as a JSON line every interval seconds.
+
+    Parameters:
+        - interval (float): Seconds between two logs
+    '''
+    while True:
+        time.sleep(interval)
+        logger.info("metrics %s", json.dumps(snapshot(), sort_keys = True))
+
+
+def start_metrics(port = METRICS_PORT, log_interval = METRICS_LOG_INTERVAL):
+    '''
+    Starts the Prometheus text endpoint and the structured log of the metrics, if metrics
+    are enabled. Only the first call starts them.
+
+    Parameters:
+        - port (int): Port of the /metrics endpoint, 0 to disable it
+        - log_interval (float): Seconds between two structured logs, 0 to disable them
+    '''
+    global _started
+
+    with _lock:
+        if not METRICS_ENABLED or _started:
+            return
+
+        _started = True
+
+    if port:
+        try:
+            server = ThreadingHTTPServer(("", port), MetricsHandler)
+            threading.Thread(target = server.serve_forever, name = "metrics-server", daemon = True).start()
+            logger.info("Metrics served on port %d", port)
+
+        except OSError:
+            logger.warning("Could not serve the metrics on port %d", port, exc_info = True)
+
+    if log_interval:
+        threading.Thread(target = log_metrics, args = (log_interval,), name = "metrics-log", daemon = True).start()
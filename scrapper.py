@@ -1,21 +1,125 @@
 
+import hashlib
+import logging
+import os
+import re
 import traceback
-from bs4 import BeautifulSoup
-import requests
-
-AZKEN_BERRIAK_URL = "https://www.berria.eus"
-IRAKURRIENAK_URL = "https://www.berria.eus/irakurriena/"
-GIZARTEA_URL = "https://www.berria.eus/gizartea/"
-POLITIKA_URL = "https://www.berria.eus/politika/"
-EKONOMIA_URL = "https://www.berria.eus/ekonomia/"
-MUNDUA_URL = "https://www.berria.eus/mundua/"
-IRITZIA_URL = "https://www.berria.eus/iritzia/"
-KULTURA_URL = "https://www.berria.eus/kultura/"
-KIROLA_URL = "https://www.berria.eus/kirola/"
-BIZIGIRO_URL = "https://www.berria.eus/bizigiro/"
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# The site can be replaced, e.g. by a local stub server serving saved pages
+BERRIA_URL = os.environ.get('LINGUO_BERRIA_URL', "https://www.berria.eus").rstrip('/')
+
+AZKEN_BERRIAK_URL = BERRIA_URL
+IRAKURRIENAK_URL = BERRIA_URL + "/irakurriena/"
+GIZARTEA_URL = BERRIA_URL + "/gizartea/"
+POLITIKA_URL = BERRIA_URL + "/politika/"
+EKONOMIA_URL = BERRIA_URL + "/ekonomia/"
+MUNDUA_URL = BERRIA_URL + "/mundua/"
+IRITZIA_URL = BERRIA_URL + "/iritzia/"
+KULTURA_URL = BERRIA_URL + "/kultura/"
+KIROLA_URL = BERRIA_URL + "/kirola/"
+BIZIGIRO_URL = BERRIA_URL + "/bizigiro/"
+
+# Key: topic chosen by the user, value: url of the topic
+TOPIC_URLS = {
+    "Azken berriak": AZKEN_BERRIAK_URL,
+    "Berri irakurrienak": IRAKURRIENAK_URL,
+    "Gizartea": GIZARTEA_URL,
+    "Politika": POLITIKA_URL,
+    "Ekonomia": EKONOMIA_URL,
+    "Mundua": MUNDUA_URL,
+    "Iritzia": IRITZIA_URL,
+    "Kultura": KULTURA_URL,
+    "Kirola": KIROLA_URL,
+    "Bizigiro": BIZIGIRO_URL,
+}
+
+REQUEST_TIMEOUT = float(os.environ.get('LINGUO_REQUEST_TIMEOUT', 10))
+SCRAPE_WORKERS = int(os.environ.get('LINGUO_SCRAPE_WORKERS', 8))
+
+# Backend used to extract the articles and subheaders from the html files:
+#   - html.parser: BeautifulSoup tree of the whole page
+#   - strainer: BeautifulSoup tree restricted to the containers of the wanted nodes
+#   - lxml: lxml tree queried with XPath, which requires lxml to be installed
+PARSER_BACKENDS = ['html.parser', 'strainer', 'lxml']
+PARSER_BACKEND = os.environ.get('LINGUO_PARSER_BACKEND', 'html.parser')
+
+# While parsing, SoupStrainer sees the whole class attribute instead of each class
+ARTICLE_TITU_CLASS = re.compile(r'(^|\s)article-titu(\s|$)')
+ARTICLE_TESTUA_CLASS = re.compile(r'(^|\s)article-testua(\s|$)')
+
+NAF_CHUNK_SIZE = 64 * 1024
+
+# Markup which the articles are parsed from: the headers, and the containers of the main page.
+# Ads, dates and scripts elsewhere in the page do not change the fingerprint
+HEADLINE_MARKUP_RE = re.compile(r'<h[234][^>]*article-titu.*?</h[234]>|\bid\s*=\s*["\'](?:bereziak|nagusiak)["\']',
+                                re.IGNORECASE | re.DOTALL)
+
+ARTICLE_TITU_XPATH = "contains(concat(' ', normalize-space(@class), ' '), ' article-titu ')"
+ARTICLE_SARRERA_XPATH = "contains(concat(' ', normalize-space(@class), ' '), ' article-sarrera ')"
+ARTICLE_TESTUA_XPATH = "contains(concat(' ', normalize-space(@class), ' '), ' article-testua ')"
 
 topics = ["Gizartea", "Politika", "Ekonomia", "Mundua", "Iritzia", "Kultura", "Kirola", "Bizigiro"]
 
+@timed("fetch")
+def fetch_html(url, timeout = REQUEST_TIMEOUT):
+    '''
+    Downloads an html page with the shared HTTP client.
+
+    Parameters:
+        - url (String): Url of the page
+        - timeout (float): Seconds to wait for the server before giving up
+
+    Returns:
+        Text of the html page
+    '''
+    # The HTTP client and BeautifulSoup are imported when first used, so that importing
+    # the scrapper does not slow down the startup of the action server
+    from HttpClient import get_http_client
+
+    response = get_http_client().get(url, timeout = timeout)
+    response.raise_for_status()
+
+    return response.text
+
+
+@timed("fetch")
+def fetch_page(url, etag = None, last_modified = None, timeout = REQUEST_TIMEOUT):
+    '''
+    Downloads an html page with a conditional request, so that the server can answer that
+    the page has not changed without sending it again.
+
+    Parameters:
+        - url (String): Url of the page
+        - etag (String): ETag of the last downloaded version of the page, if any
+        - last_modified (String): Last-Modified date of the last downloaded version of the page, if any
+        - timeout (float): Seconds to wait for the server before giving up
+
+    Returns:
+        requests.Response object. Its status code is 304 if the page has not changed
+    '''
+    headers = {}
+
+    if etag:
+        headers['If-None-Match'] = etag
+
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    from HttpClient import get_http_client
+
+    response = get_http_client().get(url, headers = headers, timeout = timeout)
+
+    if response.status_code != 304:
+        response.raise_for_status()
+
+    return response
+
 def get_file_url(option):
 
     '''
@@ -28,46 +132,58 @@ def get_file_url(option):
         Url of the chosen topic. If the option is not a topic, None is returned.
     '''
 
-    if option == "Azken berriak":
-        return AZKEN_BERRIAK_URL
+    return TOPIC_URLS.get(option)
 
-    elif option == "Berri irakurrienak":
-        return IRAKURRIENAK_URL
+def get_articles(url, main_articles = False, timeout = REQUEST_TIMEOUT):
+    '''
+    Given the url of a topic, gets all the main headers and the links to the articles by using scrapping. 
 
-    elif option == "Gizartea":
-        return GIZARTEA_URL
+    Parameters:
+        - url (String): Url of the topic
+        - main_articles (Boolean): Whether if the url is the main page of the site or not
+        - timeout (float): Seconds to wait for the server before giving up
 
-    elif option == "Politika":
-        return POLITIKA_URL
+    Returns:
+        - A dictionary where:
+            Key: Main header of the article
+            Value: Url to the article
+    '''
 
-    elif option == "Ekonomia":
-        return EKONOMIA_URL
+    html_file = fetch_html(url, timeout)
 
-    elif option == "Mundua":
-        return MUNDUA_URL
+    return parse_articles(html_file, main_articles)
 
-    elif option == "Iritzia":
-        return IRITZIA_URL
 
-    elif option == "Kultura":
-        return KULTURA_URL
+def get_page_fingerprint(html_file):
+    '''
+    Returns a fingerprint of the headers of a topic page, in their order, so that a page
+    whose articles have not changed does not need to be parsed again.
 
-    elif option == "Kirola":
-        return KIROLA_URL
+    Parameters:
+        - html_file (String): Text of the html page
 
-    elif option == "Bizigiro":
-        return BIZIGIRO_URL
+    Returns:
+        String with the fingerprint
+    '''
+    digest = hashlib.sha1()
+
+    for markup in HEADLINE_MARKUP_RE.findall(html_file):
+        digest.update(markup.encode('utf-8'))
+        digest.update(b'\0')
+
+    return digest.hexdigest()
 
-    else:
-        return None
 
-def get_articles(url, main_articles = False):
+@timed("parse_articles")
+def parse_articles(html_file, main_articles = False, backend = None):
     '''
-    Given an html file, gets all the main headers and the links to the articles by using scrapping. 
+    Given an html file, gets all the main headers and the links to the articles.
     Included classes and id values are selected taking into account the html files' structure.
 
     Parameters:
-        - file (String): Name of the html file
+        - html_file (String): Text of the html file
+        - main_articles (Boolean): Whether if the html file is the main page of the site or not
+        - backend (String): Extraction backend, one of PARSER_BACKENDS. Defaults to PARSER_BACKEND
 
     Returns:
         - A dictionary where:
@@ -75,8 +191,28 @@ def get_articles(url, main_articles = False):
             Value: Url to the article
     '''
 
-    html_file = requests.get(url).text
-    soup = BeautifulSoup(html_file, 'html.parser')
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    backend = backend or PARSER_BACKEND
+
+    if backend == 'lxml':
+        return _parse_articles_lxml(html_file, main_articles)
+
+    elif backend == 'strainer':
+        # Only the containers of the headers are built, instead of the whole page
+        if main_articles:
+            strainer = SoupStrainer(id=['bereziak', 'nagusiak'])
+
+        else:
+            strainer = SoupStrainer(['h2', 'h3', 'h4'], class_=ARTICLE_TITU_CLASS)
+
+        soup = BeautifulSoup(html_file, 'html.parser', parse_only=strainer)
+
+    elif backend == 'html.parser':
+        soup = BeautifulSoup(html_file, 'html.parser')
+
+    else:
+        raise ValueError("Unknown parser backend: " + str(backend))
 
     # If chosen topic main_articles, special html structure must be taken into account
     if main_articles:
@@ -97,51 +233,173 @@ def get_articles(url, main_articles = False):
     return articles
 
 
-def get_all_articles():
+def _lxml_find_id(root, id):
+    '''
+    Returns the first element of an lxml tree with the given id. As BeautifulSoup's find
+    returns None in that case, AttributeError is raised if there is no such element.
+
+    Parameters:
+        - root (lxml.html.HtmlElement): Root of the tree
+        - id (String): Id of the element
+
+    Returns:
+        lxml.html.HtmlElement with the given id
+    '''
+    elements = root.xpath("//*[@id=$id]", id=id)
+
+    if not elements:
+        raise AttributeError("No element with id " + id)
+
+    return elements[0]
+
+
+def _lxml_parse(html_file):
     '''
-    Function to get all the daily articles.
+    Parses an html file with lxml.
+
+    Parameters:
+        - html_file (String): Text of the html file
+
+    Returns:
+        lxml.html.HtmlElement root of the tree
+    '''
+    from lxml import html as lxml_html
+
+    parser = lxml_html.HTMLParser(encoding='utf-8')
+    return lxml_html.document_fromstring(html_file.encode('utf-8'), parser=parser)
+
+
+def _parse_articles_lxml(html_file, main_articles):
+    '''
+    lxml version of parse_articles, which selects the headers with XPath.
+    '''
+    root = _lxml_parse(html_file)
+
+    if main_articles:
+        links = _lxml_find_id(root, 'bereziak').xpath(".//h3[" + ARTICLE_TITU_XPATH + "]")
+        links2 = _lxml_find_id(root, 'nagusiak').xpath(".//*[self::h2 or self::h3 or self::h4][" 
+                                                            + ARTICLE_TITU_XPATH + "]")
+        links.extend(links2)
+
+    else:
+        links = root.xpath("//*[self::h2 or self::h3 or self::h4][" + ARTICLE_TITU_XPATH + "]")
+
+    articles = {}
+
+    for elem in links:
+        l = elem.xpath(".//a")[0]
+        text = "\"" + l.text_content() + "\" artikulua"
+        articles[text] = l.get('href')
+
+    return articles
+
+
+@timed("get_all_articles")
+def get_all_articles(max_workers = SCRAPE_WORKERS, timeout = REQUEST_TIMEOUT):
+    '''
+    Function to get all the daily articles. Topics are downloaded concurrently, and in case 
+    some topic can not be downloaded, the articles of the rest of topics are returned.
+
+    Parameters:
+        - max_workers (int): Maximum number of topics downloaded at the same time
+        - timeout (float): Seconds to wait for each topic before giving up
 
     Returns:
         Dictionary where, the key is the header of the article, and the value is the url of it.
     '''
 
     global_articles = {}
+    errors = []
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = [executor.submit(get_articles, get_file_url(topic), False, timeout) for topic in topics]
+
+        # Results are merged in topic order, as if they had been downloaded one after another
+        for topic, future in zip(topics, futures):
+            try:
+                global_articles.update(future.result())
+
+            except Exception as e:
+                logger.warning("Articles of %s could not be scrapped: %s", topic, e)
+                errors.append(e)
 
-    for topic in topics:
-        url = get_file_url(topic)
-        articles = get_articles(url)
-        global_articles.update(articles)
+    if len(errors) == len(topics):
+        raise errors[-1]
 
     return global_articles
 
 
 def get_sub_header(url):
     '''
-    Given the session_id of the user and the id of the html file, returns the subheader of the article.
+    Given the url of an article, returns the subheader of the article.
+    In case that the selected div label has no contents, first paragraph is returned.
+
+    Parameters:
+        - url (String): Url of the article
+
+    Returns:
+        Subheader of the article
+    '''
+
+    html_file = fetch_html(url)
+
+    return parse_sub_header(html_file)
+
+
+@timed("parse_sub_header")
+def parse_sub_header(html_file, backend = None):
+    '''
+    Given the html file of an article, returns the subheader of the article.
     In case that the selected div label has no contents, first paragraph is returned.
 
     Parameters:
-        - session_id (int): Id of the user session
-        - id (int): Id of the html file
+        - html_file (String): Text of the html file
+        - backend (String): Extraction backend, one of PARSER_BACKENDS. Defaults to PARSER_BACKEND
 
     Returns:
         Subheader of the article
     '''
 
-    html_file = requests.get(url).text
-    soup = BeautifulSoup(html_file, "html.parser")
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    backend = backend or PARSER_BACKEND
+
+    if backend == 'lxml':
+        root = _lxml_parse(html_file)
+        sub_header = _lxml_find_id(root, 'albistea_titu').xpath(".//div[" + ARTICLE_SARRERA_XPATH + "]")[0]
+        sub_header = sub_header.text_content()
+
+        # In case div label is empty, return first paragraph of the article as subheader
+        if not sub_header:
+            sub_header = root.xpath("//div[" + ARTICLE_TESTUA_XPATH + "]")[0].xpath(".//p")[0].text_content()
+
+        return sub_header
+
+    elif backend == 'strainer':
+        soup = BeautifulSoup(html_file, "html.parser", parse_only=SoupStrainer(id='albistea_titu'))
+
+    elif backend == 'html.parser':
+        soup = BeautifulSoup(html_file, "html.parser")
+
+    else:
+        raise ValueError("Unknown parser backend: " + str(backend))
 
     sub_header = soup.find(id = 'albistea_titu').find_all('div', class_="article-sarrera")[0].text
     
     # In case div label is empty, return first paragraph of the article as subheader
     if not sub_header:
+        if backend == 'strainer':
+            soup = BeautifulSoup(html_file, "html.parser", parse_only=SoupStrainer('div', class_=ARTICLE_TESTUA_CLASS))
+
         sub_header = soup.find('div', class_="article-testua").find('p').text
 
     return sub_header
 
+@timed("naf_parse")
 def get_lemmatized_text(naf_text):
     '''
-    Given a naf file, gets all the lemmatized words.
+    Given a naf file, gets all the lemmatized words. The file is parsed incrementally and
+    parsing stops as soon as the terms layer ends.
 
     Parameters:
         - naf_text (file in NAF format): File which contains user input, and the lemmatized user input
@@ -149,16 +407,84 @@ def get_lemmatized_text(naf_text):
     Returns:
         String which contains lemmatized user input
     '''
-    print(naf_text)
-    soup = BeautifulSoup(naf_text, "xml")
+    if not isinstance(naf_text, (str, bytes)):
+        naf_text = str(naf_text)
+
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    lemmas = []
+    in_terms = False
+
+    for i in range(0, len(naf_text), NAF_CHUNK_SIZE):
+        parser.feed(naf_text[i:i + NAF_CHUNK_SIZE])
+
+        for event, element in parser.read_events():
+            tag = element.tag.rsplit('}', 1)[-1]
+
+            if tag == 'terms':
+                if event == 'end':
+                    return "".join(" " + lemma for lemma in lemmas)
+
+                in_terms = True
+
+            elif in_terms and tag == 'term':
+                if event == 'start':
+                    lemmas.append(element.attrib['lemma'])
+
+                else:
+                    element.clear()
+
+    raise ValueError("NAF file without terms layer")
+
+
+@timed("naf_parse")
+def get_lemmatized_paragraphs(naf_text):
+    '''
+    Given a naf file, gets the lemmatized words of every paragraph separately. Each term is
+    assigned to the paragraph of the first word it spans.
+
+    Parameters:
+        - naf_text (file in NAF format): File which contains several paragraphs, and their lemmas
+
+    Returns:
+        List with a string of lemmatized words for every paragraph, ordered by paragraph number
+    '''
+    if not isinstance(naf_text, (str, bytes)):
+        naf_text = str(naf_text)
+
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    word_paragraphs = {}
+    paragraphs = {}
+    paragraph = None
+    in_terms = False
+
+    for i in range(0, len(naf_text), NAF_CHUNK_SIZE):
+        parser.feed(naf_text[i:i + NAF_CHUNK_SIZE])
+
+        for event, element in parser.read_events():
+            tag = element.tag.rsplit('}', 1)[-1]
+
+            if tag == 'wf' and event == 'start':
+                word_paragraphs[element.attrib['id']] = int(element.get('para', 1))
+
+            elif tag == 'terms':
+                if event == 'end':
+                    return ["".join(" " + lemma for lemma in paragraphs[key]) for key in sorted(paragraphs)]
+
+                in_terms = True
+
+            elif in_terms and tag == 'term':
+                if event == 'start':
+                    lemma = element.attrib['lemma']
+                    paragraph = None
 
-    terms = soup.find('terms').find_all('term')
+                else:
+                    paragraphs.setdefault(paragraph, []).append(lemma)
+                    element.clear()
 
-    final_terms = ""
-    for term in terms:
-        final_terms += " " + term['lemma']
+            elif in_terms and tag == 'target' and event == 'start' and paragraph is None:
+                paragraph = word_paragraphs[element.attrib['id']]
 
-    return final_terms
+    raise ValueError("NAF file without terms layer")
 
 
 
@@ -0,0 +1,25 @@
+from unittest import mock
+
+from ArticleRegistry import ArticleRegistry, get_article_id
+
+ARTICLES = {
+    '"Partida irabazi" artikulua': "https://www.berria.eus/kirola/0/partida-irabazi.htm",
+    '"Greba deitu" artikulua': "https://www.berria.eus/ekonomia/0/greba-deitu.htm",
+}
+
+
+def test_unknown_ids_are_loaded_once():
+    fallback = mock.Mock(return_value = ARTICLES)
+    registry = ArticleRegistry(fallback = fallback)
+    article_ids = [get_article_id(url) for url in ARTICLES.values()] + ["0123456789"]
+
+    assert registry.resolve_all(article_ids) == ARTICLES
+    fallback.assert_called_once()
+
+
+def test_failing_fallback_skips_unknown_ids():
+    registry = ArticleRegistry(fallback = mock.Mock(side_effect = ConnectionError()))
+    known_id = registry.register({'"Partida irabazi" artikulua': ARTICLES['"Partida irabazi" artikulua']})[0]
+
+    assert registry.resolve_all([known_id, get_article_id(ARTICLES['"Greba deitu" artikulua'])]) == {
+        '"Partida irabazi" artikulua': ARTICLES['"Partida irabazi" artikulua']}
@@ -0,0 +1,70 @@
+import time
+from unittest import mock
+
+import pytest
+
+import SectionCache
+from ArticleStore import ArticleStore, get_today
+from scrapper import get_file_url
+
+URL = get_file_url("Kirola")
+ARTICLE_URL = "https://www.berria.eus/kirola/0/partida-irabazi.htm"
+HEADER = '"Partida irabazi" artikulua'
+PAGE = ('<html><body><div class="art"><h2 class="article-titu"><a href="%s">Partida irabazi</a></h2></div>'
+        '<script>var now = %d;</script></body></html>')
+
+
+class Response:
+
+    def __init__(self, status_code = 200):
+        self.status_code = status_code
+        self.text = PAGE % (ARTICLE_URL, time.time())
+        self.headers = {'ETag': '"1"'}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ArticleStore(str(tmp_path / "articles.db"))
+    yield store
+    store.close()
+
+
+def refresh(cache, seen_at, status_code = 200):
+    '''
+    Refreshes the page of the topic at the given time.
+    '''
+    with mock.patch.object(SectionCache, 'fetch_page', return_value = Response(status_code)), \
+            mock.patch('time.time', return_value = seen_at):
+        return cache.refresh(URL)
+
+
+@pytest.mark.parametrize("status_code", [200, 304])
+def test_article_still_listed_the_next_day_is_seen_today(store, status_code):
+    cache = SectionCache.SectionCache()
+    cache.add_seen_listener(store.on_section_seen)
+
+    yesterday = get_today() - 12 * 3600
+    refresh(cache, yesterday)
+
+    assert store.get_articles(since = get_today()) == {}
+
+    # The page has not changed, so it is not parsed again
+    refresh(cache, time.time(), status_code)
+
+    assert cache.stats()["parsed"] == 1
+    assert store.get_articles(since = get_today()) == {HEADER: ARTICLE_URL}
+    assert store.search("partida", since = get_today()) == [(HEADER, ARTICLE_URL)]
+
+    article = store.get_article(ARTICLE_URL)
+    assert article["first_seen"] == yesterday
+    assert article["section"] == "Kirola"
+
+
+def test_replayed_snapshot_does_not_move_last_seen_back(store):
+    cache = SectionCache.SectionCache()
+    refresh(cache, get_today() - 12 * 3600)
+
+    store.upsert_articles("Kirola", {HEADER: ARTICLE_URL}, time.time())
+    cache.add_seen_listener(store.on_section_seen, replay = True)
+
+    assert store.get_articles(since = get_today()) == {HEADER: ARTICLE_URL}
@@ -0,0 +1,62 @@
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+from HttpClient import CircuitOpenError, HttpClient
+
+URL = "http://berria.test/kirola/"
+RESET = 0.05
+
+
+def get_response(status_code = 200):
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+def open_circuit(client):
+    '''
+    Makes the first request fail, which opens the circuit, and waits until it is half-open.
+    '''
+    with mock.patch.object(client.session, 'get', side_effect = requests.ConnectionError()):
+        with pytest.raises(requests.ConnectionError):
+            client.get(URL)
+
+    with pytest.raises(CircuitOpenError):
+        client.get(URL)
+
+    time.sleep(RESET * 2)
+
+
+def test_half_open_trial_with_other_request_error_is_recorded():
+    client = HttpClient(rate = 0, retries = 0, breaker_failures = 1, breaker_reset = RESET)
+    open_circuit(client)
+
+    # The trial request fails with an error which is not retried
+    with mock.patch.object(client.session, 'get', side_effect = requests.exceptions.ChunkedEncodingError()):
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            client.get(URL)
+
+    # The circuit is open again, instead of waiting forever for the result of the trial
+    with pytest.raises(CircuitOpenError):
+        client.get(URL)
+
+    time.sleep(RESET * 2)
+
+    with mock.patch.object(client.session, 'get', return_value = get_response()):
+        assert client.get(URL).status_code == 200
+
+    assert client.stats()["open_circuits"] == 0
+
+
+def test_half_open_trial_success_closes_circuit():
+    client = HttpClient(rate = 0, retries = 0, breaker_failures = 1, breaker_reset = RESET)
+    open_circuit(client)
+
+    with mock.patch.object(client.session, 'get', return_value = get_response()):
+        assert client.get(URL).status_code == 200
+        assert client.get(URL).status_code == 200
+
+    assert client.stats()["open_circuits"] == 0
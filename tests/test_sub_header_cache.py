@@ -0,0 +1,42 @@
+import time
+from unittest import mock
+
+import pytest
+
+from ArticleStore import ArticleStore
+from SubHeaderCache import SubHeaderCache
+
+ARTICLE_URL = "https://www.berria.eus/kirola/0/partida-irabazi.htm"
+TTL = 3600
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ArticleStore(str(tmp_path / "articles.db"))
+    store.upsert_articles("Kirola", {'"Partida irabazi" artikulua': ARTICLE_URL})
+    yield store
+    store.close()
+
+
+def test_valid_stored_sub_header_is_not_downloaded(store):
+    store.set_sub_header(ARTICLE_URL, "Gordetako sarrera", time.time() - TTL / 2)
+    fetch = mock.Mock(return_value = "Sarrera berria")
+
+    assert SubHeaderCache(ttl = TTL, fetch = fetch, store = store).get_sub_header(ARTICLE_URL) == "Gordetako sarrera"
+    fetch.assert_not_called()
+
+
+def test_expired_stored_sub_header_is_downloaded_again(store):
+    store.set_sub_header(ARTICLE_URL, "Gordetako sarrera", time.time() - TTL * 2)
+    fetch = mock.Mock(return_value = "Sarrera berria")
+
+    assert SubHeaderCache(ttl = TTL, fetch = fetch, store = store).get_sub_header(ARTICLE_URL) == "Sarrera berria"
+    assert store.get_sub_header(ARTICLE_URL, TTL)[0] == "Sarrera berria"
+
+
+def test_expired_stored_sub_header_is_used_while_the_site_fails(store):
+    store.set_sub_header(ARTICLE_URL, "Gordetako sarrera", time.time() - TTL * 2)
+    fetch = mock.Mock(side_effect = ConnectionError())
+
+    assert SubHeaderCache(ttl = TTL, fetch = fetch, store = store).get_sub_header(ARTICLE_URL) == "Gordetako sarrera"
+    fetch.assert_called_once()
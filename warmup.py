@@ -0,0 +1,101 @@
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Heavy modules are imported when first used, so by default the first requests pay for them.
+# With warm-up enabled, the action server does it before it starts answering
+WARM_UP = os.environ.get('LINGUO_WARM_UP', '0') == '1'
+
+
+def warm_up_lemmatizer():
+    '''
+    Starts all the tokenizer/lemmatizer pairs of the pool, and the worker processes of the
+    parallel lemmatization if enabled, loading the IxaPipes models.
+    '''
+    from LemmatizerPool import get_lemmatizer_pool
+    from LemmatizerProcessPool import get_lemmatizer_process_pool
+
+    get_lemmatizer_pool().warm_up()
+
+    process_pool = get_lemmatizer_process_pool()
+    if process_pool is not None:
+        process_pool.warm_up()
+
+
+def warm_up_topics():
+    '''
+    Builds the topic matcher, and lemmatizes and indexes the topics for the queries which
+    it does not match.
+    '''
+    from QuerySearcher import QuerySearcher, topics
+    from TopicMatcher import get_topic_matcher
+
+    get_topic_matcher()
+    QuerySearcher().search_query(topics[0])
+
+
+def warm_up_articles():
+    '''
+    Downloads the articles of all the topics into the section cache, so that the registry of
+    article ids, the article store and the subheader prefetch, if enabled, receive them.
+    '''
+    from ArticleRegistry import get_article_registry
+    from ArticleStore import get_article_store
+    from SectionCache import get_section_cache
+    from SubHeaderCache import get_sub_header_cache
+
+    get_article_registry()
+    get_article_store()
+    get_sub_header_cache()
+    get_section_cache().get_all_articles()
+
+
+def warm_up_headlines():
+    '''
+    Opens the current snapshot of the headline index of the open questions.
+    '''
+    from HeadlineIndexer import get_headline_indexer
+
+    get_headline_indexer().current()
+
+
+STEPS = [
+    ("lemmatizer", warm_up_lemmatizer),
+    ("topics", warm_up_topics),
+    ("articles", warm_up_articles),
+    ("headlines", warm_up_headlines),
+]
+
+
+def warm_up(steps = None):
+    '''
+    Runs the warm-up steps. A failed step is logged and does not stop the rest, as the
+    action server can still do it on the first request.
+
+    Parameters:
+        - steps (List): Names of the steps to run. Defaults to all of them
+
+    Returns:
+        Dictionary where the key is the name of the step and the value the seconds it took,
+        or None if it failed
+    '''
+    timings = {}
+
+    for name, step in STEPS:
+        if steps is not None and name not in steps:
+            continue
+
+        start = time.perf_counter()
+
+        try:
+            step()
+            timings[name] = time.perf_counter() - start
+            logger.info("Warm-up step %s done in %.2f seconds", name, timings[name])
+
+        except Exception:
+            timings[name] = None
+            logger.warning("Warm-up step %s failed", name, exc_info = True)
+
+    return timings